@@ -4,7 +4,7 @@ from django.utils.html import format_html
 from .models import (
     AppointmentTheme, Agenda, CalendarSlot, Appointment,
     AppointmentStatistics, EmailReminder, AgendaStaffAssignment,
-    TalentEligibilityCriteria, AppointmentAttachment
+    TalentEligibilityCriteria, AppointmentAttachment, WaitlistEntry
 )
 # No longer need to import UniversityStaff from universities here, as staff is now User
 
@@ -53,7 +53,8 @@ class AgendaAdmin(admin.ModelAdmin):
             'fields': ('university', 'created_by')
         }),
         ('Schedule', {
-            'fields': ('start_date', 'end_date', 'is_recurring', 'recurrence_pattern')
+            'fields': ('start_date', 'end_date', 'is_recurring', 'recurrence_pattern',
+                       'horizon_weeks', 'materialized_until')
         }),
         ('Slot Configuration', {
             'fields': ('slot_duration_minutes', 'max_capacity_per_slot')
@@ -61,6 +62,9 @@ class AgendaAdmin(admin.ModelAdmin):
         ('Booking Rules', {
             'fields': ('booking_deadline_hours', 'cancellation_deadline_hours')
         }),
+        ('Waiting Room', {
+            'fields': ('waiting_room_enabled', 'waiting_room_admit_per_minute')
+        }),
         ('Status', {
             'fields': ('is_active',)
         }),
@@ -182,6 +186,19 @@ class AppointmentAdmin(admin.ModelAdmin):
             'talent', 'calendar_slot__agenda'
         )
 
+@admin.register(WaitlistEntry)
+class WaitlistEntryAdmin(admin.ModelAdmin):
+    list_display = ('calendar_slot', 'talent', 'status', 'created_at', 'promoted_at')
+    list_filter = ('status', 'calendar_slot__slot_date', 'calendar_slot__agenda__university')
+    search_fields = ('talent__first_name', 'talent__last_name', 'talent__email', 'calendar_slot__agenda__name')
+    readonly_fields = ('created_at', 'promoted_at')
+    raw_id_fields = ('calendar_slot', 'talent', 'appointment')
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related(
+            'talent', 'calendar_slot__agenda'
+        )
+
 @admin.register(AppointmentStatistics)
 class AppointmentStatisticsAdmin(admin.ModelAdmin):
     list_display = ('university', 'theme', 'staff_name', 'date', 'total_slots',
@@ -0,0 +1,229 @@
+# FileName: MultipleFiles/availability.py (appointments app)
+"""
+Weekly staff availability templates as bitsets.
+
+A week is cut into 2016 bins of 5 minutes (Monday 00:00 is bin 0) and a
+template is the set of bins in which the staff member is available, stored
+as 252 bytes and handled as a Python int. Over a date range the week is
+rotated to the first day's weekday and tiled by doubling, and exceptions
+are cleared with a mask. Intersecting several staff members ANDs their weeks
+before tiling, so a semester for a team of twenty is a handful of big-int
+operations.
+
+Bits stand for wall-clock time in the project time zone, like slot dates
+and times. Staff members without a template are treated as always available.
+"""
+from collections import namedtuple
+from datetime import date, datetime, time, timedelta
+
+from django.utils import timezone
+
+from .models import StaffAvailability
+
+BIN_MINUTES = 5
+BINS_PER_DAY = 24 * 60 // BIN_MINUTES
+BINS_PER_WEEK = 7 * BINS_PER_DAY
+TEMPLATE_BYTES = BINS_PER_WEEK // 8
+WEEKDAYS = ['MO', 'TU', 'WE', 'TH', 'FR', 'SA', 'SU']
+
+Template = namedtuple('Template', ['week', 'exceptions'])
+
+
+class AvailabilityError(Exception):
+    """An availability template that cannot be parsed"""
+
+    def __init__(self, message):
+        super().__init__(message)
+        self.message = message
+
+
+def span(start_bin, end_bin):
+    """Mask with bins start_bin..end_bin - 1 set"""
+    return ((1 << (end_bin - start_bin)) - 1) << start_bin
+
+
+def time_bin(value, round_up=False):
+    """Bin index of a time of day (time.max stands for 24:00)"""
+    if value == time.max:
+        return BINS_PER_DAY
+    seconds = value.hour * 3600 + value.minute * 60 + value.second
+    return -(-seconds // (BIN_MINUTES * 60)) if round_up else seconds // (BIN_MINUTES * 60)
+
+
+def format_bin(index):
+    """HH:MM at which a bin starts, 24:00 for the end of the day"""
+    minutes = index * BIN_MINUTES
+    return f'{minutes // 60:02d}:{minutes % 60:02d}'
+
+
+def _parse_time(value, field):
+    if value in ('24:00', '24:00:00'):
+        return time.max
+    try:
+        parsed = time.fromisoformat(value)
+    except (TypeError, ValueError):
+        raise AvailabilityError(f'{field} must be a time in HH:MM format')
+    if parsed.second or parsed.microsecond or parsed.minute % BIN_MINUTES:
+        raise AvailabilityError(f'{field} must be a multiple of {BIN_MINUTES} minutes')
+    return parsed
+
+
+def _parse_window(window, field):
+    if not isinstance(window, dict):
+        raise AvailabilityError(f'{field} must be a {{"start", "end"}} object')
+    start = _parse_time(window.get('start'), f'{field}.start')
+    end = _parse_time(window.get('end'), f'{field}.end')
+    if time_bin(end) <= time_bin(start):
+        raise AvailabilityError(f'{field}.end must be after {field}.start')
+    return time_bin(start), time_bin(end)
+
+
+def parse_weekly(weekly):
+    """{"MO": [{"start": "09:00", "end": "12:00"}], ...} as a week bitset"""
+    if not isinstance(weekly, dict):
+        raise AvailabilityError('weekly must map weekdays (MO..SU) to lists of windows')
+    bits = 0
+    for day, windows in weekly.items():
+        if day not in WEEKDAYS:
+            raise AvailabilityError(f'Invalid weekday {day!r}; use MO..SU')
+        if windows is None:
+            continue
+        if not isinstance(windows, list):
+            raise AvailabilityError(f'weekly.{day} must be a list of {{"start", "end"}} windows')
+        offset = WEEKDAYS.index(day) * BINS_PER_DAY
+        for n, window in enumerate(windows):
+            start, end = _parse_window(window, f'weekly.{day}[{n}]')
+            bits |= span(offset + start, offset + end)
+    return bits
+
+
+def parse_exceptions(exceptions):
+    """Validate [{"date": "YYYY-MM-DD", "start"?: "HH:MM", "end"?: "HH:MM"}]; a bare date blocks the whole day"""
+    if not isinstance(exceptions, list):
+        raise AvailabilityError('exceptions must be a list')
+    cleaned = []
+    for n, exception in enumerate(exceptions):
+        field = f'exceptions[{n}]'
+        if not isinstance(exception, dict):
+            raise AvailabilityError(f'{field} must be an object with a date')
+        try:
+            day = date.fromisoformat(exception.get('date'))
+        except (TypeError, ValueError):
+            raise AvailabilityError(f'{field}.date must be a date in YYYY-MM-DD format')
+        entry = {'date': day.isoformat()}
+        if 'start' in exception or 'end' in exception:
+            _parse_window(exception, field)
+            entry.update(start=exception['start'], end=exception['end'])
+        cleaned.append(entry)
+    return cleaned
+
+
+def format_weekly(bits):
+    """Inverse of parse_weekly"""
+    weekly = {}
+    for index, day in enumerate(WEEKDAYS):
+        day_bits = (bits >> (index * BINS_PER_DAY)) & span(0, BINS_PER_DAY)
+        windows = [{'start': format_bin(start), 'end': format_bin(end)} for start, end in runs(day_bits)]
+        if windows:
+            weekly[day] = windows
+    return weekly
+
+
+def to_bytes(bits):
+    return bits.to_bytes(TEMPLATE_BYTES, 'little')
+
+
+def from_bytes(data):
+    return int.from_bytes(bytes(data), 'little')
+
+
+def runs(bits):
+    """(start, end) bin indexes of every run of set bits, in order"""
+    result = []
+    offset = 0
+    while bits:
+        skip = (bits & -bits).bit_length() - 1
+        bits >>= skip
+        length = (~bits & (bits + 1)).bit_length() - 1
+        result.append((offset + skip, offset + skip + length))
+        bits >>= length
+        offset += skip + length
+    return result
+
+
+def _tile(week, start_date, days):
+    # Rotate the week so it starts on start_date's weekday, then double it up to length
+    shift = start_date.weekday() * BINS_PER_DAY
+    bits = ((week >> shift) | (week << (BINS_PER_WEEK - shift))) & span(0, BINS_PER_WEEK)
+    length = BINS_PER_WEEK
+    while length < days * BINS_PER_DAY:
+        bits |= bits << length
+        length *= 2
+    return bits & span(0, days * BINS_PER_DAY)
+
+
+def _exception_mask(exceptions, start_date, end_date):
+    mask = 0
+    for exception in exceptions:
+        day = date.fromisoformat(exception['date'])
+        if not start_date <= day <= end_date:
+            continue
+        offset = (day - start_date).days * BINS_PER_DAY
+        if 'start' in exception:
+            start, end = _parse_window(exception, 'exception')
+        else:
+            start, end = 0, BINS_PER_DAY
+        mask |= span(offset + start, offset + end)
+    return mask
+
+
+def range_bits(template, start_date, end_date):
+    """
+    Availability over start_date..end_date (inclusive) as one bitset whose
+    bit i is the i-th 5-minute bin from start_date 00:00.
+    """
+    days = (end_date - start_date).days + 1
+    if days <= 0:
+        return 0
+    return _tile(template.week, start_date, days) & ~_exception_mask(template.exceptions, start_date, end_date)
+
+
+def load_templates(staff_ids):
+    """Templates of the staff members that have one, by staff id"""
+    return {
+        staff_id: Template(from_bytes(bitmap), exceptions)
+        for staff_id, bitmap, exceptions in StaffAvailability.objects.filter(
+            staff_id__in=staff_ids
+        ).values_list('staff_id', 'bitmap', 'exceptions')
+    }
+
+
+def common_bits(templates, start_date, end_date):
+    """Bins in which every template is available (all bins when there are none)"""
+    days = (end_date - start_date).days + 1
+    # Intersect the weeks first, so only one week is tiled
+    week = span(0, BINS_PER_WEEK)
+    exceptions = []
+    for template in templates:
+        week &= template.week
+        exceptions += template.exceptions
+    return _tile(week, start_date, days) & ~_exception_mask(exceptions, start_date, end_date)
+
+
+def bits_to_intervals(bits, start_date):
+    """Runs of set bits as aware (start, end) datetimes"""
+    origin = datetime.combine(start_date, time.min)
+    return [
+        (
+            timezone.make_aware(origin + timedelta(minutes=start * BIN_MINUTES)),
+            timezone.make_aware(origin + timedelta(minutes=end * BIN_MINUTES)),
+        )
+        for start, end in runs(bits)
+    ]
+
+
+def covers(bits, start_date, slot_date, start_time, end_time):
+    """True if every bin of the slot is set in bits (as built by range_bits from start_date)"""
+    offset = (slot_date - start_date).days * BINS_PER_DAY
+    mask = span(offset + time_bin(start_time), offset + time_bin(end_time, round_up=True))
+    return bits & mask == mask
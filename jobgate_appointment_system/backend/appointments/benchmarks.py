@@ -0,0 +1,264 @@
+# FileName: MultipleFiles/benchmarks.py (appointments app)
+"""
+Booking contention benchmark.
+
+Seeds a throwaway university/agenda with a handful of slots, then drives
+book_appointment_view and cancel_appointment_view from N threads at once and
+reports throughput, latency percentiles, time spent waiting on Postgres locks
+and any capacity violations found afterwards. Used by the
+``benchmark_booking`` management command and the benchmark test suite.
+"""
+import math
+import random
+import statistics
+import threading
+import time
+import uuid
+from contextlib import ExitStack
+from datetime import time as dt_time, timedelta
+from unittest import mock
+
+from django.db import connection, connections
+from django.db.models import Count, Q
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from universities.models import UniversityProfile
+from users.models import User
+from . import tasks
+from .booking import ACTIVE_APPOINTMENT_STATUSES
+from .models import AppointmentTheme, Agenda, CalendarSlot
+from .views import book_appointment_view, cancel_appointment_view
+
+LOCK_WAIT_SQL = """
+    SELECT count(*) FROM pg_stat_activity
+    WHERE datname = current_database() AND wait_event_type = 'Lock'
+"""
+
+NOTIFICATION_TASKS = [
+    tasks.send_appointment_confirmation,
+    tasks.send_waitlist_promotion,
+    tasks.send_cancellation_email,
+]
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers (None when empty)"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(math.ceil(pct / 100 * len(ordered)) - 1, 0)
+    return ordered[rank]
+
+
+def latency_summary(seconds):
+    values = [s * 1000 for s in seconds]
+    return {
+        'count': len(values),
+        'mean_ms': round(statistics.fmean(values), 2) if values else None,
+        'p50_ms': _round(percentile(values, 50)),
+        'p95_ms': _round(percentile(values, 95)),
+        'p99_ms': _round(percentile(values, 99)),
+        'max_ms': _round(max(values) if values else None),
+    }
+
+
+def _round(value):
+    return None if value is None else round(value, 2)
+
+
+def seed_benchmark_data(slots, capacity, talents, days_ahead=30):
+    """Create an isolated agenda with `slots` slots and `talents` talent users"""
+    prefix = f'bench-{uuid.uuid4().hex[:8]}'
+
+    def make_user(name, user_type):
+        return User.objects.create(
+            username=f'{prefix}-{name}',
+            email=f'{prefix}-{name}@benchmark.invalid',
+            user_type=user_type,
+        )
+
+    admin = make_user('admin', 'admin')
+    staff = make_user('staff', 'university_staff')
+    university = UniversityProfile.objects.create(
+        base_user=staff, display_name=f'Benchmark University {prefix}', created_by=admin
+    )
+    theme, _ = AppointmentTheme.objects.get_or_create(name='Benchmark')
+    slot_date = timezone.now().date() + timedelta(days=days_ahead)
+    agenda = Agenda.objects.create(
+        university=university,
+        created_by=staff,
+        name=f'Benchmark {prefix}',
+        theme=theme,
+        start_date=slot_date,
+        end_date=slot_date,
+        max_capacity_per_slot=capacity,
+        booking_deadline_hours=0,
+        cancellation_deadline_hours=0,
+    )
+    CalendarSlot.objects.bulk_create([
+        CalendarSlot(
+            agenda=agenda,
+            staff=staff,
+            slot_date=slot_date,
+            start_time=dt_time(8 + i // 4, (i % 4) * 15),
+            end_time=dt_time(8 + i // 4, (i % 4) * 15 + 14),
+            max_capacity=capacity,
+        )
+        for i in range(slots)
+    ])
+    talent_users = User.objects.bulk_create([
+        User(
+            username=f'{prefix}-talent{i}',
+            email=f'{prefix}-talent{i}@benchmark.invalid',
+            user_type='talent',
+        )
+        for i in range(talents)
+    ])
+    return {
+        'prefix': prefix,
+        'agenda': agenda,
+        'slot_ids': list(agenda.calendar_slots.values_list('id', flat=True)),
+        'talents': talent_users,
+    }
+
+
+def remove_benchmark_data(seed):
+    # Deleting the users cascades to the university, agenda, slots and appointments
+    User.objects.filter(username__startswith=seed['prefix']).delete()
+
+
+def find_capacity_violations(agenda):
+    """Slots whose active appointments exceed capacity or disagree with current_bookings"""
+    slots = CalendarSlot.objects.filter(agenda=agenda).annotate(
+        active=Count('appointments', filter=Q(appointments__status__in=ACTIVE_APPOINTMENT_STATUSES))
+    ).values('id', 'max_capacity', 'current_bookings', 'active')
+    return {
+        'overbooked': [s['id'] for s in slots if s['active'] > s['max_capacity']],
+        'counter_drift': [s['id'] for s in slots if s['active'] != s['current_bookings']],
+    }
+
+
+class LockWaitSampler(threading.Thread):
+    """Integrates the number of backends waiting on a lock over the run"""
+
+    def __init__(self, interval=0.01):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.lock_wait_seconds = 0.0
+        self._stop_event = threading.Event()
+
+    def run(self):
+        try:
+            with connection.cursor() as cursor:
+                while not self._stop_event.is_set():
+                    cursor.execute(LOCK_WAIT_SQL)
+                    self.lock_wait_seconds += cursor.fetchone()[0] * self.interval
+                    self._stop_event.wait(self.interval)
+        finally:
+            connection.close()
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+
+def run_booking_benchmark(threads=8, slots=5, capacity=3, operations=50,
+                          cancel_ratio=0.3, talents_per_thread=10,
+                          silence_notifications=True, keep_data=False, seed=None):
+    """
+    Hammer the booking endpoints and return a dict of results.
+
+    Each thread owns `talents_per_thread` talents and performs `operations`
+    requests, cancelling one of its own appointments with probability
+    `cancel_ratio` and booking a random slot otherwise.
+    """
+    rng = random.Random(seed)
+    data = seed_benchmark_data(slots, capacity, threads * talents_per_thread)
+    factory = APIRequestFactory()
+    barrier = threading.Barrier(threads)
+    results_lock = threading.Lock()
+    book_latencies, cancel_latencies = [], []
+    outcomes = {}
+
+    def record(kind, elapsed, status_code):
+        with results_lock:
+            (book_latencies if kind == 'book' else cancel_latencies).append(elapsed)
+            key = f'{kind}_{status_code}'
+            outcomes[key] = outcomes.get(key, 0) + 1
+
+    worker_seeds = [rng.random() for _ in range(threads)]
+
+    def worker(index):
+        worker_rng = random.Random(worker_seeds[index])
+        talents = data['talents'][index * talents_per_thread:(index + 1) * talents_per_thread]
+        booked = []  # (talent, appointment_id)
+        try:
+            barrier.wait()
+            for _ in range(operations):
+                if booked and worker_rng.random() < cancel_ratio:
+                    talent, appointment_id = booked.pop(worker_rng.randrange(len(booked)))
+                    request = factory.post(f'/api/appointments/{appointment_id}/cancel/')
+                    force_authenticate(request, user=talent)
+                    started = time.perf_counter()
+                    response = cancel_appointment_view(request, appointment_id=appointment_id)
+                    record('cancel', time.perf_counter() - started, response.status_code)
+                else:
+                    talent = worker_rng.choice(talents)
+                    request = factory.post(
+                        '/api/appointments/book/',
+                        {'calendar_slot_id': worker_rng.choice(data['slot_ids'])},
+                        format='json'
+                    )
+                    force_authenticate(request, user=talent)
+                    started = time.perf_counter()
+                    response = book_appointment_view(request)
+                    record('book', time.perf_counter() - started, response.status_code)
+                    if response.status_code == 201:
+                        booked.append((talent, response.data['id']))
+        finally:
+            connections.close_all()
+
+    sampler = LockWaitSampler() if connection.vendor == 'postgresql' else None
+
+    with ExitStack() as stack:
+        if silence_notifications:
+            for task in NOTIFICATION_TASKS:
+                stack.enter_context(mock.patch.object(task, 'delay'))
+
+        workers = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+        if sampler:
+            sampler.start()
+        started = time.perf_counter()
+        for w in workers:
+            w.start()
+        for w in workers:
+            w.join()
+        wall_seconds = time.perf_counter() - started
+        if sampler:
+            sampler.stop()
+
+    violations = find_capacity_violations(data['agenda'])
+    successful_bookings = outcomes.get('book_201', 0)
+    results = {
+        'config': {
+            'threads': threads,
+            'slots': slots,
+            'capacity': capacity,
+            'operations_per_thread': operations,
+            'cancel_ratio': cancel_ratio,
+        },
+        'wall_seconds': round(wall_seconds, 3),
+        'requests_per_second': round((len(book_latencies) + len(cancel_latencies)) / wall_seconds, 2),
+        'bookings_per_second': round(successful_bookings / wall_seconds, 2),
+        'book_latency': latency_summary(book_latencies),
+        'cancel_latency': latency_summary(cancel_latencies),
+        'lock_wait_seconds': round(sampler.lock_wait_seconds, 3) if sampler else None,
+        'outcomes': dict(sorted(outcomes.items())),
+        'overbooked_slots': violations['overbooked'],
+        'counter_drift_slots': violations['counter_drift'],
+    }
+
+    if not keep_data:
+        remove_benchmark_data(data)
+    return results
@@ -0,0 +1,343 @@
+# FileName: MultipleFiles/booking.py (appointments app)
+"""
+Booking engine for calendar slots.
+
+A seat is claimed with a single conditional UPDATE on calendar_slots
+(``current_bookings < max_capacity AND status = 'available'``) instead of a
+SELECT ... FOR UPDATE followed by a read-modify-write in Python. The affected
+row count tells us whether the seat was ours, so a slot can never be
+overbooked and concurrent bookings never hold an explicit lock while the rest
+of the request is validated.
+
+Cancellation is the mirror image: the appointment row is locked and flipped
+to 'cancelled' only if still active (so two concurrent cancels cannot both
+release a seat) and the seat goes back with an ``F()`` decrement whose status is recomputed
+in SQL, leaving blocked or cancelled slots closed.
+
+Rescheduling does both in one transaction. Every path that touches an
+appointment and its slot locks the appointment row first and slots after it,
+and a reschedule locks its two slots in ascending id order, so concurrent
+moves between the same pair of slots cannot deadlock.
+"""
+from datetime import datetime, timedelta
+
+from django.db import IntegrityError, transaction
+from django.db.models import Case, F, Value, When
+from django.utils import timezone
+from rest_framework import status
+
+from .models import Appointment, CalendarSlot, WaitlistEntry
+from .slot_changes import slots_changed
+from .tasks import (
+    send_appointment_confirmation, send_appointment_rescheduled, send_cancellation_email,
+    send_waitlist_promotion
+)
+
+ACTIVE_APPOINTMENT_STATUSES = ['pending', 'confirmed']
+# Partial unique index on appointments(calendar_slot, talent) for active statuses
+ACTIVE_BOOKING_CONSTRAINT = 'unique_active_appointment_per_slot'
+# GiST exclusion constraint on appointments(talent =, slot_period &&) for active statuses
+OVERLAPPING_BOOKING_CONSTRAINT = 'exclude_overlapping_talent_appointments'
+
+
+class BookingError(Exception):
+    """A booking request that cannot be fulfilled, with the HTTP status to report"""
+
+    def __init__(self, message, status_code=status.HTTP_400_BAD_REQUEST):
+        super().__init__(message)
+        self.message = message
+        self.status_code = status_code
+
+
+def slot_start_datetime(slot):
+    """Timezone-aware datetime at which the slot starts"""
+    return timezone.make_aware(datetime.combine(slot.slot_date, slot.start_time))
+
+
+def get_bookable_slot(calendar_slot_id):
+    """Load a slot once, without locking it, and check that it can be booked"""
+    try:
+        slot = CalendarSlot.objects.select_related('agenda').get(id=calendar_slot_id)
+    except CalendarSlot.DoesNotExist:
+        raise BookingError('Calendar slot not found or not available', status.HTTP_404_NOT_FOUND)
+
+    if slot.status != 'available':
+        raise BookingError('Calendar slot not found or not available', status.HTTP_404_NOT_FOUND)
+
+    if slot.current_bookings >= slot.max_capacity:
+        raise BookingError('This time slot is fully booked')
+
+    slot_datetime = slot_start_datetime(slot)
+    now = timezone.now()
+    if now > slot_datetime:
+        raise BookingError('Cannot book appointments in the past')
+
+    booking_deadline = slot_datetime - timedelta(hours=slot.agenda.booking_deadline_hours)
+    if now > booking_deadline:
+        raise BookingError('Booking deadline has passed')
+
+    return slot
+
+
+def claim_seat(slot_id):
+    """
+    Take one seat on a slot with a single conditional UPDATE.
+
+    Returns True if the seat was claimed. The status flips to 'fully_booked'
+    in the same statement when the last seat goes (the SET expressions see
+    the pre-update row, hence ``max_capacity - 1``).
+    """
+    claimed = CalendarSlot.objects.filter(
+        id=slot_id,
+        status='available',
+        current_bookings__lt=F('max_capacity'),
+    ).update(
+        current_bookings=F('current_bookings') + 1,
+        status=Case(
+            When(current_bookings__gte=F('max_capacity') - 1, then=Value('fully_booked')),
+            default=F('status'),
+        ),
+        version=F('version') + 1,
+        updated_at=timezone.now(),
+    )
+    return claimed == 1
+
+
+def release_seat(slot_id):
+    """
+    Give one seat on a slot back with a single UPDATE.
+
+    Only a 'fully_booked' slot reopens; 'blocked' and 'cancelled' slots keep
+    their status so a cancellation never makes them bookable again.
+    """
+    return CalendarSlot.objects.filter(
+        id=slot_id,
+        current_bookings__gt=0,
+    ).update(
+        current_bookings=F('current_bookings') - 1,
+        status=Case(
+            When(status='fully_booked', then=Value('available')),
+            default=F('status'),
+        ),
+        version=F('version') + 1,
+        updated_at=timezone.now(),
+    ) == 1
+
+
+def is_constraint_violation(error, name):
+    """True if an IntegrityError was raised by the named database constraint"""
+    return getattr(getattr(error.__cause__, 'diag', None), 'constraint_name', None) == name
+
+
+def booking_conflict_error(error):
+    """BookingError for an IntegrityError raised by one of the booking constraints, else None"""
+    if is_constraint_violation(error, ACTIVE_BOOKING_CONSTRAINT):
+        return BookingError('You already have an appointment for this time slot')
+    if is_constraint_violation(error, OVERLAPPING_BOOKING_CONSTRAINT):
+        return BookingError('You already have an appointment that overlaps this time slot')
+    return None
+
+
+def book_slot(slot, talent, talent_notes=None):
+    """Book a seat on a slot returned by get_bookable_slot() for the given talent"""
+    try:
+        with transaction.atomic():
+            if not claim_seat(slot.id):
+                raise BookingError('This time slot is fully booked')
+
+            # Duplicate and overlapping bookings are rejected by the database
+            # constraints; the IntegrityError rolls the seat claim back too
+            appointment = Appointment.objects.create(
+                calendar_slot=slot,
+                talent=talent,
+                talent_notes=talent_notes,
+            )
+            slot.refresh_from_db(fields=['current_bookings', 'status'])
+            slots_changed([slot.id])
+
+            # Only queue the confirmation once the booking is durable
+            transaction.on_commit(
+                lambda: send_appointment_confirmation.delay(appointment.id), robust=True
+            )
+    except IntegrityError as e:
+        conflict = booking_conflict_error(e)
+        if conflict is None:
+            raise
+        raise conflict
+
+    return appointment
+
+
+def cancel_appointment(appointment, cancelled_by_staff=False):
+    """
+    Cancel an active appointment, free its seat and offer it to the waitlist.
+
+    Raises BookingError if the appointment was no longer active once its row
+    was locked (e.g. a concurrent cancel won). The seat is released on the
+    slot the locked row points at, which a concurrent reschedule may have
+    changed since the appointment was loaded.
+    """
+    with transaction.atomic():
+        locked = Appointment.objects.select_for_update().filter(
+            id=appointment.id,
+            status__in=ACTIVE_APPOINTMENT_STATUSES
+        ).first()
+        if locked is None:
+            raise BookingError('Appointment is already cancelled')
+
+        now = timezone.now()
+        Appointment.objects.filter(id=locked.id).update(status='cancelled', cancelled_at=now, updated_at=now)
+
+        slot = CalendarSlot.objects.select_related('agenda').get(id=locked.calendar_slot_id)
+        release_seat(slot.id)
+        slot.refresh_from_db(fields=['current_bookings', 'status'])
+
+        # Hand the freed seat to the head of the waitlist in the same transaction
+        promote_from_waitlist(slot)
+        slots_changed([slot.id])
+
+        transaction.on_commit(
+            lambda: send_cancellation_email.delay(appointment.id, cancelled_by_staff), robust=True
+        )
+
+    appointment.refresh_from_db()
+    return appointment
+
+
+def reschedule_appointment(appointment, new_slot, rescheduled_by_staff=False):
+    """
+    Move an active appointment to new_slot, keeping its row and booking_reference.
+
+    The new seat is claimed before the old one is released, so the talent
+    never ends up without a seat, and the freed seat goes to the old slot's
+    waitlist in the same transaction.
+    """
+    try:
+        with transaction.atomic():
+            locked = Appointment.objects.select_for_update().filter(
+                id=appointment.id,
+                status__in=ACTIVE_APPOINTMENT_STATUSES
+            ).first()
+            if locked is None:
+                raise BookingError('Appointment is no longer active')
+
+            old_slot_id = locked.calendar_slot_id
+            if old_slot_id == new_slot.id:
+                raise BookingError('The appointment is already booked on this time slot')
+
+            # Lock both slots in a fixed order before changing either counter
+            slots = {
+                slot.id: slot
+                for slot in CalendarSlot.objects.select_for_update(of=('self',)).select_related('agenda').filter(
+                    id__in=[old_slot_id, new_slot.id]
+                ).order_by('id')
+            }
+
+            if not claim_seat(new_slot.id):
+                raise BookingError('This time slot is fully booked')
+            release_seat(old_slot_id)
+
+            locked.calendar_slot = slots[new_slot.id]
+            # Reminders were scheduled for the old time
+            locked.reminder_sent_24h = False
+            locked.reminder_sent_1h = False
+            locked.save(update_fields=['calendar_slot', 'reminder_sent_24h', 'reminder_sent_1h', 'updated_at'])
+
+            old_slot = slots[old_slot_id]
+            old_slot.refresh_from_db(fields=['current_bookings', 'status'])
+            promote_from_waitlist(old_slot)
+            slots_changed([old_slot_id, new_slot.id])
+
+            transaction.on_commit(
+                lambda: send_appointment_rescheduled.delay(locked.id, old_slot_id, rescheduled_by_staff),
+                robust=True
+            )
+    except IntegrityError as e:
+        conflict = booking_conflict_error(e)
+        if conflict is None:
+            raise
+        raise conflict
+
+    locked.calendar_slot.refresh_from_db(fields=['current_bookings', 'status'])
+    return locked
+
+
+def join_waitlist(calendar_slot_id, talent, talent_notes=None):
+    """Queue the talent for a seat on a fully booked slot"""
+    try:
+        slot = CalendarSlot.objects.select_related('agenda').get(id=calendar_slot_id)
+    except CalendarSlot.DoesNotExist:
+        raise BookingError('Calendar slot not found or not available', status.HTTP_404_NOT_FOUND)
+
+    if slot.status not in ['available', 'fully_booked']:
+        raise BookingError('Calendar slot not found or not available', status.HTTP_404_NOT_FOUND)
+
+    if slot.status == 'available' and slot.current_bookings < slot.max_capacity:
+        raise BookingError('This time slot still has free seats, book it directly')
+
+    if timezone.now() > slot_start_datetime(slot) - timedelta(hours=slot.agenda.booking_deadline_hours):
+        raise BookingError('Booking deadline has passed')
+
+    if Appointment.objects.filter(
+        calendar_slot=slot,
+        talent=talent,
+        status__in=ACTIVE_APPOINTMENT_STATUSES
+    ).exists():
+        raise BookingError('You already have an appointment for this time slot')
+
+    try:
+        with transaction.atomic():
+            return WaitlistEntry.objects.create(
+                calendar_slot=slot,
+                talent=talent,
+                talent_notes=talent_notes,
+            )
+    except IntegrityError:
+        raise BookingError('You are already on the waitlist for this time slot')
+
+
+def promote_from_waitlist(slot):
+    """
+    Hand a freed seat on the slot to the longest-waiting talent.
+
+    Must run inside the transaction that freed the seat. Entries whose talent
+    already holds an active appointment for the slot or an overlapping one
+    (caught by the booking constraints) are dropped from the queue. Returns
+    the new appointment, or None if nobody could be promoted.
+    """
+    if timezone.now() > slot_start_datetime(slot) - timedelta(hours=slot.agenda.booking_deadline_hours):
+        return None
+
+    while True:
+        # SKIP LOCKED lets concurrent cancellations promote different entries
+        entry = WaitlistEntry.objects.select_for_update(skip_locked=True).filter(
+            calendar_slot=slot,
+            status='waiting'
+        ).order_by('created_at', 'id').first()
+        if entry is None:
+            return None
+
+        try:
+            with transaction.atomic():
+                if not claim_seat(slot.id):
+                    return None
+                appointment = Appointment.objects.create(
+                    calendar_slot=slot,
+                    talent_id=entry.talent_id,
+                    talent_notes=entry.talent_notes,
+                )
+        except IntegrityError as e:
+            if booking_conflict_error(e) is None:
+                raise
+            # The talent booked this slot, or one overlapping it, in the meantime
+            entry.status = 'cancelled'
+            entry.save(update_fields=['status'])
+            continue
+
+        entry.status = 'promoted'
+        entry.appointment = appointment
+        entry.promoted_at = timezone.now()
+        entry.save(update_fields=['status', 'appointment', 'promoted_at'])
+
+        transaction.on_commit(lambda: send_waitlist_promotion.delay(appointment.id), robust=True)
+        return appointment
@@ -0,0 +1,164 @@
+# FileName: MultipleFiles/bulk_slots.py (appointments app)
+"""
+Bulk calendar slot creation.
+
+Instead of one overlap query per slot (CalendarSlotCreateSerializer), a batch
+is validated field by field in memory, the staff members' existing slots are
+loaded with a single range query covering each staff member's date window,
+and every candidate is checked against them and against the rest of the
+batch with one sweep (see appointments.intervals). The rows that pass are
+written in one transaction; the others come back in a per-item error report.
+
+Postgres has the final word: the exclude_overlapping_staff_slots constraint
+rejects overlapping live slots of a staff member even when two requests race
+past these checks.
+"""
+from functools import reduce
+from operator import or_
+
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from rest_framework import serializers
+
+from users.models import User
+from .booking import booking_conflict_error, is_constraint_violation
+from .intervals import Interval, sweep_conflicts
+from .models import Agenda, CalendarSlot
+from .slot_changes import slots_changed
+
+BULK_CREATE_BATCH_SIZE = 500
+STAFF_OVERLAP_CONSTRAINT = 'exclude_overlapping_staff_slots'
+OVERLAP_MESSAGE = 'This time slot overlaps with an existing slot'
+BOOKED_TALENT_OVERLAP_MESSAGE = 'A talent booked on this slot has another appointment at the new time'
+
+
+def save_slot(serializer, **kwargs):
+    """serializer.save() for a slot, turning a staff overlap into a validation error"""
+    try:
+        with transaction.atomic():
+            slot = serializer.save(**kwargs)
+            slots_changed([slot.id])
+            return slot
+    except IntegrityError as e:
+        if is_constraint_violation(e, STAFF_OVERLAP_CONSTRAINT):
+            raise serializers.ValidationError(OVERLAP_MESSAGE)
+        # Moving a booked slot onto another booking of one of its talents
+        if booking_conflict_error(e):
+            raise serializers.ValidationError(BOOKED_TALENT_OVERLAP_MESSAGE)
+        raise
+
+
+def _window_condition(date_windows):
+    return reduce(or_, (
+        Q(staff_id=staff_id, slot_date__range=window) for staff_id, window in date_windows.items()
+    ))
+
+
+def existing_slot_intervals(date_windows):
+    """
+    Intervals for the live slots of each staff member within their date window.
+
+    `date_windows` maps staff_id to a (first_date, last_date) pair; everything
+    is fetched in one query. Interval items are ``{'id', 'agenda_id'}`` dicts.
+    Cancelled slots are left out, as exclude_overlapping_staff_slots ignores them.
+    """
+    if not date_windows:
+        return []
+    return [
+        Interval((staff_id, slot_date), start_time, end_time, {'id': slot_id, 'agenda_id': agenda_id})
+        for slot_id, agenda_id, staff_id, slot_date, start_time, end_time in CalendarSlot.objects.filter(
+            _window_condition(date_windows)
+        ).exclude(status='cancelled').values_list('id', 'agenda_id', 'staff_id', 'slot_date', 'start_time', 'end_time')
+    ]
+
+
+def cancelled_slot_keys(date_windows):
+    """
+    {(agenda_id, staff_id, slot_date, start_time): slot_id} for the cancelled
+    slots in the date windows: they no longer block the time, but still hold
+    their unique_together key, so a new slot cannot reuse it.
+    """
+    if not date_windows:
+        return {}
+    return {
+        (agenda_id, staff_id, slot_date, start_time): slot_id
+        for slot_id, agenda_id, staff_id, slot_date, start_time in CalendarSlot.objects.filter(
+            _window_condition(date_windows), status='cancelled'
+        ).values_list('id', 'agenda_id', 'staff_id', 'slot_date', 'start_time')
+    }
+
+
+def _manageable_agenda_ids(user, agenda_ids):
+    agendas = Agenda.objects.filter(id__in=agenda_ids, is_active=True)
+    if user.user_type != 'admin':
+        profile = getattr(user, 'university_profile', None) if user.user_type == 'university_staff' else None
+        if profile is None:
+            return set()
+        agendas = agendas.filter(university=profile)
+    return set(agendas.values_list('id', flat=True))
+
+
+def create_slots(user, items):
+    """
+    Validate and insert a batch of slot definitions.
+
+    `items` are the validated_data of CalendarSlotBulkItemSerializer, in
+    request order, or None for items that already failed field validation.
+    Returns ``(created, errors)``: ``created`` is a list of ``(index, slot)``
+    and ``errors`` maps item index to a list of messages.
+    """
+    errors = {}
+    valid = [(index, item) for index, item in enumerate(items) if item is not None]
+
+    agenda_ids = _manageable_agenda_ids(user, {item['agenda_id'] for _, item in valid})
+    staff_ids = set(User.objects.filter(
+        id__in={item['staff_id'] for _, item in valid},
+        user_type__in=['university_staff', 'admin']
+    ).values_list('id', flat=True))
+
+    candidates = []
+    for index, item in valid:
+        if item['agenda_id'] not in agenda_ids:
+            errors[index] = ['Agenda not found or you cannot manage its slots']
+        elif item['staff_id'] not in staff_ids:
+            errors[index] = ['Staff member not found']
+        else:
+            slot = CalendarSlot(**item)
+            candidates.append(Interval((slot.staff_id, slot.slot_date), slot.start_time, slot.end_time, (index, slot)))
+
+    date_windows = {}
+    for interval in candidates:
+        staff_id, slot_date = interval.key
+        first, last = date_windows.get(staff_id, (slot_date, slot_date))
+        date_windows[staff_id] = (min(first, slot_date), max(last, slot_date))
+
+    accepted, conflicts = sweep_conflicts(existing_slot_intervals(date_windows), candidates)
+    for candidate, blocker in conflicts:
+        index = candidate.item[0]
+        if isinstance(blocker.item, dict):
+            errors[index] = [f"This time slot overlaps with existing slot {blocker.item['id']}"]
+        else:
+            errors[index] = [f'This time slot overlaps with item {blocker.item[0]} of this request']
+
+    cancelled = cancelled_slot_keys(date_windows)
+    created = []
+    for index, slot in sorted((interval.item for interval in accepted), key=lambda pair: pair[0]):
+        cancelled_id = cancelled.get((slot.agenda_id, slot.staff_id, slot.slot_date, slot.start_time))
+        if cancelled_id:
+            errors[index] = [f'Cancelled slot {cancelled_id} already starts at this time in this agenda']
+        else:
+            created.append((index, slot))
+    if created:
+        try:
+            with transaction.atomic():
+                CalendarSlot.objects.bulk_create([slot for _, slot in created], batch_size=BULK_CREATE_BATCH_SIZE)
+                slots_changed(slot.id for _, slot in created)
+        except IntegrityError as e:
+            if not is_constraint_violation(e, STAFF_OVERLAP_CONSTRAINT):
+                raise
+            # Another request created an overlapping slot after our read; nothing was written
+            for index, _ in created:
+                errors[index] = [f'{OVERLAP_MESSAGE} created concurrently; please retry']
+            created = []
+
+    return created, errors
@@ -0,0 +1,68 @@
+# FileName: MultipleFiles/calendar_summary.py (appointments app)
+"""
+Per-day slot counts for a calendar month grid.
+
+One ``GROUP BY slot_date`` query over an agenda's slots for the month,
+counting all slots, bookable ones, fully booked ones and the requesting
+user's active bookings. Results are cached under the agenda's version
+counter (appointments.versions), which every slot and agenda change bumps,
+so a cached month is never served after it changed and nothing has to be
+invalidated explicitly.
+"""
+import calendar
+from datetime import date
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, F, Q
+
+from . import versions
+from .booking import ACTIVE_APPOINTMENT_STATUSES
+from .models import CalendarSlot
+
+CACHE_KEY = 'calendar:summary:{agenda_id}:{version}:{month}:{user_id}'
+
+
+def month_bounds(month):
+    """First and last day of a YYYY-MM month; raises ValueError for anything else"""
+    year, _, number = month.partition('-')
+    if len(year) != 4 or len(number) != 2:
+        raise ValueError(month)
+    first_day = date(int(year), int(number), 1)
+    return first_day, first_day.replace(day=calendar.monthrange(first_day.year, first_day.month)[1])
+
+
+def month_summary(agenda_id, month, user):
+    """[{date, total, available, fully_booked, my_bookings}] for the days of `month` that have slots"""
+    version, = versions.current([versions.agenda(agenda_id)])
+    key = CACHE_KEY.format(agenda_id=agenda_id, version=version, month=month, user_id=user.id)
+    days = cache.get(key)
+    if days is None:
+        days = _query(agenda_id, *month_bounds(month), user)
+        cache.set(key, days, settings.CALENDAR_SUMMARY_CACHE_SECONDS)
+    return days
+
+
+def _query(agenda_id, first_day, last_day, user):
+    mine = Q(appointments__talent=user, appointments__status__in=ACTIVE_APPOINTMENT_STATUSES)
+    rows = CalendarSlot.objects.filter(
+        agenda_id=agenda_id, slot_date__range=(first_day, last_day)
+    ).values('slot_date').annotate(
+        # The join with appointments repeats slots, hence the distinct counts
+        total=Count('id', distinct=True),
+        available=Count(
+            'id', distinct=True, filter=Q(status='available', current_bookings__lt=F('max_capacity'))
+        ),
+        fully_booked=Count('id', distinct=True, filter=Q(status='fully_booked')),
+        my_bookings=Count('appointments', distinct=True, filter=mine),
+    ).order_by('slot_date')
+    return [
+        {
+            'date': row['slot_date'].isoformat(),
+            'total': row['total'],
+            'available': row['available'],
+            'fully_booked': row['fully_booked'],
+            'my_bookings': row['my_bookings'],
+        }
+        for row in rows
+    ]
@@ -0,0 +1,69 @@
+# FileName: MultipleFiles/export.py (appointments app)
+"""
+Streaming CSV export of appointments for university staff and admins.
+
+Rows come from a flat ``values()`` queryset read with ``.iterator()``, which
+on Postgres uses a server-side cursor, and each row is written out as it is
+yielded, so the export runs in constant memory however many appointments
+are exported. No model instances and no serializers are built.
+"""
+import csv
+import json
+
+from rest_framework.renderers import BaseRenderer
+
+ITERATOR_CHUNK_SIZE = 2000
+CONTENT_TYPE = 'text/csv; charset=utf-8'
+
+# (CSV header, values() lookup)
+COLUMNS = [
+    ('booking_reference', 'booking_reference'),
+    ('status', 'status'),
+    ('slot_date', 'calendar_slot__slot_date'),
+    ('start_time', 'calendar_slot__start_time'),
+    ('end_time', 'calendar_slot__end_time'),
+    ('meeting_type', 'calendar_slot__meeting_type'),
+    ('agenda', 'calendar_slot__agenda__name'),
+    ('university', 'calendar_slot__agenda__university__display_name'),
+    ('theme', 'calendar_slot__agenda__theme__name'),
+    ('staff_email', 'calendar_slot__staff__email'),
+    ('talent_first_name', 'talent__first_name'),
+    ('talent_last_name', 'talent__last_name'),
+    ('talent_email', 'talent__email'),
+    ('created_at', 'created_at'),
+]
+
+
+class CSVRenderer(BaseRenderer):
+    """Lets DRF accept ``Accept: text/csv``; the export itself bypasses renderers by streaming"""
+    media_type = 'text/csv'
+    format = 'csv'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        # Only error payloads get here
+        return json.dumps(data).encode()
+
+
+class _Echo:
+    """File-like object whose write() hands the line back to the csv writer's caller"""
+
+    def write(self, value):
+        return value
+
+
+def _cell(value):
+    if value is None:
+        return ''
+    value = value.isoformat() if hasattr(value, 'isoformat') else str(value)
+    # Keep spreadsheets from evaluating user-entered text as a formula
+    return "'" + value if value[:1] in ('=', '+', '-', '@') else value
+
+
+def rows(queryset):
+    """CSV lines (header first) of the appointments in queryset"""
+    writer = csv.writer(_Echo())
+    yield writer.writerow([header for header, _ in COLUMNS])
+    lookups = [lookup for _, lookup in COLUMNS]
+    for row in queryset.values_list(*lookups).iterator(chunk_size=ITERATOR_CHUNK_SIZE):
+        yield writer.writerow([_cell(value) for value in row])
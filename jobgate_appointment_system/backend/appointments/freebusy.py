@@ -0,0 +1,72 @@
+# FileName: MultipleFiles/freebusy.py (appointments app)
+"""
+Free/busy computation for staff members.
+
+Every non-cancelled slot of the requested staff members in the window is
+fetched with one query on the (staff, slot_date) index, then merged per
+staff member into disjoint busy intervals; free time is the complement of
+busy within the window. Everything after the query is O(n log n).
+
+Staff members with a weekly availability template (appointments.availability)
+are only free inside it; those without one are free whenever they are not busy.
+The common free time is the complement of everybody's busy time, within the
+bins that availability.common_bits ANDs out of all the templates at once.
+"""
+from collections import defaultdict
+from datetime import datetime, timedelta
+from itertools import chain
+
+from django.utils import timezone
+
+from .availability import bits_to_intervals, common_bits, load_templates, range_bits
+from .intervals import complement_intervals, intersect_intervals, merge_intervals
+from .models import CalendarSlot
+
+MAX_STAFF = 50
+MAX_WINDOW_DAYS = 62
+
+
+def _aware(day, clock):
+    return timezone.make_aware(datetime.combine(day, clock))
+
+
+def free_busy(staff_ids, start, end):
+    """
+    Busy and free intervals per staff member within [start, end), plus the
+    intervals in which all of them are free. start/end are aware datetimes.
+    """
+    # Slot dates are local wall-clock dates; widen by a day to be safe at the edges
+    local_start, local_end = timezone.localtime(start), timezone.localtime(end)
+    rows = CalendarSlot.objects.filter(
+        staff_id__in=staff_ids,
+        slot_date__range=(local_start.date() - timedelta(days=1), local_end.date()),
+    ).exclude(status='cancelled').values_list('staff_id', 'slot_date', 'start_time', 'end_time')
+
+    busy_by_staff = defaultdict(list)
+    for staff_id, slot_date, start_time, end_time in rows:
+        slot_start, slot_end = _aware(slot_date, start_time), _aware(slot_date, end_time)
+        if slot_start < end and slot_end > start:
+            busy_by_staff[staff_id].append((max(slot_start, start), min(slot_end, end)))
+
+    templates = load_templates(staff_ids)
+    first_day, last_day = local_start.date(), local_end.date()
+
+    staff = {}
+    for staff_id in staff_ids:
+        busy = merge_intervals(busy_by_staff[staff_id])
+        free = complement_intervals(busy, start, end)
+        if staff_id in templates:
+            available = bits_to_intervals(range_bits(templates[staff_id], first_day, last_day), first_day)
+            free = intersect_intervals(free, available)
+        staff[staff_id] = {'busy': busy, 'free': free}
+
+    all_busy = merge_intervals(list(chain.from_iterable(entry['busy'] for entry in staff.values())))
+    common_free = complement_intervals(all_busy, start, end)
+    if templates:
+        available = bits_to_intervals(common_bits(templates.values(), first_day, last_day), first_day)
+        common_free = intersect_intervals(common_free, available)
+    return {'staff': staff, 'common_free': common_free}
+
+
+def serialize_intervals(intervals):
+    return [[start.isoformat(), end.isoformat()] for start, end in intervals]
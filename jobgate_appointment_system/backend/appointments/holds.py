@@ -0,0 +1,93 @@
+# FileName: MultipleFiles/holds.py (appointments app)
+"""
+Short-lived seat holds kept in Redis.
+
+Every slot has a sorted set ``booking:holds:<slot_id>``: members are the ids of
+the talents holding a seat, scores are the hold expiry in milliseconds. The Lua
+script below prunes expired holds and only admits a new one while the number of
+live holds is below the seats still free in the database, so the burst of
+requests for a popular slot is settled in Redis and only talents that hold a
+seat go on to write to Postgres. Expired holds simply fall out of the set and
+the key itself expires with its last hold.
+"""
+from collections import namedtuple
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django_redis import get_redis_connection
+
+HOLD_KEY = 'booking:holds:{slot_id}'
+
+# Returns {status, expires_at_ms}; status is 0 (no seat), 1 (new hold) or 2 (refreshed)
+ACQUIRE_HOLD_SCRIPT = """
+local key = KEYS[1]
+local ttl_ms = tonumber(ARGV[1])
+local free_seats = tonumber(ARGV[2])
+local member = ARGV[3]
+
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+redis.call('ZREMRANGEBYSCORE', key, '-inf', now)
+
+local existing = redis.call('ZSCORE', key, member)
+if not existing and redis.call('ZCARD', key) >= free_seats then
+    return {0, 0}
+end
+
+local expires_at = now + ttl_ms
+redis.call('ZADD', key, expires_at, member)
+local last = redis.call('ZRANGE', key, -1, -1, 'WITHSCORES')
+redis.call('PEXPIREAT', key, last[2])
+
+if existing then
+    return {2, expires_at}
+end
+return {1, expires_at}
+"""
+
+SlotHold = namedtuple('SlotHold', ['slot_id', 'talent_id', 'expires_at', 'created'])
+
+_acquire_script = None
+
+
+def _redis():
+    return get_redis_connection('default')
+
+
+def _get_acquire_script():
+    global _acquire_script
+    if _acquire_script is None:
+        _acquire_script = _redis().register_script(ACQUIRE_HOLD_SCRIPT)
+    return _acquire_script
+
+
+def hold_duration():
+    return timedelta(minutes=settings.BOOKING_HOLD_MINUTES)
+
+
+def acquire_hold(slot, talent):
+    """
+    Reserve (or refresh) a seat on the slot for the talent.
+
+    Returns a SlotHold, or None when every free seat is already held by
+    someone else.
+    """
+    free_seats = max(slot.max_capacity - slot.current_bookings, 0)
+    hold_status, expires_at_ms = _get_acquire_script()(
+        keys=[HOLD_KEY.format(slot_id=slot.id)],
+        args=[int(hold_duration().total_seconds() * 1000), free_seats, talent.id],
+    )
+    if not hold_status:
+        return None
+
+    return SlotHold(
+        slot_id=slot.id,
+        talent_id=talent.id,
+        expires_at=datetime.fromtimestamp(int(expires_at_ms) / 1000, tz=dt_timezone.utc),
+        created=int(hold_status) == 1,
+    )
+
+
+def release_hold(slot_id, talent_id):
+    """Give a held seat back; returns True if the talent was holding one"""
+    return bool(_redis().zrem(HOLD_KEY.format(slot_id=slot_id), talent_id))
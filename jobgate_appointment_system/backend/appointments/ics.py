@@ -0,0 +1,170 @@
+# FileName: MultipleFiles/ics.py (appointments app)
+"""
+iCalendar (RFC 5545) feeds of a user's appointments and of an agenda's slots.
+
+Calendar clients subscribe to a URL and cannot send a JWT, so each feed is
+addressed by a signed token (feed_token / read_feed_token) that the
+authenticated API hands out. Feeds are streamed: the queryset is read with
+``.iterator()`` in chunks and every event is rendered as it is yielded, so
+memory stays flat however many appointments a staff member has.
+
+validators() runs one aggregate query over the same rows (count and
+latest ``updated_at``) for the ETag and Last-Modified headers, so the
+15-minute polls of calendar clients are usually answered with a 304
+without rendering anything.
+"""
+import hashlib
+from datetime import datetime, timezone as dt_timezone
+
+from django.core import signing
+from django.db.models import Count, Max, Q
+from django.utils import timezone
+
+from .models import Appointment, CalendarSlot
+
+TOKEN_SALT = 'appointments.ics'
+USER_FEED = 'user'
+AGENDA_FEED = 'agenda'
+ITERATOR_CHUNK_SIZE = 500
+PRODID = '-//JOBGATE//Appointment System//EN'
+CONTENT_TYPE = 'text/calendar; charset=utf-8'
+
+
+def feed_token(kind, object_id):
+    return signing.dumps([kind, object_id], salt=TOKEN_SALT)
+
+
+def read_feed_token(token, kind):
+    """The object id a feed token was issued for, or None if it is invalid or for another kind of feed"""
+    try:
+        token_kind, object_id = signing.loads(token, salt=TOKEN_SALT)
+    except (signing.BadSignature, TypeError, ValueError):
+        return None
+    return object_id if token_kind == kind else None
+
+
+def user_appointments(user_id):
+    """Appointments a user attends, as talent or as the slot's staff member"""
+    return Appointment.objects.filter(
+        Q(talent_id=user_id) | Q(calendar_slot__staff_id=user_id)
+    ).exclude(status='cancelled')
+
+
+def agenda_slots(agenda_id):
+    return CalendarSlot.objects.filter(agenda_id=agenda_id).exclude(status='cancelled')
+
+
+def validators(queryset, *updated_fields):
+    """(etag, last_modified) of a feed from one aggregate over its rows"""
+    state = queryset.aggregate(
+        count=Count('id', distinct=True), **{f'max_{n}': Max(field) for n, field in enumerate(updated_fields)}
+    )
+    stamps = [stamp for key, stamp in state.items() if key != 'count' and stamp is not None]
+    last_modified = max(stamps) if stamps else None
+    digest = hashlib.sha1(repr([state['count'], sorted(stamps)]).encode()).hexdigest()
+    return f'"{digest}"', last_modified
+
+
+def _escape(value):
+    return (value or '').replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,').replace('\n', '\\n')
+
+
+def _fold(line):
+    """Fold a content line at 75 octets, as RFC 5545 requires"""
+    data = line.encode()
+    chunks = []
+    limit = 75
+    while len(data) > limit:
+        cut = limit
+        # Never split a UTF-8 sequence
+        while (data[cut] & 0xC0) == 0x80:
+            cut -= 1
+        chunks.append(data[:cut])
+        data = data[cut:]
+        limit = 74  # continuation lines start with a space
+    chunks.append(data)
+    return b'\r\n '.join(chunks).decode() + '\r\n'
+
+
+def _utc(value):
+    return value.astimezone(dt_timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+
+
+def _slot_bounds(slot):
+    return (
+        timezone.make_aware(datetime.combine(slot.slot_date, slot.start_time)),
+        timezone.make_aware(datetime.combine(slot.slot_date, slot.end_time)),
+    )
+
+
+def _event(uid, start, end, stamp, summary, location='', description='', status='CONFIRMED'):
+    lines = [
+        'BEGIN:VEVENT',
+        f'UID:{uid}',
+        f'DTSTAMP:{_utc(stamp)}',
+        f'DTSTART:{_utc(start)}',
+        f'DTEND:{_utc(end)}',
+        f'SUMMARY:{_escape(summary)}',
+        f'STATUS:{status}',
+    ]
+    if location:
+        lines.append(f'LOCATION:{_escape(location)}')
+    if description:
+        lines.append(f'DESCRIPTION:{_escape(description)}')
+    lines.append('END:VEVENT')
+    return ''.join(_fold(line) for line in lines)
+
+
+def _calendar(name, events):
+    yield ''.join(_fold(line) for line in [
+        'BEGIN:VCALENDAR', 'VERSION:2.0', f'PRODID:{PRODID}', 'CALSCALE:GREGORIAN', 'METHOD:PUBLISH',
+        f'X-WR-CALNAME:{_escape(name)}',
+    ])
+    yield from events
+    yield _fold('END:VCALENDAR')
+
+
+def _where(slot):
+    return slot.meeting_link or slot.location or ''
+
+
+def appointment_events(queryset):
+    rows = queryset.select_related(
+        'talent', 'calendar_slot__staff', 'calendar_slot__agenda'
+    ).order_by('id').iterator(chunk_size=ITERATOR_CHUNK_SIZE)
+    for appointment in rows:
+        slot = appointment.calendar_slot
+        start, end = _slot_bounds(slot)
+        yield _event(
+            f'appointment-{appointment.booking_reference}@jobgate',
+            start, end, appointment.updated_at,
+            slot.agenda.name,
+            location=_where(slot),
+            description=(
+                f'Talent: {appointment.talent.get_full_name()}\n'
+                f'Staff: {slot.staff.get_full_name()}\n'
+                f'Reference: {appointment.booking_reference}'
+            ),
+            status='TENTATIVE' if appointment.status == 'pending' else 'CONFIRMED',
+        )
+
+
+def slot_events(queryset):
+    rows = queryset.select_related('staff', 'agenda').order_by('id').iterator(chunk_size=ITERATOR_CHUNK_SIZE)
+    for slot in rows:
+        start, end = _slot_bounds(slot)
+        yield _event(
+            f'slot-{slot.id}@jobgate',
+            start, end, slot.updated_at,
+            f'{slot.agenda.name} ({slot.current_bookings}/{slot.max_capacity} booked)',
+            location=_where(slot),
+            description=f'Staff: {slot.staff.get_full_name()}',
+        )
+
+
+def user_calendar(user_id):
+    return _calendar('My appointments', appointment_events(user_appointments(user_id)))
+
+
+def agenda_calendar(agenda):
+    return _calendar(agenda.name, slot_events(agenda_slots(agenda.id)))
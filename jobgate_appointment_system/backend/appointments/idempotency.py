@@ -0,0 +1,134 @@
+# FileName: MultipleFiles/idempotency.py (appointments app)
+"""
+Idempotency-Key support for state-changing appointment endpoints.
+
+The first response for a (user, endpoint, key) triple is stored in the cache
+and replayed verbatim for retries, so a client retrying a timed-out booking
+gets its original 201 instead of running the transaction again. While the
+first request is still running, duplicates get a 409 with Retry-After rather
+than starting a second transaction or tying up a worker waiting for it.
+
+The in-flight lock is a Redis key holding a token unique to the request that
+took it, and is released with a compare-and-delete script: a request that
+outlives the lock's TTL cannot delete a lock another request has taken since.
+"""
+import hashlib
+import json
+import uuid
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django_redis import get_redis_connection
+from rest_framework import status
+from rest_framework.response import Response
+
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+REPLAYED_HEADER = 'Idempotent-Replayed'
+MAX_KEY_LENGTH = 255
+
+# Transient outcomes that a retry with the same key should get to re-run
+RETRYABLE_STATUS_CODES = {status.HTTP_409_CONFLICT, status.HTTP_429_TOO_MANY_REQUESTS}
+
+RELEASE_LOCK_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+_release_script = None
+
+
+def acquire_lock(lock_key):
+    """Take the in-flight lock; returns the token that releases it, or None if it is taken"""
+    token = uuid.uuid4().hex
+    taken = get_redis_connection('default').set(
+        lock_key, token, nx=True, ex=settings.IDEMPOTENCY_LOCK_SECONDS
+    )
+    return token if taken else None
+
+
+def release_lock(lock_key, token):
+    """Delete the lock only if it still holds `token`"""
+    global _release_script
+    if _release_script is None:
+        _release_script = get_redis_connection('default').register_script(RELEASE_LOCK_SCRIPT)
+    return bool(_release_script(keys=[lock_key], args=[token]))
+
+
+def _fingerprint(request):
+    payload = json.dumps(request.data, sort_keys=True, default=str)
+    return hashlib.sha256(f'{request.method}:{request.path}:{payload}'.encode()).hexdigest()
+
+
+def _replay(stored, fingerprint):
+    if stored['fingerprint'] != fingerprint:
+        return Response(
+            {'error': 'This Idempotency-Key was already used for a different request'},
+            status=status.HTTP_422_UNPROCESSABLE_ENTITY
+        )
+    response = Response(stored['data'], status=stored['status'])
+    response[REPLAYED_HEADER] = 'true'
+    return response
+
+
+def idempotent(view_func):
+    """
+    Make a DRF function view honour the Idempotency-Key header.
+
+    Apply it below @api_view/@permission_classes so the wrapped function
+    receives an authenticated DRF request and returns an unrendered Response.
+    Requests without the header are passed through untouched.
+    """
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        key = request.headers.get(IDEMPOTENCY_HEADER)
+        if not key:
+            return view_func(request, *args, **kwargs)
+
+        if len(key) > MAX_KEY_LENGTH:
+            return Response(
+                {'error': f'{IDEMPOTENCY_HEADER} must be at most {MAX_KEY_LENGTH} characters'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        scope = f'{view_func.__name__}:{request.user.pk}:{key}'
+        cache_key = 'idempotency:' + hashlib.sha256(scope.encode()).hexdigest()
+        lock_key = cache_key + ':lock'
+        fingerprint = _fingerprint(request)
+
+        stored = cache.get(cache_key)
+        if stored is not None:
+            return _replay(stored, fingerprint)
+
+        token = acquire_lock(lock_key)
+        if token is None:
+            # Same key is in flight: the retry will find the first request's result
+            response = Response(
+                {'error': 'A request with this Idempotency-Key is still being processed'},
+                status=status.HTTP_409_CONFLICT
+            )
+            response['Retry-After'] = str(settings.IDEMPOTENCY_RETRY_AFTER_SECONDS)
+            return response
+
+        try:
+            # The first request may have stored its result and released the lock
+            # between our cache miss and acquire_lock
+            stored = cache.get(cache_key)
+            if stored is not None:
+                return _replay(stored, fingerprint)
+
+            response = view_func(request, *args, **kwargs)
+            if response.status_code < 500 and response.status_code not in RETRYABLE_STATUS_CODES:
+                cache.set(cache_key, {
+                    'fingerprint': fingerprint,
+                    'status': response.status_code,
+                    'data': response.data,
+                }, timeout=settings.IDEMPOTENCY_KEY_TTL_SECONDS)
+        finally:
+            release_lock(lock_key, token)
+
+        return response
+
+    return wrapper
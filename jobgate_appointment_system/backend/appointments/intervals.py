@@ -0,0 +1,93 @@
+# FileName: MultipleFiles/intervals.py (appointments app)
+"""
+Interval algebra for half-open [start, end) intervals.
+
+sweep_conflicts groups intervals by a key (typically ``(staff_id,
+slot_date)``) and sorts them once, so checking n candidates against m
+existing intervals costs O((n + m) log(n + m)) instead of one overlap query
+per candidate. merge/complement/intersect work on plain (start, end) pairs
+and back the free/busy computation.
+"""
+from collections import namedtuple
+
+Interval = namedtuple('Interval', ['key', 'start', 'end', 'item'])
+
+_EXISTING, _CANDIDATE = 0, 1
+
+
+def sweep_conflicts(existing, candidates):
+    """
+    Split candidates into those that fit and those that overlap something.
+
+    Existing intervals always stand. Candidates are accepted in start order,
+    so of two overlapping candidates the earlier one wins. Returns
+    ``(accepted, conflicts)`` where accepted is a list of candidate intervals
+    and conflicts a list of ``(candidate, blocking_interval)`` pairs.
+    """
+    events = [(iv.key, iv.start, _EXISTING, n, iv) for n, iv in enumerate(existing)]
+    events += [(iv.key, iv.start, _CANDIDATE, n, iv) for n, iv in enumerate(candidates)]
+    # At equal starts existing intervals sort first, so an exact duplicate is a conflict
+    events.sort(key=lambda event: event[:4])
+
+    accepted, conflicts = [], []
+    current_key = object()
+    reach = None  # the standing interval that ends last within the current key
+    for key, _, kind, _, interval in events:
+        if key != current_key:
+            current_key, reach = key, None
+
+        if kind == _CANDIDATE and reach is not None and interval.start < reach.end:
+            conflicts.append((interval, reach))
+            continue
+
+        if kind == _CANDIDATE:
+            accepted.append(interval)
+        if reach is None or interval.end > reach.end:
+            reach = interval
+
+    return accepted, conflicts
+
+
+def merge_intervals(intervals):
+    """Union of (start, end) pairs as a sorted list of disjoint pairs; touching pairs are joined"""
+    merged = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1] = (merged[-1][0], end)
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def complement_intervals(merged, window_start, window_end):
+    """Gaps between sorted disjoint intervals within [window_start, window_end)"""
+    gaps = []
+    cursor = window_start
+    for start, end in merged:
+        if end <= cursor:
+            continue
+        if start >= window_end:
+            break
+        if start > cursor:
+            gaps.append((cursor, start))
+        cursor = max(cursor, end)
+    if cursor < window_end:
+        gaps.append((cursor, window_end))
+    return gaps
+
+
+def intersect_intervals(first, second):
+    """Intersection of two sorted disjoint interval lists (two-pointer walk)"""
+    result = []
+    i = j = 0
+    while i < len(first) and j < len(second):
+        start = max(first[i][0], second[j][0])
+        end = min(first[i][1], second[j][1])
+        if start < end:
+            result.append((start, end))
+        if first[i][1] < second[j][1]:
+            i += 1
+        else:
+            j += 1
+    return result
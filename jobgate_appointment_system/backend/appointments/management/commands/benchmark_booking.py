@@ -0,0 +1,92 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from appointments.benchmarks import run_booking_benchmark
+
+# Metrics compared against a baseline: (label, path into the results, higher is better)
+COMPARED_METRICS = [
+    ('bookings/sec', ('bookings_per_second',), True),
+    ('requests/sec', ('requests_per_second',), True),
+    ('book p50 ms', ('book_latency', 'p50_ms'), False),
+    ('book p95 ms', ('book_latency', 'p95_ms'), False),
+    ('book p99 ms', ('book_latency', 'p99_ms'), False),
+    ('cancel p50 ms', ('cancel_latency', 'p50_ms'), False),
+    ('cancel p95 ms', ('cancel_latency', 'p95_ms'), False),
+    ('cancel p99 ms', ('cancel_latency', 'p99_ms'), False),
+    ('lock wait s', ('lock_wait_seconds',), False),
+]
+
+
+def _lookup(results, path):
+    for key in path:
+        if results is None:
+            return None
+        results = results.get(key)
+    return results
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed a throwaway agenda and drive book/cancel concurrently to measure booking "
+        "throughput, latency percentiles, lock waits and capacity violations."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--slots', type=int, default=5, help='Slots to contend for (max 60)')
+        parser.add_argument('--capacity', type=int, default=3, help='Seats per slot')
+        parser.add_argument('--operations', type=int, default=50, help='Requests per thread')
+        parser.add_argument('--cancel-ratio', type=float, default=0.3)
+        parser.add_argument('--talents-per-thread', type=int, default=10)
+        parser.add_argument('--seed', type=int, default=None)
+        parser.add_argument('--with-notifications', action='store_true',
+                            help='Really queue the Celery notification tasks')
+        parser.add_argument('--keep-data', action='store_true',
+                            help='Leave the seeded agenda, slots and users in the database')
+        parser.add_argument('--output', help='Write the results as JSON to this file')
+        parser.add_argument('--baseline', help='Compare against results previously written with --output')
+
+    def handle(self, *args, **options):
+        if not 1 <= options['slots'] <= 60:
+            raise CommandError('--slots must be between 1 and 60')
+
+        results = run_booking_benchmark(
+            threads=options['threads'],
+            slots=options['slots'],
+            capacity=options['capacity'],
+            operations=options['operations'],
+            cancel_ratio=options['cancel_ratio'],
+            talents_per_thread=options['talents_per_thread'],
+            silence_notifications=not options['with_notifications'],
+            keep_data=options['keep_data'],
+            seed=options['seed'],
+        )
+
+        self.stdout.write(json.dumps(results, indent=2))
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(results, f, indent=2)
+
+        if options['baseline']:
+            with open(options['baseline']) as f:
+                self.print_comparison(json.load(f), results)
+
+        if results['overbooked_slots'] or results['counter_drift_slots']:
+            raise CommandError(
+                f"Capacity violations: overbooked={results['overbooked_slots']} "
+                f"counter_drift={results['counter_drift_slots']}"
+            )
+        self.stdout.write(self.style.SUCCESS('No capacity violations'))
+
+    def print_comparison(self, baseline, results):
+        self.stdout.write(f"\n{'metric':<16}{'baseline':>12}{'current':>12}{'change':>10}")
+        for label, path, higher_is_better in COMPARED_METRICS:
+            before, after = _lookup(baseline, path), _lookup(results, path)
+            if before is None or after is None:
+                continue
+            change = (after - before) / before * 100 if before else 0.0
+            line = f"{label:<16}{before:>12}{after:>12}{change:>+9.1f}%"
+            improved = change >= 0 if higher_is_better else change <= 0
+            self.stdout.write(self.style.SUCCESS(line) if improved else self.style.WARNING(line))
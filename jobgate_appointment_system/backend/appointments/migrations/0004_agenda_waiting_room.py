@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:41
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appointments', '0003_waitlistentry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='agenda',
+            name='waiting_room_admit_per_minute',
+            field=models.PositiveIntegerField(default=60, validators=[django.core.validators.MinValueValidator(1)]),
+        ),
+        migrations.AddField(
+            model_name='agenda',
+            name='waiting_room_enabled',
+            field=models.BooleanField(default=False),
+        ),
+    ]
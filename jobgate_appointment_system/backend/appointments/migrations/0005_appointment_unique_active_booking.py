@@ -0,0 +1,42 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:49
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, F
+
+
+def cancel_duplicate_bookings(apps, schema_editor):
+    # Older code could race two active bookings onto the same slot; keep the
+    # earliest one and give the seats of the others back
+    Appointment = apps.get_model('appointments', 'Appointment')
+    CalendarSlot = apps.get_model('appointments', 'CalendarSlot')
+    active = Appointment.objects.filter(status__in=['pending', 'confirmed'])
+    duplicated = active.values('calendar_slot_id', 'talent_id').annotate(n=Count('id')).filter(n__gt=1)
+    for pair in duplicated:
+        extra_ids = list(active.filter(
+            calendar_slot_id=pair['calendar_slot_id'], talent_id=pair['talent_id']
+        ).order_by('booked_at', 'id').values_list('id', flat=True)[1:])
+        Appointment.objects.filter(id__in=extra_ids).update(status='cancelled', cancelled_at=F('updated_at'))
+        CalendarSlot.objects.filter(
+            id=pair['calendar_slot_id'], current_bookings__gte=len(extra_ids)
+        ).update(current_bookings=F('current_bookings') - len(extra_ids))
+        # A slot that was only full because of the duplicates can be booked again
+        CalendarSlot.objects.filter(
+            id=pair['calendar_slot_id'], status='fully_booked', current_bookings__lt=F('max_capacity')
+        ).update(status='available')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appointments', '0004_agenda_waiting_room'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(cancel_duplicate_bookings, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='appointment',
+            constraint=models.UniqueConstraint(condition=models.Q(('status__in', ['pending', 'confirmed'])), fields=('calendar_slot', 'talent'), name='unique_active_appointment_per_slot'),
+        ),
+    ]
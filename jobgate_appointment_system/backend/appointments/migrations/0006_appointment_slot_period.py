@@ -0,0 +1,80 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:52
+
+import django.contrib.postgres.constraints
+import django.contrib.postgres.fields.ranges
+import django.db.models.expressions
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, F
+
+ACTIVE_STATUSES = ['pending', 'confirmed']
+
+
+def backfill_slot_period(apps, schema_editor):
+    # Slot dates/times are naive wall-clock values in settings.TIME_ZONE
+    schema_editor.execute(
+        """
+        UPDATE appointments a
+        SET slot_period = tstzrange(
+            (s.slot_date + s.start_time) AT TIME ZONE %s,
+            (s.slot_date + s.end_time) AT TIME ZONE %s,
+            '[)'
+        )
+        FROM calendar_slots s
+        WHERE s.id = a.calendar_slot_id
+        """,
+        [settings.TIME_ZONE, settings.TIME_ZONE],
+    )
+
+
+def cancel_overlapping_bookings(apps, schema_editor):
+    # Older code could book a talent into two slots at the same time; keep the
+    # earliest booking and give the seats of the ones overlapping it back
+    Appointment = apps.get_model('appointments', 'Appointment')
+    CalendarSlot = apps.get_model('appointments', 'CalendarSlot')
+    active = Appointment.objects.filter(status__in=ACTIVE_STATUSES)
+    # The rows were just backfilled in this transaction, so updating them again
+    # would queue deferred foreign key checks that block the ALTER TABLE below
+    schema_editor.execute('SET CONSTRAINTS ALL IMMEDIATE')
+    busy_days = active.values('talent_id', 'calendar_slot__slot_date').annotate(n=Count('id')).filter(n__gt=1)
+    for day in busy_days:
+        bookings = active.filter(
+            talent_id=day['talent_id'], calendar_slot__slot_date=day['calendar_slot__slot_date']
+        ).order_by('booked_at', 'id').values_list(
+            'id', 'calendar_slot_id', 'calendar_slot__start_time', 'calendar_slot__end_time'
+        )
+        kept = []
+        for appointment_id, slot_id, start, end in bookings:
+            if not any(start < kept_end and kept_start < end for kept_start, kept_end in kept):
+                kept.append((start, end))
+                continue
+            Appointment.objects.filter(id=appointment_id).update(status='cancelled', cancelled_at=F('updated_at'))
+            CalendarSlot.objects.filter(id=slot_id, current_bookings__gte=1).update(
+                current_bookings=F('current_bookings') - 1
+            )
+            CalendarSlot.objects.filter(
+                id=slot_id, status='fully_booked', current_bookings__lt=F('max_capacity')
+            ).update(status='available')
+    schema_editor.execute('SET CONSTRAINTS ALL DEFERRED')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appointments', '0005_appointment_unique_active_booking'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='appointment',
+            name='slot_period',
+            field=django.contrib.postgres.fields.ranges.DateTimeRangeField(blank=True, editable=False, null=True),
+        ),
+        migrations.RunPython(backfill_slot_period, migrations.RunPython.noop),
+        migrations.RunPython(cancel_overlapping_bookings, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='appointment',
+            constraint=django.contrib.postgres.constraints.ExclusionConstraint(condition=models.Q(('status__in', ['pending', 'confirmed'])), expressions=[(models.Func(models.F('talent'), django.db.models.expressions.CombinedExpression(models.F('talent'), '+', models.Value(1)), function='int8range', output_field=django.contrib.postgres.fields.ranges.BigIntegerRangeField()), '&&'), ('slot_period', '&&')], name='exclude_overlapping_talent_appointments'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:57
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appointments', '0006_appointment_slot_period'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='agenda',
+            name='horizon_weeks',
+            field=models.PositiveIntegerField(blank=True, null=True, validators=[django.core.validators.MinValueValidator(1)]),
+        ),
+        migrations.AddField(
+            model_name='agenda',
+            name='materialized_until',
+            field=models.DateField(blank=True, null=True),
+        ),
+    ]
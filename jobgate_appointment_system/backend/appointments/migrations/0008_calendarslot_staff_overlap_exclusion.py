@@ -0,0 +1,66 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:00
+
+import appointments.models
+import django.contrib.postgres.constraints
+import django.contrib.postgres.fields.ranges
+import django.db.models.expressions
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Exists, OuterRef
+
+
+def cancel_overlapping_staff_slots(apps, schema_editor):
+    # Older code let a staff member hold overlapping slots. Keep the booked
+    # (then the earliest) slot of each overlap and cancel the empty slots
+    # overlapping it. Two booked slots that overlap need someone to move one
+    # of the bookings, so they are reported and the migration stops.
+    CalendarSlot = apps.get_model('appointments', 'CalendarSlot')
+    Appointment = apps.get_model('appointments', 'Appointment')
+    live = CalendarSlot.objects.exclude(status='cancelled')
+    booked = Exists(Appointment.objects.filter(calendar_slot=OuterRef('pk'), status__in=['pending', 'confirmed']))
+    busy_days = live.values('staff_id', 'slot_date').annotate(n=Count('id')).filter(n__gt=1)
+    cancelled_ids, unresolved = [], []
+    for day in busy_days:
+        slots = live.filter(staff_id=day['staff_id'], slot_date=day['slot_date']).annotate(
+            booked=booked
+        ).order_by('-booked', 'created_at', 'id').values_list('id', 'start_time', 'end_time', 'booked')
+        kept = []
+        for slot_id, start, end, has_bookings in slots:
+            clashes = [kept_id for kept_id, kept_start, kept_end in kept if start < kept_end and kept_start < end]
+            if not clashes:
+                kept.append((slot_id, start, end))
+            elif has_bookings:
+                unresolved.append(f"{slot_id} overlaps {', '.join(map(str, clashes))}")
+            else:
+                cancelled_ids.append(slot_id)
+    if unresolved:
+        raise RuntimeError(
+            'Booked calendar slots of the same staff member overlap; move or cancel the bookings '
+            'of one slot of each pair and migrate again: ' + '; '.join(unresolved)
+        )
+    # Adding `period` rewrote the table in this transaction, so updating it would
+    # queue deferred foreign key checks that block the ALTER TABLE below
+    schema_editor.execute('SET CONSTRAINTS ALL IMMEDIATE')
+    CalendarSlot.objects.filter(id__in=cancelled_ids).update(status='cancelled')
+    schema_editor.execute('SET CONSTRAINTS ALL DEFERRED')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appointments', '0007_agenda_rolling_horizon'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='calendarslot',
+            name='period',
+            field=models.GeneratedField(db_persist=True, expression=models.Func(models.ExpressionWrapper(django.db.models.expressions.CombinedExpression(models.F('slot_date'), '+', models.F('start_time')), output_field=models.DateTimeField()), models.ExpressionWrapper(django.db.models.expressions.CombinedExpression(models.F('slot_date'), '+', models.F('end_time')), output_field=models.DateTimeField()), models.Value('[)'), function='tsrange', output_field=appointments.models.TimestampRangeField()), output_field=appointments.models.TimestampRangeField()),
+        ),
+        migrations.RunPython(cancel_overlapping_staff_slots, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='calendarslot',
+            constraint=django.contrib.postgres.constraints.ExclusionConstraint(condition=models.Q(('status', 'cancelled'), _negated=True), expressions=[(models.Func(models.F('staff'), django.db.models.expressions.CombinedExpression(models.F('staff'), '+', models.Value(1)), function='int8range', output_field=django.contrib.postgres.fields.ranges.BigIntegerRangeField()), '&&'), ('period', '&&')], name='exclude_overlapping_staff_slots'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:03
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appointments', '0008_calendarslot_staff_overlap_exclusion'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='calendarslot',
+            index=models.Index(fields=['staff', 'slot_date'], name='slot_staff_date_idx'),
+        ),
+    ]
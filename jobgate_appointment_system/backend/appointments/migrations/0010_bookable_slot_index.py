@@ -0,0 +1,56 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:06
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def populate_bookable_slots(apps, schema_editor):
+    # Same rules as appointments.next_available; slot times are wall-clock in settings.TIME_ZONE
+    schema_editor.execute(
+        """
+        INSERT INTO bookable_slots
+            (slot_id, agenda_id, theme_id, university_id, meeting_type, starts_at, bookable_until, free_seats)
+        SELECT s.id, s.agenda_id, a.theme_id, a.university_id, s.meeting_type,
+               (s.slot_date + s.start_time) AT TIME ZONE %s,
+               (s.slot_date + s.start_time) AT TIME ZONE %s - make_interval(hours => a.booking_deadline_hours),
+               s.max_capacity - s.current_bookings
+        FROM calendar_slots s
+        JOIN agendas a ON a.id = s.agenda_id
+        WHERE s.status = 'available'
+          AND s.current_bookings < s.max_capacity
+          AND a.is_active
+          AND (s.slot_date + s.start_time) AT TIME ZONE %s
+              - make_interval(hours => a.booking_deadline_hours) > now()
+        """,
+        [settings.TIME_ZONE] * 3,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appointments', '0009_calendarslot_staff_date_index'),
+        ('universities', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BookableSlot',
+            fields=[
+                ('slot', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='bookable_entry', serialize=False, to='appointments.calendarslot')),
+                ('meeting_type', models.CharField(choices=[('in_person', 'In Person'), ('online', 'Online'), ('phone', 'Phone')], max_length=20)),
+                ('starts_at', models.DateTimeField()),
+                ('bookable_until', models.DateTimeField()),
+                ('free_seats', models.PositiveIntegerField()),
+                ('agenda', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='appointments.agenda')),
+                ('theme', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='appointments.appointmenttheme')),
+                ('university', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='universities.universityprofile')),
+            ],
+            options={
+                'db_table': 'bookable_slots',
+                'indexes': [models.Index(fields=['starts_at'], name='bookable_starts_idx'), models.Index(fields=['theme', 'starts_at'], name='bookable_theme_starts_idx'), models.Index(fields=['university', 'starts_at'], name='bookable_univ_starts_idx'), models.Index(fields=['agenda', 'starts_at'], name='bookable_agenda_starts_idx')],
+            },
+        ),
+        migrations.RunPython(populate_bookable_slots, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:15
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appointments', '0011_staff_availability'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='calendarslot',
+            index=models.Index(fields=['agenda', 'slot_date', 'start_time', 'id'], name='slot_agenda_keyset_idx'),
+        ),
+    ]
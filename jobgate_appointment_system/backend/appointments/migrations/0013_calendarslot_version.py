@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appointments', '0012_calendarslot_agenda_keyset_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='calendarslot',
+            name='version',
+            field=models.PositiveBigIntegerField(default=0, editable=False),
+        ),
+    ]
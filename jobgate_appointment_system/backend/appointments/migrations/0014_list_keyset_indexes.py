@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:28
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appointments', '0013_calendarslot_version'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['-created_at', 'id'], name='appointment_created_keyset_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['talent', '-created_at', 'id'], name='appointment_talent_keyset_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='calendarslot',
+            index=models.Index(fields=['slot_date', 'start_time', 'id'], name='slot_date_keyset_idx'),
+        ),
+    ]
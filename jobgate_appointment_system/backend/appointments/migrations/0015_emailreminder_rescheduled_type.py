@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-17 04:10
+
+from django.db import migrations, models
+
+
+def relabel_reschedule_emails(apps, schema_editor):
+    # Reschedule emails used to be logged as confirmations; their subject tells them apart
+    EmailReminder = apps.get_model('appointments', 'EmailReminder')
+    EmailReminder.objects.filter(
+        reminder_type='confirmation', subject__startswith='Appointment Rescheduled - '
+    ).update(reminder_type='rescheduled')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appointments', '0014_list_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='emailreminder',
+            name='reminder_type',
+            field=models.CharField(choices=[('confirmation', 'Confirmation'), ('24_hour', '24 Hour Reminder'), ('1_hour', '1 Hour Reminder'), ('cancellation', 'Cancellation'), ('rescheduled', 'Rescheduled'), ('follow_up', 'Follow Up')], max_length=20),
+        ),
+        migrations.RunPython(relabel_reschedule_emails, migrations.RunPython.noop),
+    ]
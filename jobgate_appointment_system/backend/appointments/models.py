@@ -1,8 +1,13 @@
 # FileName: MultipleFiles/models.py (appointments app)
-from django.db import models
+import uuid
+from datetime import datetime
+
+from django.db import models, transaction
+from django.db.backends.postgresql.psycopg_any import DateTimeRange, DateTimeTZRange
+from django.contrib.postgres.constraints import ExclusionConstraint
+from django.contrib.postgres.fields import BigIntegerRangeField, DateTimeRangeField, RangeField, RangeOperators
 from django.utils import timezone
 from django.core.validators import MinValueValidator, MaxValueValidator
-import uuid
 
 # Import the correct models from universities and users
 from universities.models import UniversityProfile # Import UniversityProfile
@@ -37,8 +42,15 @@ class Agenda(models.Model):
     end_date = models.DateField()
     is_recurring = models.BooleanField(default=False)
     recurrence_pattern = models.JSONField(default=dict, blank=True)
+    # Rolling horizon: when set, recurring slots are only materialized this
+    # many weeks ahead (see appointments.recurrence.extend_horizon)
+    horizon_weeks = models.PositiveIntegerField(null=True, blank=True, validators=[MinValueValidator(1)])
+    materialized_until = models.DateField(null=True, blank=True)
     booking_deadline_hours = models.PositiveIntegerField(default=24)
     cancellation_deadline_hours = models.PositiveIntegerField(default=24)
+    # Admission control for high-demand openings (see appointments.waiting_room)
+    waiting_room_enabled = models.BooleanField(default=False)
+    waiting_room_admit_per_minute = models.PositiveIntegerField(default=60, validators=[MinValueValidator(1)])
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(default=timezone.now)
     updated_at = models.DateTimeField(auto_now=True)
@@ -55,6 +67,17 @@ class Agenda(models.Model):
             )
         ]
 
+class TimestampRangeField(RangeField):
+    """A Postgres tsrange: a range of naive timestamps (Django only ships tstzrange)"""
+    base_field = models.DateTimeField
+    range_type = DateTimeRange
+
+    def db_type(self, connection):
+        return 'tsrange'
+
+# Fields that make up a slot's time window
+WINDOW_FIELDS = ('slot_date', 'start_time', 'end_time')
+
 class CalendarSlot(models.Model):
     STATUS_CHOICES = [
         ('available', 'Available'),
@@ -82,15 +105,80 @@ class CalendarSlot(models.Model):
     location = models.CharField(max_length=255, blank=True, null=True)
     meeting_type = models.CharField(max_length=20, choices=MEETING_TYPE_CHOICES, default='in_person')
     meeting_link = models.URLField(max_length=500, blank=True, null=True)
+    # Bumped in SQL by every write, under the row lock, so it orders the
+    # slot's states by commit (see appointments.slot_snapshots)
+    version = models.PositiveBigIntegerField(default=0, editable=False)
+    # [slot_date + start_time, slot_date + end_time), maintained by Postgres;
+    # backs the staff overlap exclusion constraint
+    period = models.GeneratedField(
+        expression=models.Func(
+            models.ExpressionWrapper(models.F('slot_date') + models.F('start_time'), output_field=models.DateTimeField()),
+            models.ExpressionWrapper(models.F('slot_date') + models.F('end_time'), output_field=models.DateTimeField()),
+            models.Value('[)'),
+            function='tsrange',
+            output_field=TimestampRangeField(),
+        ),
+        output_field=TimestampRangeField(),
+        db_persist=True,
+    )
     created_at = models.DateTimeField(default=timezone.now)
     updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return f"{self.agenda.name} - {self.slot_date} {self.start_time}"
 
+    @property
+    def slot_period(self):
+        """The slot's [start, end) window as a timezone-aware range"""
+        return DateTimeTZRange(
+            timezone.make_aware(datetime.combine(self.slot_date, self.start_time)),
+            timezone.make_aware(datetime.combine(self.slot_date, self.end_time)),
+            '[)'
+        )
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # The window as loaded, so save() only touches bookings when it moved
+        if set(WINDOW_FIELDS).issubset(field_names):
+            instance._loaded_window = instance._window()
+        return instance
+
+    def _window(self):
+        return tuple(getattr(self, field) for field in WINDOW_FIELDS)
+
+    def save(self, *args, **kwargs):
+        adding = self._state.adding
+        update_fields = kwargs.get('update_fields')
+        moved = (
+            not adding
+            and getattr(self, '_loaded_window', None) != self._window()
+            and (update_fields is None or not set(WINDOW_FIELDS).isdisjoint(update_fields))
+        )
+        if not adding:
+            self.version = models.F('version') + 1
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'version'}
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if moved:
+                # Keep the copy of the window on existing bookings in step; this
+                # can hit exclude_overlapping_talent_appointments (see save_slot)
+                self.appointments.exclude(slot_period=self.slot_period).update(slot_period=self.slot_period)
+        if not adding:
+            self.refresh_from_db(fields=['version'])
+        self._loaded_window = self._window()
+
     class Meta:
         db_table = 'calendar_slots'
         unique_together = ['agenda', 'staff', 'slot_date', 'start_time']
+        indexes = [
+            # Per-staff date range scans (free/busy, bulk overlap checks)
+            models.Index(fields=['staff', 'slot_date'], name='slot_staff_date_idx'),
+            # Keyset pagination of an agenda's slots and of all slots
+            models.Index(fields=['agenda', 'slot_date', 'start_time', 'id'], name='slot_agenda_keyset_idx'),
+            models.Index(fields=['slot_date', 'start_time', 'id'], name='slot_date_keyset_idx'),
+        ]
         constraints = [
             models.CheckConstraint(
                 check=models.Q(end_time__gt=models.F('start_time')),
@@ -99,6 +187,22 @@ class CalendarSlot(models.Model):
             models.CheckConstraint(
                 check=models.Q(current_bookings__lte=models.F('max_capacity')),
                 name='valid_capacity'
+            ),
+            # A staff member cannot run two live slots at overlapping times.
+            # Same int8range trick as on appointments: no btree_gist needed.
+            ExclusionConstraint(
+                name='exclude_overlapping_staff_slots',
+                expressions=[
+                    (
+                        models.Func(
+                            models.F('staff'), models.F('staff') + 1,
+                            function='int8range', output_field=BigIntegerRangeField()
+                        ),
+                        RangeOperators.OVERLAPS
+                    ),
+                    ('period', RangeOperators.OVERLAPS),
+                ],
+                condition=~models.Q(status='cancelled'),
             )
         ]
 
@@ -113,6 +217,8 @@ class Appointment(models.Model):
 
     calendar_slot = models.ForeignKey(CalendarSlot, on_delete=models.CASCADE, related_name='appointments')
     talent = models.ForeignKey(User, on_delete=models.CASCADE, related_name='appointments')
+    # Copy of calendar_slot.slot_period so overlapping bookings can be excluded by the database
+    slot_period = DateTimeRangeField(null=True, blank=True, editable=False)
     booking_reference = models.CharField(max_length=50, unique=True, default=uuid.uuid4)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='confirmed')
     talent_notes = models.TextField(blank=True, null=True)
@@ -135,8 +241,109 @@ class Appointment(models.Model):
     def __str__(self):
         return f"{self.booking_reference} - {self.talent.email}"
 
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or 'calendar_slot' in update_fields:
+            self.slot_period = self.calendar_slot.slot_period
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'slot_period'}
+        super().save(*args, **kwargs)
+
     class Meta:
         db_table = 'appointments'
+        constraints = [
+            # One active booking per talent and slot; booking relies on this
+            # instead of checking for duplicates before inserting
+            models.UniqueConstraint(
+                fields=['calendar_slot', 'talent'],
+                condition=models.Q(status__in=['pending', 'confirmed']),
+                name='unique_active_appointment_per_slot'
+            ),
+            # A talent cannot hold two active bookings whose windows overlap,
+            # whichever agendas they belong to. The talent is compared as the
+            # one-element range [talent_id, talent_id + 1) so the GiST index
+            # only needs built-in range opclasses, not the btree_gist extension.
+            ExclusionConstraint(
+                name='exclude_overlapping_talent_appointments',
+                expressions=[
+                    (
+                        models.Func(
+                            models.F('talent'), models.F('talent') + 1,
+                            function='int8range', output_field=BigIntegerRangeField()
+                        ),
+                        RangeOperators.OVERLAPS
+                    ),
+                    ('slot_period', RangeOperators.OVERLAPS),
+                ],
+                condition=models.Q(status__in=['pending', 'confirmed']),
+            )
+        ]
+        indexes = [
+            # Keyset pagination of appointment lists, newest first (all, and a talent's own)
+            models.Index(fields=['-created_at', 'id'], name='appointment_created_keyset_idx'),
+            models.Index(fields=['talent', '-created_at', 'id'], name='appointment_talent_keyset_idx'),
+        ]
+
+class WaitlistEntry(models.Model):
+    STATUS_CHOICES = [
+        ('waiting', 'Waiting'),
+        ('promoted', 'Promoted'),
+        ('cancelled', 'Cancelled'),
+    ]
+
+    calendar_slot = models.ForeignKey(CalendarSlot, on_delete=models.CASCADE, related_name='waitlist_entries')
+    talent = models.ForeignKey(User, on_delete=models.CASCADE, related_name='waitlist_entries')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='waiting')
+    talent_notes = models.TextField(blank=True, null=True)
+    # Set when a freed seat is handed to this talent
+    appointment = models.OneToOneField(
+        Appointment, on_delete=models.SET_NULL, null=True, blank=True, related_name='waitlist_entry'
+    )
+    promoted_at = models.DateTimeField(blank=True, null=True)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"{self.talent.email} waiting for {self.calendar_slot}"
+
+    class Meta:
+        db_table = 'waitlist_entries'
+        ordering = ['created_at', 'id']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['calendar_slot', 'talent'],
+                condition=models.Q(status='waiting'),
+                name='unique_waiting_entry_per_slot'
+            )
+        ]
+        indexes = [
+            # FIFO head lookup: WHERE calendar_slot_id = ? AND status = 'waiting' ORDER BY created_at, id
+            models.Index(fields=['calendar_slot', 'status', 'created_at', 'id'], name='waitlist_queue_idx'),
+        ]
+
+class BookableSlot(models.Model):
+    """
+    Denormalized index of the slots that can currently be booked, one row per
+    slot, kept in step by appointments.next_available. Answers "earliest
+    slots for theme/university/meeting type" without joining agendas.
+    """
+    slot = models.OneToOneField(CalendarSlot, on_delete=models.CASCADE, primary_key=True, related_name='bookable_entry')
+    agenda = models.ForeignKey(Agenda, on_delete=models.CASCADE, related_name='+', db_index=False)
+    theme = models.ForeignKey(AppointmentTheme, on_delete=models.CASCADE, related_name='+', db_index=False)
+    university = models.ForeignKey(UniversityProfile, on_delete=models.CASCADE, related_name='+', db_index=False)
+    meeting_type = models.CharField(max_length=20, choices=CalendarSlot.MEETING_TYPE_CHOICES)
+    starts_at = models.DateTimeField()
+    # starts_at minus the agenda's booking deadline
+    bookable_until = models.DateTimeField()
+    free_seats = models.PositiveIntegerField()
+
+    class Meta:
+        db_table = 'bookable_slots'
+        indexes = [
+            models.Index(fields=['starts_at'], name='bookable_starts_idx'),
+            models.Index(fields=['theme', 'starts_at'], name='bookable_theme_starts_idx'),
+            models.Index(fields=['university', 'starts_at'], name='bookable_univ_starts_idx'),
+            models.Index(fields=['agenda', 'starts_at'], name='bookable_agenda_starts_idx'),
+        ]
 
 class AppointmentStatistics(models.Model):
     # Changed from universities.University to universities.UniversityProfile
@@ -169,6 +376,7 @@ class EmailReminder(models.Model):
         ('24_hour', '24 Hour Reminder'),
         ('1_hour', '1 Hour Reminder'),
         ('cancellation', 'Cancellation'),
+        ('rescheduled', 'Rescheduled'),
         ('follow_up', 'Follow Up'),
     ]
 
@@ -216,6 +424,24 @@ class AgendaStaffAssignment(models.Model):
         db_table = 'agenda_staff_assignments'
         unique_together = ['agenda', 'staff']
 
+class StaffAvailability(models.Model):
+    """
+    Weekly availability template of a staff member: one bit per 5-minute bin
+    of the week, Monday 00:00 first (see appointments.availability).
+    """
+    staff = models.OneToOneField(User, on_delete=models.CASCADE, related_name='availability_template')
+    bitmap = models.BinaryField(max_length=252)
+    # [{"date": "YYYY-MM-DD", "start"?: "HH:MM", "end"?: "HH:MM"}], masked out of the week
+    exceptions = models.JSONField(default=list, blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Availability of {self.staff.email}"
+
+    class Meta:
+        db_table = 'staff_availability_templates'
+
 class TalentEligibilityCriteria(models.Model):
     CRITERIA_TYPE_CHOICES = [
         ('university', 'University'),
@@ -0,0 +1,95 @@
+# FileName: MultipleFiles/next_available.py (appointments app)
+"""
+"Next available slot" index.
+
+``bookable_slots`` holds one row per calendar slot that can be booked right
+now (available, with free seats, in an active agenda, not yet started),
+carrying the agenda's theme and university and the slot's start time, so
+"the first N slots for theme X after T" is a single range scan on
+``(theme, starts_at)`` instead of a join over agendas and slots.
+
+Rows are never edited in place: every code path that changes a slot's
+bookability (booking, cancelling, rescheduling, creating or editing slots,
+editing an agenda) reports it through appointments.slot_changes, and the
+affected rows are re-derived from calendar_slots; for slot changes that
+happens in a short transaction of its own once the change has committed. Slots
+whose booking deadline passes simply fall out of the lookups; the nightly
+rebuild_next_available_index task removes them and repairs anything changed
+behind the API's back (admin edits, raw SQL).
+"""
+from datetime import datetime, timedelta
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import BookableSlot, CalendarSlot
+
+DEFAULT_LIMIT = 10
+MAX_LIMIT = 50
+
+
+def _index_rows(slots):
+    now = timezone.now()
+    rows = []
+    for slot in slots.filter(
+        status='available',
+        current_bookings__lt=F('max_capacity'),
+        agenda__is_active=True,
+        slot_date__gte=now.date() - timedelta(days=1),
+    ).select_related('agenda'):
+        starts_at = timezone.make_aware(datetime.combine(slot.slot_date, slot.start_time))
+        bookable_until = starts_at - timedelta(hours=slot.agenda.booking_deadline_hours)
+        if bookable_until <= now:
+            continue
+        rows.append(BookableSlot(
+            slot_id=slot.id,
+            agenda_id=slot.agenda_id,
+            theme_id=slot.agenda.theme_id,
+            university_id=slot.agenda.university_id,
+            meeting_type=slot.meeting_type,
+            starts_at=starts_at,
+            bookable_until=bookable_until,
+            free_seats=slot.max_capacity - slot.current_bookings,
+        ))
+    return rows
+
+
+def refresh_slots(slot_ids):
+    """Re-derive the index rows of the given slots from their committed state"""
+    slot_ids = list(slot_ids)
+    if not slot_ids:
+        return
+    with transaction.atomic():
+        # Refreshes of the same slot queue up here, so the last one reads the latest seats
+        list(CalendarSlot.objects.select_for_update().filter(id__in=slot_ids).order_by('id').values_list('id'))
+        BookableSlot.objects.filter(slot_id__in=slot_ids).delete()
+        BookableSlot.objects.bulk_create(_index_rows(CalendarSlot.objects.filter(id__in=slot_ids)))
+
+
+def refresh_agendas(agenda_ids):
+    """Re-derive the index rows of every slot of the given agendas"""
+    agenda_ids = list(agenda_ids)
+    with transaction.atomic():
+        BookableSlot.objects.filter(agenda_id__in=agenda_ids).delete()
+        BookableSlot.objects.bulk_create(_index_rows(CalendarSlot.objects.filter(agenda_id__in=agenda_ids)))
+
+
+def rebuild():
+    """Rebuild the whole index from calendar_slots; returns the number of indexed slots"""
+    with transaction.atomic():
+        BookableSlot.objects.all().delete()
+        return len(BookableSlot.objects.bulk_create(_index_rows(CalendarSlot.objects.all()), batch_size=1000))
+
+
+def next_available(theme_id=None, university_id=None, meeting_type=None, after=None, limit=DEFAULT_LIMIT):
+    """The first `limit` bookable slots starting at or after `after` (default now), earliest first"""
+    now = timezone.now()
+    queryset = BookableSlot.objects.filter(starts_at__gte=max(after or now, now), bookable_until__gt=now)
+    if theme_id:
+        queryset = queryset.filter(theme_id=theme_id)
+    if university_id:
+        queryset = queryset.filter(university_id=university_id)
+    if meeting_type:
+        queryset = queryset.filter(meeting_type=meeting_type)
+    return queryset.select_related('slot').order_by('starts_at', 'slot_id')[:limit]
@@ -0,0 +1,347 @@
+# FileName: MultipleFiles/recurrence.py (appointments app)
+"""
+Recurrence engine that turns ``Agenda.recurrence_pattern`` into calendar slots.
+
+A pattern is a small RRULE-like dict::
+
+    {
+        "freq": "weekly",                 # "daily", "weekly" or "monthly"
+        "interval": 1,                    # every n days/weeks/months
+        "by_weekday": ["MO", "WE"],       # weekly only, defaults to start_date's weekday
+        "times": [{"start": "09:00", "end": "12:00"}],
+        "exceptions": ["2026-12-25"],     # dates that are skipped
+        "staff_ids": [12, 15],            # each window is offered by every listed staff member
+        "max_capacity": 2,                # optional, defaults to max_capacity_per_slot
+        "location": "...", "meeting_type": "online", "meeting_link": "..."
+    }
+
+Each time window is cut into ``slot_duration_minutes`` slots. The legacy
+``{"type": "weekly" | "bi-weekly" | "monthly"}`` form written by the frontend
+is understood as well. The whole date range is expanded in memory, checked
+against the staff members' existing slots with one query and a single sweep
+(see appointments.intervals), and inserted with batched ``bulk_create``.
+Slots outside a staff member's weekly availability template
+(appointments.availability) are not generated.
+
+Agendas with ``horizon_weeks`` are materialized lazily instead: only the next
+N weeks exist as rows, the periodic ``extend_slot_horizons`` task moves the
+horizon forward and ``available_slots_view`` extends it on demand when a
+client looks further ahead. ``materialized_until`` records how far we got.
+"""
+from collections import namedtuple
+from datetime import date, datetime, time, timedelta
+
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from users.models import User
+from .availability import covers, load_templates, range_bits
+from .booking import is_constraint_violation
+from .bulk_slots import BULK_CREATE_BATCH_SIZE, STAFF_OVERLAP_CONSTRAINT, cancelled_slot_keys, existing_slot_intervals
+from .intervals import Interval, sweep_conflicts
+from .models import Agenda, CalendarSlot
+from .slot_changes import agendas_changed, slots_changed
+
+WEEKDAYS = ['MO', 'TU', 'WE', 'TH', 'FR', 'SA', 'SU']
+
+# Legacy {"type": ...} values -> (freq, interval)
+LEGACY_TYPES = {
+    'daily': ('daily', 1),
+    'weekly': ('weekly', 1),
+    'bi-weekly': ('weekly', 2),
+    'monthly': ('monthly', 1),
+}
+
+SLOT_OPTION_FIELDS = ['location', 'meeting_type', 'meeting_link']
+
+RecurrenceRule = namedtuple('RecurrenceRule', [
+    'freq', 'interval', 'weekdays', 'windows', 'exceptions', 'staff_ids', 'max_capacity', 'slot_options',
+])
+
+
+class RecurrenceError(Exception):
+    """A recurrence pattern that cannot be expanded"""
+
+    def __init__(self, message):
+        super().__init__(message)
+        self.message = message
+
+
+def _parse_date(value, field):
+    if isinstance(value, date):
+        return value
+    try:
+        return date.fromisoformat(value)
+    except (TypeError, ValueError):
+        raise RecurrenceError(f'{field} must be a date in YYYY-MM-DD format')
+
+
+def _parse_time(value, field):
+    try:
+        return time.fromisoformat(value)
+    except (TypeError, ValueError):
+        raise RecurrenceError(f'{field} must be a time in HH:MM format')
+
+
+def _parse_weekday(value):
+    if isinstance(value, int) and 0 <= value <= 6:
+        return value
+    if isinstance(value, str) and value.upper()[:2] in WEEKDAYS:
+        return WEEKDAYS.index(value.upper()[:2])
+    raise RecurrenceError(f'Invalid weekday {value!r}; use MO..SU or 0..6')
+
+
+def parse_pattern(agenda, pattern=None):
+    """Validate a recurrence pattern (the agenda's own by default) into a RecurrenceRule"""
+    pattern = agenda.recurrence_pattern if pattern is None else pattern
+    if isinstance(pattern, str):
+        pattern = {'type': pattern}
+    if not isinstance(pattern, dict) or not pattern:
+        raise RecurrenceError('The agenda has no recurrence pattern')
+
+    if 'freq' in pattern:
+        freq, interval = pattern['freq'], pattern.get('interval', 1)
+    elif pattern.get('type') in LEGACY_TYPES:
+        freq, interval = LEGACY_TYPES[pattern['type']]
+        interval = pattern.get('interval', interval)
+    else:
+        raise RecurrenceError('recurrence_pattern.freq must be one of daily, weekly, monthly')
+    if freq not in ('daily', 'weekly', 'monthly'):
+        raise RecurrenceError('recurrence_pattern.freq must be one of daily, weekly, monthly')
+    if not isinstance(interval, int) or interval < 1:
+        raise RecurrenceError('recurrence_pattern.interval must be a positive integer')
+
+    weekdays = frozenset(_parse_weekday(day) for day in pattern.get('by_weekday') or [])
+    if freq == 'weekly' and not weekdays:
+        weekdays = frozenset([agenda.start_date.weekday()])
+
+    windows = []
+    for n, window in enumerate(pattern.get('times') or []):
+        start = _parse_time(window.get('start') if isinstance(window, dict) else None, f'times[{n}].start')
+        end = _parse_time(window.get('end') if isinstance(window, dict) else None, f'times[{n}].end')
+        if end <= start:
+            raise RecurrenceError(f'times[{n}].end must be after times[{n}].start')
+        windows.append((start, end))
+    if not windows:
+        raise RecurrenceError('recurrence_pattern.times needs at least one {"start", "end"} window')
+
+    exceptions = frozenset(_parse_date(value, 'exceptions') for value in pattern.get('exceptions') or [])
+
+    staff_ids = pattern.get('staff_ids')
+    if staff_ids:
+        staff_ids = sorted(set(staff_ids))
+        found = User.objects.filter(id__in=staff_ids, user_type__in=['university_staff', 'admin']).count()
+        if found != len(staff_ids):
+            raise RecurrenceError('recurrence_pattern.staff_ids contains unknown staff members')
+    else:
+        staff_ids = list(agenda.staff_assignments.values_list('staff_id', flat=True)) or [agenda.created_by_id]
+
+    max_capacity = pattern.get('max_capacity', agenda.max_capacity_per_slot)
+    if not isinstance(max_capacity, int) or max_capacity < 1:
+        raise RecurrenceError('recurrence_pattern.max_capacity must be a positive integer')
+
+    slot_options = {field: pattern[field] for field in SLOT_OPTION_FIELDS if pattern.get(field)}
+    meeting_types = dict(CalendarSlot.MEETING_TYPE_CHOICES)
+    if slot_options.get('meeting_type', 'in_person') not in meeting_types:
+        raise RecurrenceError(f"recurrence_pattern.meeting_type must be one of {', '.join(meeting_types)}")
+
+    return RecurrenceRule(freq, interval, weekdays, windows, exceptions, staff_ids, max_capacity, slot_options)
+
+
+def occurrence_dates(rule, anchor, start, end):
+    """Dates in start..end on which the rule fires, counting intervals from anchor"""
+    day = max(start, anchor)
+    while day <= end:
+        if rule.freq == 'daily':
+            fires = (day - anchor).days % rule.interval == 0
+        elif rule.freq == 'weekly':
+            # Whole weeks (Monday-based) since the anchor's week
+            weeks = (day - (anchor - timedelta(days=anchor.weekday()))).days // 7
+            fires = day.weekday() in rule.weekdays and weeks % rule.interval == 0
+        else:
+            months = (day.year - anchor.year) * 12 + day.month - anchor.month
+            fires = day.day == anchor.day and months % rule.interval == 0
+        if fires and day not in rule.exceptions:
+            yield day
+        day += timedelta(days=1)
+
+
+def slot_times(windows, duration_minutes):
+    """Cut each (start, end) window into consecutive slots of duration_minutes"""
+    step = timedelta(minutes=duration_minutes)
+    for window_start, window_end in windows:
+        cursor = datetime.combine(date.min, window_start)
+        limit = datetime.combine(date.min, window_end)
+        while cursor + step <= limit:
+            yield cursor.time(), (cursor + step).time()
+            cursor += step
+
+
+def expand(agenda, rule, start=None, end=None):
+    """Unsaved CalendarSlots for every occurrence of the rule, staff member and slot time"""
+    start = max(start or agenda.start_date, agenda.start_date)
+    end = min(end or agenda.end_date, agenda.end_date)
+    times = list(slot_times(rule.windows, agenda.slot_duration_minutes))
+    return [
+        CalendarSlot(
+            agenda=agenda,
+            staff_id=staff_id,
+            slot_date=day,
+            start_time=slot_start,
+            end_time=slot_end,
+            max_capacity=rule.max_capacity,
+            **rule.slot_options,
+        )
+        for day in occurrence_dates(rule, agenda.start_date, start, end)
+        for staff_id in rule.staff_ids
+        for slot_start, slot_end in times
+    ]
+
+
+def materialize(agenda, pattern=None, start=None, end=None, dry_run=False):
+    """
+    Expand the agenda's pattern over start..end and insert the slots that fit.
+
+    Slots outside the staff member's availability template, or overlapping
+    one of their existing slots (in any agenda) or an earlier generated slot,
+    are skipped and reported, so running it twice is harmless. Returns
+    ``{'created', 'conflicts', 'start_date', 'end_date'}``.
+    """
+    rule = parse_pattern(agenda, pattern)
+    start = max(start or agenda.start_date, agenda.start_date)
+    end = min(end or agenda.end_date, agenda.end_date)
+    if end < start:
+        raise RecurrenceError('end_date must not be before start_date')
+
+    candidates = [
+        Interval((slot.staff_id, slot.slot_date), slot.start_time, slot.end_time, slot)
+        for slot in expand(agenda, rule, start, end)
+    ]
+    availability = {
+        staff_id: range_bits(template, start, end) for staff_id, template in load_templates(rule.staff_ids).items()
+    }
+    available, unavailable = [], []
+    for candidate in candidates:
+        staff_id, slot_date = candidate.key
+        fits = staff_id not in availability or covers(
+            availability[staff_id], start, slot_date, candidate.start, candidate.end
+        )
+        (available if fits else unavailable).append(candidate)
+
+    date_windows = {staff_id: (start, end) for staff_id in rule.staff_ids}
+    accepted, conflicts = sweep_conflicts(existing_slot_intervals(date_windows), available)
+    conflicts = [(candidate, None) for candidate in unavailable] + conflicts
+    # A cancelled slot frees the time but keeps its (agenda, staff, date, start) key
+    cancelled = cancelled_slot_keys(date_windows)
+    if cancelled:
+        kept = []
+        for candidate in accepted:
+            staff_id, slot_date = candidate.key
+            cancelled_id = cancelled.get((agenda.id, staff_id, slot_date, candidate.start))
+            if cancelled_id:
+                blocker = Interval(candidate.key, candidate.start, candidate.end, {
+                    'id': cancelled_id, 'agenda_id': agenda.id, 'cancelled': True
+                })
+                conflicts.append((candidate, blocker))
+            else:
+                kept.append(candidate)
+        accepted = kept
+
+    if not dry_run and accepted:
+        try:
+            with transaction.atomic():
+                slots = CalendarSlot.objects.bulk_create(
+                    [interval.item for interval in accepted], batch_size=BULK_CREATE_BATCH_SIZE
+                )
+                slots_changed(slot.id for slot in slots)
+        except IntegrityError as e:
+            if not is_constraint_violation(e, STAFF_OVERLAP_CONSTRAINT):
+                raise
+            raise RecurrenceError('An overlapping slot was created concurrently; please retry')
+
+    return {
+        'created': len(accepted),
+        'conflicts': [_describe_conflict(agenda, candidate, blocker) for candidate, blocker in conflicts],
+        'start_date': start,
+        'end_date': end,
+    }
+
+
+def _describe_conflict(agenda, candidate, blocker):
+    staff_id, slot_date = candidate.key
+    report = {
+        'staff_id': staff_id,
+        'slot_date': slot_date,
+        'start_time': candidate.start,
+        'end_time': candidate.end,
+    }
+    if blocker is None:
+        report['reason'] = 'outside_availability'
+    elif isinstance(blocker.item, dict) and blocker.item.get('cancelled'):
+        report['reason'] = 'cancelled_slot'
+        report['conflicting_slot_id'] = blocker.item['id']
+    elif isinstance(blocker.item, dict):
+        same = (blocker.item['agenda_id'] == agenda.id and
+                (blocker.start, blocker.end) == (candidate.start, candidate.end))
+        report['reason'] = 'already_exists' if same else 'overlaps_existing_slot'
+        report['conflicting_slot_id'] = blocker.item['id']
+    else:
+        report['reason'] = 'overlaps_generated_slot'
+    return report
+
+
+def uses_horizon(agenda):
+    return bool(agenda.is_recurring and agenda.horizon_weeks)
+
+
+def horizon_end(agenda, today=None):
+    """Last date the rolling horizon should cover right now"""
+    today = today or timezone.now().date()
+    return min(today + timedelta(weeks=agenda.horizon_weeks), agenda.end_date)
+
+
+def extend_horizon(agenda, until=None):
+    """
+    Materialize the agenda's pattern from materialized_until up to `until`.
+
+    `until` defaults to the rolling horizon and is capped at the agenda's
+    end_date. Safe to call concurrently and repeatedly: the agenda row is
+    locked while extending, and already materialized dates are not expanded
+    again. Returns the number of slots created.
+
+    materialized_until is recorded even when nothing could be created (the
+    agenda is over, or its pattern is broken), so polls do not come back to
+    lock the agenda every time; a broken pattern's RecurrenceError is raised
+    once the dates are recorded, and fixed patterns are expanded again with
+    the generate-slots endpoint.
+    """
+    if not uses_horizon(agenda):
+        return 0
+
+    pattern_error = None
+    with transaction.atomic():
+        agenda = Agenda.objects.select_for_update().get(id=agenda.id)
+        target = min(until or horizon_end(agenda), agenda.end_date)
+        if agenda.materialized_until and agenda.materialized_until >= target:
+            return 0
+        # Days that are already over never need slots
+        start = max(agenda.start_date, timezone.now().date())
+        if agenda.materialized_until:
+            start = max(start, agenda.materialized_until + timedelta(days=1))
+
+        created = 0
+        try:
+            parse_pattern(agenda)
+        except RecurrenceError as e:
+            pattern_error = e
+        else:
+            if start <= target:
+                created = materialize(agenda, start=start, end=target)['created']
+        agenda.materialized_until = target
+        agenda.save(update_fields=['materialized_until', 'updated_at'])
+        # materialized_until is part of the agenda's snapshot and ETag
+        agendas_changed([agenda.id])
+
+    if pattern_error:
+        raise pattern_error
+    return created
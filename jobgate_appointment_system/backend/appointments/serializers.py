@@ -1,15 +1,20 @@
 # FileName: MultipleFiles/serializers.py (appointments app)
 from rest_framework import serializers
+from django.conf import settings
+from django.db.models import Q
 from django.utils import timezone
 from datetime import datetime, timedelta
 from .models import (
     AppointmentTheme, Agenda, CalendarSlot, Appointment,
     AppointmentStatistics, EmailReminder, AgendaStaffAssignment,
-    TalentEligibilityCriteria, AppointmentAttachment
+    TalentEligibilityCriteria, AppointmentAttachment, WaitlistEntry, BookableSlot,
+    StaffAvailability
 )
+from .availability import AvailabilityError, format_weekly, from_bytes, parse_exceptions, parse_weekly, to_bytes
 # Import UniversityProfileSerializer from universities.serializers
 from universities.serializers import UniversityProfileSerializer # Assuming you'll create this
 from users.serializers import UserSerializer # Already exists
+from common.serializers import Expand, ExpandableFieldsMixin
 
 # Define a simple serializer for UniversityProfile if not already in universities.serializers
 # Or ensure universities.serializers.UniversityProfileSerializer exists and is correct.
@@ -39,23 +44,26 @@ class AgendaStaffAssignmentSerializer(serializers.ModelSerializer):
         model = AgendaStaffAssignment
         fields = ['id', 'staff', 'role', 'is_primary']
 
-class AgendaSerializer(serializers.ModelSerializer):
-    # University is now UniversityProfile
-    university = UniversityProfileSerializer(read_only=True)
-    # created_by is now a User
-    created_by = UserSerializer(read_only=True)
-    theme = AppointmentThemeSerializer(read_only=True)
-    eligibility_criteria = TalentEligibilityCriteriaSerializer(many=True, read_only=True)
-    staff_assignments = AgendaStaffAssignmentSerializer(many=True, read_only=True)
-
+class AgendaSerializer(ExpandableFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Agenda
         fields = ['id', 'university', 'created_by', 'name', 'description', 'theme',
                  'slot_duration_minutes', 'max_capacity_per_slot', 'start_date', 'end_date',
-                 'is_recurring', 'recurrence_pattern', 'booking_deadline_hours',
-                 'cancellation_deadline_hours', 'is_active', 'created_at', 'updated_at',
-                 'eligibility_criteria', 'staff_assignments']
-        read_only_fields = ['id', 'created_at', 'updated_at']
+                 'is_recurring', 'recurrence_pattern', 'horizon_weeks', 'materialized_until',
+                 'booking_deadline_hours', 'cancellation_deadline_hours',
+                 'waiting_room_enabled', 'waiting_room_admit_per_minute',
+                 'is_active', 'created_at', 'updated_at', 'eligibility_criteria', 'staff_assignments']
+        read_only_fields = ['id', 'materialized_until', 'created_at', 'updated_at']
+        # Nested objects, or ids with ?fields= / ?expand= (see common.serializers)
+        expandable_fields = {
+            # University is now UniversityProfile
+            'university': Expand(UniversityProfileSerializer, related=['base_user']),
+            # created_by is now a User
+            'created_by': Expand(UserSerializer),
+            'theme': Expand(AppointmentThemeSerializer),
+            'eligibility_criteria': Expand(TalentEligibilityCriteriaSerializer, many=True),
+            'staff_assignments': Expand(AgendaStaffAssignmentSerializer, many=True, related=['staff']),
+        }
 
 class AgendaCreateSerializer(serializers.ModelSerializer):
     theme_id = serializers.IntegerField()
@@ -67,8 +75,8 @@ class AgendaCreateSerializer(serializers.ModelSerializer):
         model = Agenda
         fields = ['name', 'description', 'theme_id', 'slot_duration_minutes',
                  'max_capacity_per_slot', 'start_date', 'end_date', 'is_recurring',
-                 'recurrence_pattern', 'booking_deadline_hours', 'cancellation_deadline_hours',
-                 'eligibility_criteria']
+                 'recurrence_pattern', 'horizon_weeks', 'booking_deadline_hours', 'cancellation_deadline_hours',
+                 'waiting_room_enabled', 'waiting_room_admit_per_minute', 'eligibility_criteria']
 
     def validate(self, attrs):
         if attrs['end_date'] < attrs['start_date']:
@@ -95,10 +103,7 @@ class AgendaCreateSerializer(serializers.ModelSerializer):
 
         return agenda
 
-class CalendarSlotSerializer(serializers.ModelSerializer):
-    agenda = AgendaSerializer(read_only=True)
-    # Staff is now a User
-    staff = UserSerializer(read_only=True)
+class CalendarSlotSerializer(ExpandableFieldsMixin, serializers.ModelSerializer):
     available_capacity = serializers.SerializerMethodField()
 
     class Meta:
@@ -107,6 +112,31 @@ class CalendarSlotSerializer(serializers.ModelSerializer):
                  'max_capacity', 'current_bookings', 'available_capacity', 'status',
                  'notes', 'location', 'meeting_type', 'meeting_link', 'created_at', 'updated_at']
         read_only_fields = ['id', 'current_bookings', 'created_at', 'updated_at']
+        expandable_fields = {
+            'agenda': Expand(AgendaSerializer),
+            # Staff is now a User
+            'staff': Expand(UserSerializer),
+        }
+
+    def get_available_capacity(self, obj):
+        return obj.max_capacity - obj.current_bookings
+
+class AvailableSlotSerializer(serializers.ModelSerializer):
+    # Flat on purpose: ids instead of nested agenda/staff objects, so a page
+    # of slots is rendered from one query (select_related('staff'))
+    agenda_id = serializers.IntegerField(read_only=True)
+    staff_id = serializers.IntegerField(read_only=True)
+    staff_name = serializers.SerializerMethodField()
+    available_capacity = serializers.SerializerMethodField()
+
+    class Meta:
+        model = CalendarSlot
+        fields = ['id', 'agenda_id', 'staff_id', 'staff_name', 'slot_date', 'start_time', 'end_time',
+                 'max_capacity', 'available_capacity', 'location', 'meeting_type', 'meeting_link']
+        read_only_fields = fields
+
+    def get_staff_name(self, obj):
+        return f"{obj.staff.first_name} {obj.staff.last_name}".strip()
 
     def get_available_capacity(self, obj):
         return obj.max_capacity - obj.current_bookings
@@ -131,6 +161,11 @@ class CalendarSlotCreateSerializer(serializers.ModelSerializer):
         if attrs['end_time'] <= attrs['start_time']:
             raise serializers.ValidationError("End time must be after start time")
 
+        # The exclude_overlapping_staff_slots constraint is what enforces this;
+        # the query only gives a friendlier error before the INSERT
+        if not settings.SLOT_OVERLAP_PRECHECK:
+            return attrs
+
         # Check for overlapping slots for the same staff (now a User)
         staff_id = attrs['staff_id']
         slot_date = attrs['slot_date']
@@ -152,10 +187,88 @@ class CalendarSlotCreateSerializer(serializers.ModelSerializer):
 
         return attrs
 
-class AppointmentSerializer(serializers.ModelSerializer):
-    calendar_slot = CalendarSlotSerializer(read_only=True)
-    talent = UserSerializer(read_only=True)
+class CalendarSlotBulkItemSerializer(serializers.ModelSerializer):
+    # Field checks only; agenda, staff and overlaps are checked for the whole
+    # batch at once by appointments.bulk_slots
+    agenda_id = serializers.IntegerField()
+    staff_id = serializers.IntegerField()
 
+    class Meta:
+        model = CalendarSlot
+        fields = ['agenda_id', 'staff_id', 'slot_date', 'start_time', 'end_time',
+                 'max_capacity', 'notes', 'location', 'meeting_type', 'meeting_link']
+
+    def validate(self, attrs):
+        if attrs['end_time'] <= attrs['start_time']:
+            raise serializers.ValidationError("End time must be after start time")
+        return attrs
+
+class SlotGenerationSerializer(serializers.Serializer):
+    # Falls back to the agenda's stored recurrence_pattern and date range
+    recurrence_pattern = serializers.JSONField(required=False)
+    start_date = serializers.DateField(required=False)
+    end_date = serializers.DateField(required=False)
+    dry_run = serializers.BooleanField(default=False)
+
+class NextAvailableSlotSerializer(serializers.ModelSerializer):
+    # Flat: everything comes from the index row and its slot, no further queries
+    id = serializers.IntegerField(source='slot_id')
+    agenda_id = serializers.IntegerField()
+    theme_id = serializers.IntegerField()
+    university_profile_id = serializers.IntegerField(source='university_id')
+    staff_id = serializers.IntegerField(source='slot.staff_id')
+    slot_date = serializers.DateField(source='slot.slot_date')
+    start_time = serializers.TimeField(source='slot.start_time')
+    end_time = serializers.TimeField(source='slot.end_time')
+    location = serializers.CharField(source='slot.location')
+    available_capacity = serializers.IntegerField(source='free_seats')
+
+    class Meta:
+        model = BookableSlot
+        fields = ['id', 'agenda_id', 'theme_id', 'university_profile_id', 'staff_id', 'starts_at',
+                 'slot_date', 'start_time', 'end_time', 'meeting_type', 'location', 'available_capacity']
+
+class StaffAvailabilitySerializer(serializers.ModelSerializer):
+    # {"MO": [{"start": "09:00", "end": "12:00"}], ...}; stored as a bitmap
+    weekly = serializers.JSONField()
+    exceptions = serializers.JSONField(required=False)
+
+    class Meta:
+        model = StaffAvailability
+        fields = ['staff_id', 'weekly', 'exceptions', 'updated_at']
+        read_only_fields = ['staff_id', 'updated_at']
+
+    def validate_weekly(self, value):
+        try:
+            return parse_weekly(value)
+        except AvailabilityError as e:
+            raise serializers.ValidationError(e.message)
+
+    def validate_exceptions(self, value):
+        try:
+            return parse_exceptions(value)
+        except AvailabilityError as e:
+            raise serializers.ValidationError(e.message)
+
+    def _with_bitmap(self, validated_data):
+        validated_data['bitmap'] = to_bytes(validated_data.pop('weekly'))
+        return validated_data
+
+    def create(self, validated_data):
+        return super().create(self._with_bitmap(validated_data))
+
+    def update(self, instance, validated_data):
+        return super().update(instance, self._with_bitmap(validated_data))
+
+    def to_representation(self, instance):
+        return {
+            'staff_id': instance.staff_id,
+            'weekly': format_weekly(from_bytes(instance.bitmap)),
+            'exceptions': instance.exceptions,
+            'updated_at': serializers.DateTimeField().to_representation(instance.updated_at),
+        }
+
+class AppointmentSerializer(ExpandableFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Appointment
         fields = ['id', 'calendar_slot', 'talent', 'booking_reference', 'status',
@@ -163,51 +276,42 @@ class AppointmentSerializer(serializers.ModelSerializer):
                  'reminder_sent_24h', 'reminder_sent_1h', 'confirmation_sent',
                  'booked_at', 'cancelled_at', 'completed_at', 'created_at', 'updated_at']
         read_only_fields = ['id', 'booking_reference', 'booked_at', 'created_at', 'updated_at']
+        expandable_fields = {
+            'calendar_slot': Expand(CalendarSlotSerializer),
+            'talent': Expand(UserSerializer),
+        }
 
 class AppointmentBookingSerializer(serializers.ModelSerializer):
+    # Input validation only: slot availability, deadlines and the seat claim
+    # are handled by appointments.booking so the slot is loaded exactly once.
     calendar_slot_id = serializers.IntegerField()
 
     class Meta:
         model = Appointment
         fields = ['calendar_slot_id', 'talent_notes']
 
-    def validate_calendar_slot_id(self, value):
-        try:
-            slot = CalendarSlot.objects.get(id=value)
-        except CalendarSlot.DoesNotExist:
-            raise serializers.ValidationError("Invalid calendar slot")
-
-        if slot.status != 'available':
-            raise serializers.ValidationError("This slot is not available")
-
-        if slot.current_bookings >= slot.max_capacity:
-            raise serializers.ValidationError("This slot is fully booked")
-
-        # Check booking deadline
-        slot_datetime = datetime.combine(slot.slot_date, slot.start_time)
-        booking_deadline = slot_datetime - timedelta(hours=slot.agenda.booking_deadline_hours)
-
-        if timezone.now() > timezone.make_aware(booking_deadline):
-            raise serializers.ValidationError("Booking deadline has passed")
-
-        return value
-
-    def create(self, validated_data):
-        calendar_slot_id = validated_data.pop('calendar_slot_id')
-        slot = CalendarSlot.objects.get(id=calendar_slot_id)
-
-        appointment = Appointment.objects.create(
-            calendar_slot=slot,
-            **validated_data
-        )
+class AppointmentRescheduleSerializer(serializers.Serializer):
+    calendar_slot_id = serializers.IntegerField()
 
-        # Update slot booking count
-        slot.current_bookings += 1
-        if slot.current_bookings >= slot.max_capacity:
-            slot.status = 'fully_booked'
-        slot.save()
+class WaitlistEntrySerializer(serializers.ModelSerializer):
+    position = serializers.SerializerMethodField()
 
-        return appointment
+    class Meta:
+        model = WaitlistEntry
+        fields = ['id', 'calendar_slot', 'status', 'talent_notes', 'appointment',
+                 'position', 'promoted_at', 'created_at']
+        read_only_fields = ['id', 'calendar_slot', 'status', 'appointment', 'promoted_at', 'created_at']
+
+    def get_position(self, obj):
+        # 1-based place in the FIFO queue, only meaningful while waiting
+        if obj.status != 'waiting':
+            return None
+        return WaitlistEntry.objects.filter(
+            calendar_slot_id=obj.calendar_slot_id,
+            status='waiting'
+        ).filter(
+            Q(created_at__lt=obj.created_at) | Q(created_at=obj.created_at, id__lt=obj.id)
+        ).count() + 1
 
 class AppointmentStatisticsSerializer(serializers.ModelSerializer):
     # University is now UniversityProfile
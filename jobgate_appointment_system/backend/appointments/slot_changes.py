@@ -0,0 +1,42 @@
+# FileName: MultipleFiles/slot_changes.py (appointments app)
+"""
+Single place where writes report changed slots and agendas.
+
+Everything derived from calendar_slots outside Postgres' own indexes (the
+next-available index, the per-agenda Redis snapshots and the ETag version
+counters) is kept up to date from here, so booking, recurrence and
+slot-editing code only needs one call. Call inside the transaction that
+made the change. Slot changes reach the index and Redis once it commits,
+so a booking does not hold its seat lock while the index is rewritten;
+agenda changes update the index in the transaction and Redis after it.
+"""
+from django.db import transaction
+
+from . import next_available, slot_snapshots, versions
+
+
+def slots_changed(slot_ids):
+    """The given slots were created, booked, released or edited"""
+    slot_ids = list(slot_ids)
+    if not slot_ids:
+        return
+    transaction.on_commit(lambda: next_available.refresh_slots(slot_ids), robust=True)
+    transaction.on_commit(lambda: _slots_committed(slot_ids), robust=True)
+
+
+def agendas_changed(agenda_ids):
+    """The given agendas were created, edited or deleted, or lost slots"""
+    agenda_ids = list(agenda_ids)
+    next_available.refresh_agendas(agenda_ids)
+    transaction.on_commit(lambda: _agendas_committed(agenda_ids), robust=True)
+
+
+def _slots_committed(slot_ids):
+    agenda_ids = slot_snapshots.write_through(slot_ids)
+    versions.bump([versions.SLOTS] + [versions.agenda(agenda_id) for agenda_id in agenda_ids])
+
+
+def _agendas_committed(agenda_ids):
+    slot_snapshots.drop(agenda_ids)
+    # Slot list responses embed the agenda
+    versions.bump([versions.AGENDAS, versions.SLOTS] + [versions.agenda(agenda_id) for agenda_id in agenda_ids])
@@ -0,0 +1,220 @@
+# FileName: MultipleFiles/slot_snapshots.py (appointments app)
+"""
+Per-agenda availability snapshots in Redis.
+
+``slots:snapshot:v2:<agenda_id>:rows`` is a sorted set holding one member per
+bookable slot, ``<slot_date> <start_time>|<zero-padded id>|<json list>``
+where the list is the slot's AvailableSlotSerializer output in field order.
+All members score 0, so the set is ordered lexicographically, which is the
+(slot_date, start_time, id) keyset order: a page of a date range is one
+ZRANGEBYLEX of page_size + 1 members whatever the size of the agenda.
+
+``slots:snapshot:v2:<agenda_id>`` is a hash with one field per slot holding
+``<version>|<sort key>`` (the member's prefix, empty for a slot that cannot
+be booked), plus a ``_`` field with the agenda fields available_slots_view
+needs. A warm snapshot lets that view answer without touching Postgres.
+
+Bookings, cancellations and slot edits write through: appointments.slot_changes
+calls write_through() once the writing transaction commits. Each entry carries the slot's ``version``, which every write bumps
+under the row lock, and the Lua script only replaces an entry with a newer
+version, so commits whose callbacks run out of order cannot leave a stale
+seat count behind. Slots that stop being bookable become empty tombstones
+for the same reason.
+
+A snapshot is built on a miss: the ``_`` marker is created first, so
+write-throughs racing with the build are kept and the build's older rows
+lose to them, and only published once the rows are in. Agenda edits drop the
+snapshot, and every snapshot expires SLOT_SNAPSHOT_TTL seconds after it was
+built, which bounds the effect of edits made behind the API's back.
+"""
+import json
+from collections import defaultdict
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import F
+from django.utils import timezone
+from django_redis import get_redis_connection
+
+from .models import Agenda, CalendarSlot
+from .serializers import AvailableSlotSerializer
+
+# v2: rows moved to a sorted set; snapshots in the old hash-only layout are ignored until they expire
+SNAPSHOT_KEY = 'slots:snapshot:v2:{agenda_id}'
+ROWS_KEY = SNAPSHOT_KEY + ':rows'
+META_FIELD = '_'
+BUILDING = 'building'
+SLOT_FIELDS = AvailableSlotSerializer.Meta.fields
+# What available_slots_view reads from the agenda (horizon and waiting room)
+AGENDA_FIELDS = [
+    'id', 'start_date', 'end_date', 'is_recurring', 'horizon_weeks', 'materialized_until',
+    'waiting_room_enabled', 'waiting_room_admit_per_minute',
+]
+AGENDA_DATE_FIELDS = ['start_date', 'end_date', 'materialized_until']
+
+# KEYS are the hash and the sorted set. ARGV[1] is the agenda metadata to
+# publish once a build is complete ('' for a write-through), followed by
+# (slot_id, version, sort key, payload) quadruples; a tombstone has neither
+APPLY_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return 0
+end
+if ARGV[1] ~= '' and redis.call('HGET', KEYS[1], '_') ~= 'building' then
+    return 0
+end
+for i = 2, #ARGV, 4 do
+    local current = redis.call('HGET', KEYS[1], ARGV[i])
+    local version, sort_key = nil, ''
+    if current then
+        version, sort_key = string.match(current, '^(%d+)|(.*)$')
+    end
+    if not current or tonumber(version) < tonumber(ARGV[i + 1]) then
+        if sort_key ~= '' then
+            redis.call('ZREMRANGEBYLEX', KEYS[2], '[' .. sort_key, '(' .. sort_key .. '\\255')
+        end
+        if ARGV[i + 2] ~= '' then
+            redis.call('ZADD', KEYS[2], 0, ARGV[i + 2] .. ARGV[i + 3])
+        end
+        redis.call('HSET', KEYS[1], ARGV[i], ARGV[i + 1] .. '|' .. ARGV[i + 2])
+    end
+end
+if ARGV[1] ~= '' then
+    redis.call('HSET', KEYS[1], '_', ARGV[1])
+end
+-- The rows live and expire with the hash
+local ttl = redis.call('PTTL', KEYS[1])
+if ttl > 0 and redis.call('EXISTS', KEYS[2]) == 1 then
+    redis.call('PEXPIRE', KEYS[2], ttl)
+end
+return 1
+"""
+
+_apply_script = None
+
+
+def _redis():
+    return get_redis_connection('default')
+
+
+def _apply(agenda_id, entries, meta=''):
+    """Run APPLY_SCRIPT for (slot_id, version, sort_key, payload) entries"""
+    global _apply_script
+    if _apply_script is None:
+        _apply_script = _redis().register_script(APPLY_SCRIPT)
+    args = [meta]
+    for entry in entries:
+        args += entry
+    keys = [SNAPSHOT_KEY.format(agenda_id=agenda_id), ROWS_KEY.format(agenda_id=agenda_id)]
+    return _apply_script(keys=keys, args=args)
+
+
+def _slots():
+    return CalendarSlot.objects.select_related('staff').only(
+        'id', 'agenda_id', 'slot_date', 'start_time', 'end_time', 'max_capacity', 'current_bookings',
+        'status', 'version', 'location', 'meeting_type', 'meeting_link',
+        'staff__id', 'staff__first_name', 'staff__last_name'
+    )
+
+
+def _bookable(slot):
+    return slot.status == 'available' and slot.current_bookings < slot.max_capacity
+
+
+def _sort_key(slot_date, start_time, slot_id):
+    """Member prefix that sorts like (slot_date, start_time, id); takes the serialized values"""
+    return f'{slot_date} {start_time}|{slot_id:012d}|'
+
+
+def _entry(slot):
+    """(slot_id, version, sort_key, payload); both are empty for a slot that cannot be booked"""
+    if not _bookable(slot):
+        return slot.id, slot.version, '', ''
+    data = AvailableSlotSerializer(slot).data
+    payload = json.dumps([data[field] for field in SLOT_FIELDS], cls=DjangoJSONEncoder)
+    return slot.id, slot.version, _sort_key(data['slot_date'], data['start_time'], slot.id), payload
+
+
+def _encode_agenda(agenda):
+    return json.dumps({field: getattr(agenda, field) for field in AGENDA_FIELDS}, cls=DjangoJSONEncoder)
+
+
+def _decode_agenda(meta):
+    values = json.loads(meta)
+    for field in AGENDA_DATE_FIELDS:
+        if values[field] is not None:
+            values[field] = date.fromisoformat(values[field])
+    return Agenda(**values)
+
+
+def load_agenda(agenda_id):
+    """The agenda from a published snapshot (unsaved, carrying AGENDA_FIELDS), or None on a miss"""
+    meta = _redis().hget(SNAPSHOT_KEY.format(agenda_id=agenda_id), META_FIELD)
+    if meta is None or meta == BUILDING.encode():
+        return None
+    return _decode_agenda(meta)
+
+
+def load_range(agenda_id, first_day, last_day, after, limit):
+    """
+    Up to limit rows of a published snapshot with first_day <= slot_date <=
+    last_day (None for no end) that come strictly after ``after`` (a decoded
+    [slot_date, start_time, id] cursor, or None), in keyset order; None on a miss.
+
+    Rows are dicts shaped like AvailableSlotSerializer output.
+    """
+    low = ('[' + first_day.isoformat()).encode()
+    if after is not None:
+        slot_date, start_time, slot_id = after
+        if not (isinstance(slot_date, str) and isinstance(start_time, str) and type(slot_id) is int):
+            raise ValueError('Invalid cursor')
+        # Members are ASCII, so the cursor's own member and nothing after it sorts below prefix + 0xff
+        low = max(low, ('[' + _sort_key(slot_date, start_time, slot_id)).encode() + b'\xff')
+    high = '(' + (last_day + timedelta(days=1)).isoformat() if last_day else '+'
+
+    pipe = _redis().pipeline()
+    pipe.hget(SNAPSHOT_KEY.format(agenda_id=agenda_id), META_FIELD)
+    pipe.zrangebylex(ROWS_KEY.format(agenda_id=agenda_id), low, high, start=0, num=limit)
+    meta, members = pipe.execute()
+    if meta is None or meta == BUILDING.encode():
+        return None
+    return [dict(zip(SLOT_FIELDS, json.loads(member.split(b'|', 2)[2]))) for member in members]
+
+
+def build(agenda):
+    """Load the agenda's bookable slots from Postgres, publish them as its snapshot and return the rows"""
+    key = SNAPSHOT_KEY.format(agenda_id=agenda.id)
+    redis = _redis()
+    # Only one request builds; the others just use what they read
+    building = redis.hsetnx(key, META_FIELD, BUILDING)
+    if building:
+        redis.expire(key, settings.SLOT_SNAPSHOT_TTL)
+
+    slots = list(_slots().filter(
+        agenda_id=agenda.id,
+        status='available',
+        current_bookings__lt=F('max_capacity'),
+        slot_date__gte=timezone.now().date(),
+    ).order_by('slot_date', 'start_time', 'id'))
+    entries = [_entry(slot) for slot in slots]
+
+    if building:
+        _apply(agenda.id, entries, meta=_encode_agenda(agenda))
+    return [dict(zip(SLOT_FIELDS, json.loads(payload))) for _, _, _, payload in entries]
+
+
+def write_through(slot_ids):
+    """Write the current state of the given slots to their agendas' snapshots; returns those agenda ids"""
+    by_agenda = defaultdict(list)
+    for slot in _slots().filter(id__in=slot_ids):
+        by_agenda[slot.agenda_id].append(_entry(slot))
+    for agenda_id, entries in by_agenda.items():
+        _apply(agenda_id, entries)
+    return list(by_agenda)
+
+
+def drop(agenda_ids):
+    """Delete the agendas' snapshots"""
+    keys = [key.format(agenda_id=agenda_id) for agenda_id in agenda_ids for key in (SNAPSHOT_KEY, ROWS_KEY)]
+    if keys:
+        _redis().delete(*keys)
@@ -5,7 +5,7 @@ from django.template.loader import render_to_string
 from django.utils import timezone
 from django.conf import settings
 from datetime import datetime, timedelta
-from .models import Appointment, EmailReminder
+from .models import Agenda, Appointment, CalendarSlot, EmailReminder
 import logging
 
 logger = logging.getLogger(__name__)
@@ -223,6 +223,133 @@ JOBGATE Team
     except Exception as e:
         logger.error(f"Failed to send 1h reminder for appointment {appointment_id}: {str(e)}")
 
+@shared_task
+def send_waitlist_promotion(appointment_id):
+    """Tell a waitlisted talent that a freed seat has been booked for them"""
+    try:
+        appointment = Appointment.objects.select_related(
+            'talent', 'calendar_slot__agenda__university'
+        ).get(id=appointment_id)
+
+        if appointment.confirmation_sent:
+            logger.info(f"Confirmation already sent for appointment {appointment.booking_reference}")
+            return
+
+        subject = f"A seat opened up - {appointment.booking_reference}"
+
+        message = f"""
+Dear {appointment.talent.first_name} {appointment.talent.last_name},
+
+Good news! A seat became available for a time slot you were waitlisted for, and it has been booked for you.
+
+Appointment Details:
+- Reference: {appointment.booking_reference}
+- Agenda: {appointment.calendar_slot.agenda.name}
+- Date: {appointment.calendar_slot.slot_date}
+- Time: {appointment.calendar_slot.start_time} - {appointment.calendar_slot.end_time}
+- Location: {appointment.calendar_slot.location or 'TBD'}
+- Meeting Type: {appointment.calendar_slot.get_meeting_type_display()}
+
+University: {appointment.calendar_slot.agenda.university.display_name}
+
+If you can no longer attend, please cancel at least {appointment.calendar_slot.agenda.cancellation_deadline_hours} hours before your appointment so the seat can go to the next person in line.
+
+Best regards,
+JOBGATE Team
+        """
+
+        send_mail(
+            subject=subject,
+            message=message,
+            from_email=settings.DEFAULT_FROM_EMAIL,
+            recipient_list=[appointment.talent.email],
+            fail_silently=False,
+        )
+
+        appointment.confirmation_sent = True
+        appointment.save(update_fields=['confirmation_sent', 'updated_at'])
+
+        EmailReminder.objects.create(
+            appointment=appointment,
+            reminder_type='confirmation',
+            recipient_email=appointment.talent.email,
+            subject=subject,
+            status='sent'
+        )
+
+        logger.info(f"Waitlist promotion email sent for appointment {appointment.booking_reference}")
+
+    except Appointment.DoesNotExist:
+        logger.error(f"Appointment {appointment_id} not found")
+    except Exception as e:
+        logger.error(f"Failed to send waitlist promotion email for appointment {appointment_id}: {str(e)}")
+
+@shared_task
+def send_appointment_rescheduled(appointment_id, previous_slot_id, rescheduled_by_staff=False):
+    """Send one email covering both the released and the new time slot"""
+    try:
+        appointment = Appointment.objects.select_related(
+            'talent', 'calendar_slot__agenda__university'
+        ).get(id=appointment_id)
+        previous_slot = CalendarSlot.objects.filter(id=previous_slot_id).first()
+
+        subject = f"Appointment Rescheduled - {appointment.booking_reference}"
+        intro = (
+            "Your appointment has been moved to a new time by the university staff."
+            if rescheduled_by_staff else
+            "Your appointment has been rescheduled."
+        )
+        previous_time = (
+            f"{previous_slot.slot_date} {previous_slot.start_time} - {previous_slot.end_time}"
+            if previous_slot else "N/A"
+        )
+
+        message = f"""
+Dear {appointment.talent.first_name} {appointment.talent.last_name},
+
+{intro}
+
+Previous Time: {previous_time}
+
+New Appointment Details:
+- Reference: {appointment.booking_reference}
+- Agenda: {appointment.calendar_slot.agenda.name}
+- Date: {appointment.calendar_slot.slot_date}
+- Time: {appointment.calendar_slot.start_time} - {appointment.calendar_slot.end_time}
+- Location: {appointment.calendar_slot.location or 'TBD'}
+- Meeting Type: {appointment.calendar_slot.get_meeting_type_display()}
+
+University: {appointment.calendar_slot.agenda.university.display_name}
+
+If you need to cancel or reschedule again, please do so at least {appointment.calendar_slot.agenda.cancellation_deadline_hours} hours before your appointment.
+
+Best regards,
+JOBGATE Team
+        """
+
+        send_mail(
+            subject=subject,
+            message=message,
+            from_email=settings.DEFAULT_FROM_EMAIL,
+            recipient_list=[appointment.talent.email],
+            fail_silently=False,
+        )
+
+        EmailReminder.objects.create(
+            appointment=appointment,
+            reminder_type='rescheduled',
+            recipient_email=appointment.talent.email,
+            subject=subject,
+            status='sent'
+        )
+
+        logger.info(f"Reschedule email sent for appointment {appointment.booking_reference}")
+
+    except Appointment.DoesNotExist:
+        logger.error(f"Appointment {appointment_id} not found")
+    except Exception as e:
+        logger.error(f"Failed to send reschedule email for appointment {appointment_id}: {str(e)}")
+
 @shared_task
 def send_cancellation_email(appointment_id, cancelled_by_staff=False):
     """Send appointment cancellation email"""
@@ -289,6 +416,37 @@ JOBGATE Team
     except Exception as e:
         logger.error(f"Failed to send cancellation email for appointment {appointment_id}: {str(e)}")
 
+@shared_task
+def extend_slot_horizons():
+    """Move the rolling slot horizon of every recurring agenda forward"""
+    from .recurrence import RecurrenceError, extend_horizon
+
+    agendas = Agenda.objects.filter(
+        is_active=True,
+        is_recurring=True,
+        horizon_weeks__isnull=False,
+        end_date__gte=timezone.now().date()
+    )
+
+    created = 0
+    for agenda in agendas:
+        try:
+            created += extend_horizon(agenda)
+        except RecurrenceError as e:
+            logger.error(f"Cannot extend slot horizon of agenda {agenda.id}: {e.message}")
+
+    logger.info(f"Slot horizons extended: {created} slots created")
+    return created
+
+@shared_task
+def rebuild_next_available_index():
+    """Rebuild the next-available slot index, dropping slots whose deadline has passed"""
+    from .next_available import rebuild
+
+    indexed = rebuild()
+    logger.info(f"Next-available index rebuilt: {indexed} bookable slots")
+    return indexed
+
 @shared_task
 def calculate_daily_statistics():
     """Calculate daily statistics for all universities"""
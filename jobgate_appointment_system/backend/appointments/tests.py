@@ -1,3 +1,1251 @@
-from django.test import TestCase
+import threading
+from datetime import date, datetime, time, timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.db import DatabaseError, IntegrityError, connection, transaction
+from django.test import Client, TestCase, TransactionTestCase, override_settings, tag
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from common.pagination import encode_cursor
+from universities.models import UniversityProfile
+from users.models import User
+from .benchmarks import percentile, run_booking_benchmark
+from . import availability, booking, idempotency, next_available, slot_snapshots
+from .intervals import Interval, sweep_conflicts
+from .models import AppointmentTheme, Agenda, CalendarSlot, Appointment, EmailReminder, WaitlistEntry
+from .tasks import (
+    extend_slot_horizons, send_appointment_confirmation, send_appointment_rescheduled,
+    send_cancellation_email, send_waitlist_promotion
+)
+
+
+def create_user(username, user_type):
+    return User.objects.create_user(
+        username=username,
+        email=f'{username}@example.com',
+        password='password123',
+        user_type=user_type,
+    )
+
+
+def create_slot(max_capacity=1, days_ahead=7, start=time(10, 0), end=time(10, 30), staff=None, agenda=None):
+    """Create a bookable slot (and the university/agenda around it when needed)"""
+    if agenda is None:
+        admin = create_user(f'admin{User.objects.count()}', 'admin')
+        staff = staff or create_user(f'staff{User.objects.count()}', 'university_staff')
+        university = UniversityProfile.objects.create(
+            base_user=staff, display_name='Test University', created_by=admin
+        )
+        theme, _ = AppointmentTheme.objects.get_or_create(name='Career Advice')
+        today = timezone.now().date()
+        agenda = Agenda.objects.create(
+            university=university,
+            created_by=staff,
+            name='Career Advice Sessions',
+            theme=theme,
+            start_date=today,
+            end_date=today + timedelta(days=60),
+            booking_deadline_hours=1,
+            cancellation_deadline_hours=1,
+        )
+    return CalendarSlot.objects.create(
+        agenda=agenda,
+        staff=staff or agenda.created_by,
+        slot_date=timezone.now().date() + timedelta(days=days_ahead),
+        start_time=start,
+        end_time=end,
+        max_capacity=max_capacity,
+    )
+
+
+@mock.patch.object(send_appointment_confirmation, 'delay')
+class BookAppointmentViewTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.slot = create_slot(max_capacity=2)
+        self.client = APIClient()
+
+    def book(self, talent, slot_id=None):
+        self.client.force_authenticate(talent)
+        return self.client.post(
+            '/api/appointments/book/',
+            {'calendar_slot_id': slot_id or self.slot.id},
+            format='json'
+        )
+
+    def test_booking_increments_slot_once(self, delay):
+        response = self.book(create_user('talent1', 'talent'))
+
+        self.assertEqual(response.status_code, 201)
+        self.slot.refresh_from_db()
+        self.assertEqual(self.slot.current_bookings, 1)
+        self.assertEqual(self.slot.status, 'available')
+
+    def test_last_seat_marks_slot_fully_booked(self, delay):
+        self.book(create_user('talent1', 'talent'))
+        self.book(create_user('talent2', 'talent'))
+        response = self.book(create_user('talent3', 'talent'))
+
+        self.assertEqual(response.status_code, 404)
+        self.slot.refresh_from_db()
+        self.assertEqual(self.slot.current_bookings, 2)
+        self.assertEqual(self.slot.status, 'fully_booked')
+
+    def test_duplicate_booking_is_rejected(self, delay):
+        talent = create_user('talent1', 'talent')
+        self.book(talent)
+        response = self.book(talent)
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Appointment.objects.filter(talent=talent).count(), 1)
+        self.slot.refresh_from_db()
+        self.assertEqual(self.slot.current_bookings, 1)
+
+    def test_database_rejects_second_active_booking(self, delay):
+        talent = create_user('talent1', 'talent')
+        Appointment.objects.create(calendar_slot=self.slot, talent=talent)
+
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Appointment.objects.create(calendar_slot=self.slot, talent=talent, status='pending')
+        # Cancelled bookings do not count
+        Appointment.objects.create(calendar_slot=self.slot, talent=talent, status='cancelled')
+
+    def test_overlapping_slot_in_another_agenda_is_rejected(self, delay):
+        talent = create_user('talent1', 'talent')
+        self.book(talent)
+        # Same day, starts halfway through the booked slot, different university and agenda
+        other_slot = create_slot(start=time(10, 15), end=time(10, 45))
+
+        response = self.book(talent, slot_id=other_slot.id)
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('overlaps', response.data['error'])
+        other_slot.refresh_from_db()
+        self.assertEqual(other_slot.current_bookings, 0)
+        self.assertEqual(self.book(talent, slot_id=create_slot(start=time(10, 30), end=time(11, 0)).id).status_code, 201)
+
+
+@mock.patch.object(send_appointment_confirmation, 'delay')
+class CancelAppointmentViewTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.slot = create_slot(max_capacity=1)
+        self.talent = create_user('talent1', 'talent')
+        self.client = APIClient()
+        self.client.force_authenticate(self.talent)
+
+    def book(self):
+        return self.client.post(
+            '/api/appointments/book/', {'calendar_slot_id': self.slot.id}, format='json'
+        ).data['id']
+
+    def cancel(self, appointment_id):
+        return self.client.post(f'/api/appointments/{appointment_id}/cancel/')
+
+    def test_cancel_reopens_slot_and_queues_email(self, confirmation_delay):
+        appointment_id = self.book()
+
+        with mock.patch.object(send_cancellation_email, 'delay') as delay, \
+                self.captureOnCommitCallbacks(execute=True):
+            response = self.cancel(appointment_id)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['status'], 'cancelled')
+        delay.assert_called_once_with(appointment_id, False)
+        self.slot.refresh_from_db()
+        self.assertEqual(self.slot.current_bookings, 0)
+        self.assertEqual(self.slot.status, 'available')
+        self.assertEqual(self.cancel(appointment_id).status_code, 400)
+
+    def test_cancel_keeps_blocked_slot_closed(self, confirmation_delay):
+        appointment_id = self.book()
+        CalendarSlot.objects.filter(id=self.slot.id).update(status='blocked')
+
+        with mock.patch.object(send_cancellation_email, 'delay'):
+            self.assertEqual(self.cancel(appointment_id).status_code, 200)
+
+        self.slot.refresh_from_db()
+        self.assertEqual(self.slot.current_bookings, 0)
+        self.assertEqual(self.slot.status, 'blocked')
+
+
+@mock.patch.object(send_appointment_confirmation, 'delay')
+class RescheduleAppointmentViewTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.old_slot = create_slot(max_capacity=1)
+        self.new_slot = create_slot(agenda=self.old_slot.agenda, staff=self.old_slot.staff, days_ahead=8)
+        self.client = APIClient()
+        self.client.force_authenticate(create_user('talent1', 'talent'))
+        self.appointment_id = self.client.post(
+            '/api/appointments/book/', {'calendar_slot_id': self.old_slot.id}, format='json'
+        ).data['id']
+
+    def reschedule(self, slot_id):
+        return self.client.post(
+            f'/api/appointments/{self.appointment_id}/reschedule/',
+            {'calendar_slot_id': slot_id},
+            format='json'
+        )
+
+    def test_reschedule_moves_seat_and_keeps_reference(self, confirmation_delay):
+        reference = Appointment.objects.get(id=self.appointment_id).booking_reference
+
+        with mock.patch.object(send_appointment_rescheduled, 'delay') as delay, \
+                self.captureOnCommitCallbacks(execute=True):
+            response = self.reschedule(self.new_slot.id)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['id'], self.appointment_id)
+        self.assertEqual(response.data['booking_reference'], reference)
+        self.assertEqual(response.data['calendar_slot']['id'], self.new_slot.id)
+        delay.assert_called_once_with(self.appointment_id, self.old_slot.id, False)
+        self.old_slot.refresh_from_db()
+        self.new_slot.refresh_from_db()
+        self.assertEqual((self.old_slot.current_bookings, self.old_slot.status), (0, 'available'))
+        self.assertEqual((self.new_slot.current_bookings, self.new_slot.status), (1, 'fully_booked'))
+
+    def test_reschedule_email_is_logged_as_rescheduled(self, confirmation_delay):
+        send_appointment_rescheduled(self.appointment_id, self.new_slot.id)
+
+        self.assertEqual(
+            list(EmailReminder.objects.filter(appointment_id=self.appointment_id).values_list('reminder_type', flat=True)),
+            ['rescheduled']
+        )
+
+    def test_cancel_after_a_concurrent_reschedule_frees_the_new_slot(self, confirmation_delay):
+        # Loaded while on the old slot, then moved by a reschedule that commits first
+        stale = Appointment.objects.select_related('calendar_slot').get(id=self.appointment_id)
+        with mock.patch.object(send_appointment_rescheduled, 'delay'):
+            self.assertEqual(self.reschedule(self.new_slot.id).status_code, 200)
+
+        with mock.patch.object(send_cancellation_email, 'delay'):
+            booking.cancel_appointment(stale)
+
+        self.old_slot.refresh_from_db()
+        self.new_slot.refresh_from_db()
+        self.assertEqual((self.old_slot.current_bookings, self.old_slot.status), (0, 'available'))
+        self.assertEqual((self.new_slot.current_bookings, self.new_slot.status), (0, 'available'))
+
+    def test_full_target_slot_leaves_appointment_in_place(self, confirmation_delay):
+        CalendarSlot.objects.filter(id=self.new_slot.id).update(current_bookings=1, status='fully_booked')
+
+        response = self.reschedule(self.new_slot.id)
+
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(Appointment.objects.get(id=self.appointment_id).calendar_slot_id, self.old_slot.id)
+        self.old_slot.refresh_from_db()
+        self.assertEqual(self.old_slot.current_bookings, 1)
+
+
+@mock.patch.object(send_appointment_confirmation, 'delay')
+class ConcurrentBookingTests(TransactionTestCase):
+    THREADS = 20
+
+    def setUp(self):
+        cache.clear()
+
+    def test_slot_is_never_overbooked(self, delay):
+        slot = create_slot(max_capacity=3)
+        talents = [create_user(f'talent{i}', 'talent') for i in range(self.THREADS)]
+        barrier = threading.Barrier(self.THREADS)
+        status_codes = []
+
+        def book(talent):
+            client = APIClient()
+            client.force_authenticate(talent)
+            try:
+                barrier.wait()
+                response = client.post(
+                    '/api/appointments/book/',
+                    {'calendar_slot_id': slot.id},
+                    format='json'
+                )
+                status_codes.append(response.status_code)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=book, args=(talent,)) for talent in talents]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        slot.refresh_from_db()
+        self.assertEqual(status_codes.count(201), 3)
+        self.assertEqual(len(status_codes), self.THREADS)
+        self.assertEqual(slot.current_bookings, 3)
+        self.assertEqual(slot.status, 'fully_booked')
+        self.assertEqual(Appointment.objects.filter(calendar_slot=slot).count(), 3)
+
+
+@mock.patch.object(send_appointment_confirmation, 'delay')
+class SlotHoldTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.slot = create_slot(max_capacity=1)
+        self.holder = create_user('holder', 'talent')
+        self.other = create_user('other', 'talent')
+
+    def client_for(self, user):
+        client = APIClient()
+        client.force_authenticate(user)
+        return client
+
+    def test_held_seat_is_reserved_for_the_holder(self, delay):
+        holder_client = self.client_for(self.holder)
+        response = holder_client.post(f'/api/appointments/slots/{self.slot.id}/hold/')
+        self.assertEqual(response.status_code, 201)
+
+        response = self.client_for(self.other).post(
+            '/api/appointments/book/', {'calendar_slot_id': self.slot.id}, format='json'
+        )
+        self.assertEqual(response.status_code, 409)
+
+        response = holder_client.post(
+            '/api/appointments/book/', {'calendar_slot_id': self.slot.id}, format='json'
+        )
+        self.assertEqual(response.status_code, 201)
+
+    def test_released_hold_frees_the_seat(self, delay):
+        holder_client = self.client_for(self.holder)
+        holder_client.post(f'/api/appointments/slots/{self.slot.id}/hold/')
+        response = holder_client.delete(f'/api/appointments/slots/{self.slot.id}/hold/')
+        self.assertEqual(response.status_code, 204)
+
+        response = self.client_for(self.other).post(
+            '/api/appointments/book/', {'calendar_slot_id': self.slot.id}, format='json'
+        )
+        self.assertEqual(response.status_code, 201)
+
+    def test_implicit_hold_is_released_when_booking_fails_unexpectedly(self, delay):
+        with mock.patch('appointments.views.book_slot', side_effect=DatabaseError('connection lost')):
+            response = self.client_for(self.holder).post(
+                '/api/appointments/book/', {'calendar_slot_id': self.slot.id}, format='json'
+            )
+        self.assertEqual(response.status_code, 500)
+
+        response = self.client_for(self.other).post(
+            '/api/appointments/book/', {'calendar_slot_id': self.slot.id}, format='json'
+        )
+        self.assertEqual(response.status_code, 201)
+
+
+@mock.patch.object(send_appointment_confirmation, 'delay')
+class IdempotentBookingTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.slot = create_slot(max_capacity=5)
+        self.client = APIClient()
+        self.client.force_authenticate(create_user('talent1', 'talent'))
+
+    def book(self, key, slot_id=None):
+        return self.client.post(
+            '/api/appointments/book/',
+            {'calendar_slot_id': slot_id or self.slot.id},
+            format='json',
+            HTTP_IDEMPOTENCY_KEY=key
+        )
+
+    def test_retry_replays_the_first_response(self, delay):
+        first = self.book('retry-1')
+        second = self.book('retry-1')
+
+        self.assertEqual(second.status_code, 201)
+        self.assertEqual(second.data['id'], first.data['id'])
+        self.assertEqual(second['Idempotent-Replayed'], 'true')
+        self.slot.refresh_from_db()
+        self.assertEqual(self.slot.current_bookings, 1)
+
+    def test_key_reused_for_another_request_is_rejected(self, delay):
+        self.book('retry-2')
+        other_slot = create_slot(agenda=self.slot.agenda, staff=self.slot.staff, days_ahead=8)
+
+        self.assertEqual(self.book('retry-2', slot_id=other_slot.id).status_code, 422)
+
+    def test_duplicate_in_flight_gets_retry_after_and_locks_are_owned(self, delay):
+        lock_key = 'idempotency:test:lock'
+        token = idempotency.acquire_lock(lock_key)
+        # A request whose lock expired cannot delete the lock another one took since
+        self.assertFalse(idempotency.release_lock(lock_key, 'expired-token'))
+        self.assertIsNone(idempotency.acquire_lock(lock_key))
+        self.assertTrue(idempotency.release_lock(lock_key, token))
+
+        with mock.patch.object(idempotency, 'acquire_lock', return_value=None):
+            response = self.book('retry-3')
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response['Retry-After'], '1')
+        self.assertEqual(self.book('retry-3').status_code, 201)
+
+
+    def test_retry_that_takes_the_lock_after_the_first_finishes_replays_it(self, delay):
+        acquire_lock = idempotency.acquire_lock
+        lock_keys = []
+
+        def record(lock_key):
+            lock_keys.append(lock_key)
+            return acquire_lock(lock_key)
+
+        with mock.patch.object(idempotency, 'acquire_lock', side_effect=record):
+            first = self.book('retry-4')
+        cache_key = lock_keys[0].removesuffix(':lock')
+        stored = cache.get(cache_key)
+        cache.delete(cache_key)
+
+        def first_finishes_before_the_lock(lock_key):
+            # The retry missed the cache; the first request stores its result and releases the lock
+            cache.set(cache_key, stored)
+            return acquire_lock(lock_key)
+
+        with mock.patch.object(idempotency, 'acquire_lock', side_effect=first_finishes_before_the_lock):
+            second = self.book('retry-4')
+
+        self.assertEqual(second.status_code, 201)
+        self.assertEqual(second.data['id'], first.data['id'])
+        self.assertEqual(second['Idempotent-Replayed'], 'true')
+        self.assertEqual(cache.get(cache_key)['status'], 201)
+        self.slot.refresh_from_db()
+        self.assertEqual(self.slot.current_bookings, 1)
+
+
+class WaitlistTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.slot = create_slot(max_capacity=1)
+        self.booked = create_user('booked', 'talent')
+        self.waiting = create_user('waiting', 'talent')
+
+    def client_for(self, user):
+        client = APIClient()
+        client.force_authenticate(user)
+        return client
+
+    def test_cancellation_promotes_head_of_waitlist(self):
+        booked_client = self.client_for(self.booked)
+        appointment_id = booked_client.post(
+            '/api/appointments/book/', {'calendar_slot_id': self.slot.id}, format='json'
+        ).data['id']
+
+        response = self.client_for(self.waiting).post(f'/api/appointments/slots/{self.slot.id}/waitlist/')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['position'], 1)
+
+        with mock.patch.object(send_waitlist_promotion, 'delay') as delay, \
+                mock.patch.object(send_appointment_confirmation, 'delay'), \
+                self.captureOnCommitCallbacks(execute=True):
+            response = booked_client.post(f'/api/appointments/{appointment_id}/cancel/')
+        self.assertEqual(response.status_code, 200)
+
+        promoted = Appointment.objects.get(talent=self.waiting, calendar_slot=self.slot)
+        delay.assert_called_once_with(promoted.id)
+        self.assertEqual(WaitlistEntry.objects.get(talent=self.waiting).status, 'promoted')
+        self.slot.refresh_from_db()
+        self.assertEqual(self.slot.current_bookings, 1)
+        self.assertEqual(self.slot.status, 'fully_booked')
+
+    def test_cannot_join_waitlist_of_slot_with_free_seats(self):
+        response = self.client_for(self.waiting).post(f'/api/appointments/slots/{self.slot.id}/waitlist/')
+        self.assertEqual(response.status_code, 400)
+
+
+@override_settings(WAITING_ROOM_BURST=1)
+@mock.patch.object(send_appointment_confirmation, 'delay')
+class WaitingRoomTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.slot = create_slot(max_capacity=5)
+        Agenda.objects.filter(id=self.slot.agenda_id).update(
+            waiting_room_enabled=True, waiting_room_admit_per_minute=1
+        )
+
+    def join(self, talent):
+        client = APIClient()
+        client.force_authenticate(talent)
+        response = client.post(f'/api/appointments/agendas/{self.slot.agenda_id}/waiting-room/')
+        return client, response.data
+
+    def book(self, client, token=None):
+        headers = {'HTTP_X_WAITING_ROOM_TOKEN': token} if token else {}
+        return client.post(
+            '/api/appointments/book/', {'calendar_slot_id': self.slot.id}, format='json', **headers
+        )
+
+    def test_only_admitted_tokens_may_book(self, delay):
+        first_client, first = self.join(create_user('first', 'talent'))
+        second_client, second = self.join(create_user('second', 'talent'))
+
+        self.assertTrue(first['admitted'])
+        self.assertFalse(second['admitted'])
+        self.assertEqual(second['position'], 2)
+
+        self.assertEqual(self.book(second_client).status_code, 429)
+        self.assertEqual(self.book(second_client, second['token']).status_code, 429)
+        self.assertEqual(self.book(second_client, first['token']).status_code, 429)
+        self.assertEqual(self.book(first_client, first['token']).status_code, 201)
+
+
+class SweepConflictTests(TestCase):
+    def test_existing_and_earlier_candidates_win(self):
+        existing = [Interval('a', 10, 20, 'existing')]
+        candidates = [
+            Interval('a', 20, 30, 'touches'),
+            Interval('a', 15, 25, 'overlaps existing'),
+            Interval('a', 25, 35, 'overlaps touches'),
+            Interval('b', 10, 20, 'other key'),
+        ]
+
+        accepted, conflicts = sweep_conflicts(existing, candidates)
+
+        self.assertEqual([iv.item for iv in accepted], ['touches', 'other key'])
+        self.assertEqual(
+            [(candidate.item, blocker.item) for candidate, blocker in conflicts],
+            [('overlaps existing', 'existing'), ('overlaps touches', 'touches')]
+        )
+
+
+class SlotGenerationTests(TestCase):
+    def setUp(self):
+        self.existing = create_slot(days_ahead=30)
+        self.agenda = self.existing.agenda
+        self.staff = self.existing.staff
+        # A fortnight starting on a Monday
+        monday = timezone.now().date() + timedelta(days=7 - timezone.now().weekday())
+        Agenda.objects.filter(id=self.agenda.id).update(start_date=monday, end_date=monday + timedelta(days=13))
+        self.monday = monday
+        self.client = APIClient()
+        self.client.force_authenticate(self.staff)
+
+    def generate(self, **data):
+        data.setdefault('recurrence_pattern', {
+            'freq': 'weekly',
+            'by_weekday': ['MO', 'WE'],
+            'times': [{'start': '09:00', 'end': '10:00'}],
+            'exceptions': [str(self.monday + timedelta(days=9))],
+        })
+        return self.client.post(f'/api/appointments/agendas/{self.agenda.id}/generate-slots/', data, format='json')
+
+    def test_weekly_pattern_is_materialized_once(self):
+        # Another agenda's slot for the same staff member on the first Monday at 09:00
+        create_slot(agenda=create_slot().agenda, staff=self.staff,
+                    days_ahead=(self.monday - timezone.now().date()).days, start=time(9, 0), end=time(9, 30))
+
+        response = self.generate()
+
+        # 3 dates (second Wednesday is an exception) x 2 half-hour slots, minus the clash
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['created'], 5)
+        self.assertEqual([c['reason'] for c in response.data['conflicts']], ['overlaps_existing_slot'])
+        self.assertEqual(CalendarSlot.objects.filter(agenda=self.agenda).count(), 6)
+        self.agenda.refresh_from_db()
+        self.assertTrue(self.agenda.is_recurring)
+
+        rerun = self.generate()
+        self.assertEqual(rerun.data['created'], 0)
+        self.assertEqual(
+            sorted({c['reason'] for c in rerun.data['conflicts']}), ['already_exists', 'overlaps_existing_slot']
+        )
+
+        # A cancelled slot frees its time, but a new slot cannot reuse its key
+        cancelled = CalendarSlot.objects.get(
+            agenda=self.agenda, slot_date=self.monday + timedelta(days=7), start_time=time(9, 30)
+        )
+        CalendarSlot.objects.filter(id=cancelled.id).update(status='cancelled')
+        conflicts = self.generate(dry_run=True).data['conflicts']
+        self.assertIn(
+            ('cancelled_slot', cancelled.id), [(c['reason'], c.get('conflicting_slot_id')) for c in conflicts]
+        )
+
+    def test_dry_run_and_validation(self):
+        response = self.generate(dry_run=True)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['created'], 6)
+        self.assertEqual(CalendarSlot.objects.filter(agenda=self.agenda).count(), 1)
+
+        self.assertEqual(self.generate(recurrence_pattern={'type': 'weekly'}).status_code, 400)
+
+        self.client.force_authenticate(create_user('talent1', 'talent'))
+        self.assertEqual(self.generate().status_code, 403)
+
+    def test_slots_outside_availability_template_are_skipped(self):
+        response = self.client.put(f'/api/appointments/staff/{self.staff.id}/availability/', {
+            'weekly': {'MO': [{'start': '09:00', 'end': '09:30'}], 'WE': [{'start': '08:00', 'end': '12:00'}]},
+        }, format='json')
+        self.assertEqual(response.status_code, 200)
+
+        response = self.generate(dry_run=True)
+
+        self.assertEqual(response.data['created'], 4)
+        self.assertEqual([c['reason'] for c in response.data['conflicts']], ['outside_availability'] * 2)
+
+
+class BulkSlotCreateTests(TestCase):
+    def setUp(self):
+        self.existing = create_slot(days_ahead=10, start=time(9, 0), end=time(9, 30))
+        self.client = APIClient()
+        self.client.force_authenticate(self.existing.staff)
+
+    def item(self, start, end, days_ahead=10, **extra):
+        return dict({
+            'agenda_id': self.existing.agenda_id,
+            'staff_id': self.existing.staff_id,
+            'slot_date': str(timezone.now().date() + timedelta(days=days_ahead)),
+            'start_time': start,
+            'end_time': end,
+        }, **extra)
+
+    def test_valid_items_are_created_and_conflicts_reported(self):
+        items = [
+            self.item('10:00', '10:30'),
+            self.item('09:15', '09:45'),              # overlaps the existing slot
+            self.item('10:15', '10:45'),              # overlaps item 0
+            self.item('10:30', '11:00'),
+            self.item('12:00', '11:00'),              # invalid times
+            self.item('09:00', '09:30', days_ahead=11),
+            self.item('13:00', '13:30', agenda_id=create_slot().agenda_id),  # another university
+        ]
+
+        response = self.client.post('/api/appointments/slots/bulk/', {'slots': items}, format='json')
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual([c['index'] for c in response.data['created']], [0, 3, 5])
+        self.assertEqual([e['index'] for e in response.data['errors']], [1, 2, 4, 6])
+        self.assertIn(str(self.existing.id), response.data['errors'][0]['errors'][0])
+        self.assertIn('item 0', response.data['errors'][1]['errors'][0])
+        self.assertEqual(CalendarSlot.objects.filter(agenda=self.existing.agenda).count(), 4)
+
+    def test_cancelled_slots_only_keep_their_start_time(self):
+        CalendarSlot.objects.filter(id=self.existing.id).update(status='cancelled')
+        items = [self.item('09:10', '09:40'), self.item('09:00', '09:05', days_ahead=10)]
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/appointments/slots/bulk/', {'slots': items}, format='json')
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual([c['index'] for c in response.data['created']], [0])
+        # Same agenda, staff, date and start time as the cancelled slot: unique_together still applies
+        self.assertIn(str(self.existing.id), response.data['errors'][0]['errors'][0])
+
+    def test_talents_cannot_bulk_create(self):
+        self.client.force_authenticate(create_user('talent1', 'talent'))
+        response = self.client.post(
+            '/api/appointments/slots/bulk/', {'slots': [self.item('10:00', '10:30')]}, format='json'
+        )
+        self.assertEqual(response.status_code, 403)
+
+
+class StaffOverlapConstraintTests(TestCase):
+    def setUp(self):
+        self.slot = create_slot(start=time(10, 0), end=time(10, 30))
+        self.client = APIClient()
+        self.client.force_authenticate(self.slot.staff)
+
+    @override_settings(SLOT_OVERLAP_PRECHECK=False)
+    def test_create_and_update_cannot_overlap_without_precheck(self):
+        data = {
+            'agenda_id': self.slot.agenda_id,
+            'staff_id': self.slot.staff_id,
+            'slot_date': str(self.slot.slot_date),
+            'start_time': '10:15',
+            'end_time': '10:45',
+        }
+        self.assertEqual(self.client.post('/api/appointments/slots/', data, format='json').status_code, 400)
+
+        later = create_slot(agenda=self.slot.agenda, staff=self.slot.staff, start=time(11, 0), end=time(11, 30))
+        response = self.client.patch(f'/api/appointments/slots/{later.id}/', {'start_time': '10:20'}, format='json')
+        self.assertEqual(response.status_code, 400)
+        later.refresh_from_db()
+        self.assertEqual(later.start_time, time(11, 0))
+
+    def test_moving_a_booked_slot_onto_its_talents_other_booking_is_a_400(self):
+        talent = create_user('talent1', 'talent')
+        other = create_slot(start=time(11, 0), end=time(11, 30))
+        Appointment.objects.create(calendar_slot=self.slot, talent=talent)
+        Appointment.objects.create(calendar_slot=other, talent=talent)
+        self.client.force_authenticate(other.staff)
+
+        # Edits that keep the window leave the bookings alone
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.patch(f'/api/appointments/slots/{other.id}/', {'location': 'Room 2'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse([q for q in queries if q['sql'].startswith('UPDATE "appointments"')])
+
+        response = self.client.patch(f'/api/appointments/slots/{other.id}/', {'start_time': '10:15'}, format='json')
+        self.assertEqual(response.status_code, 400)
+        other.refresh_from_db()
+        self.assertEqual(other.start_time, time(11, 0))
+
+    def test_cancelled_slots_do_not_block(self):
+        CalendarSlot.objects.filter(id=self.slot.id).update(status='cancelled')
+        create_slot(agenda=self.slot.agenda, staff=self.slot.staff, start=time(10, 15), end=time(10, 45))
+
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            create_slot(agenda=self.slot.agenda, staff=self.slot.staff, start=time(10, 40), end=time(11, 0))
+
+
+class AvailableSlotsViewTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        first = create_slot(days_ahead=2, start=time(9, 0), end=time(9, 30))
+        self.agenda = first.agenda
+        self.slot_ids = [first.id] + [
+            create_slot(agenda=self.agenda, days_ahead=days_ahead, start=start, end=time(start.hour, 30)).id
+            for days_ahead, start in [(1, time(14, 0)), (2, time(8, 0)), (1, time(9, 0)), (3, time(9, 0))]
+        ]
+        self.client = APIClient()
+        self.client.force_authenticate(create_user('talent1', 'talent'))
+
+    def test_keyset_pages_cover_all_slots_in_order(self):
+        seen = []
+        response = self.client.get('/api/appointments/slots/available/', {'agenda_id': self.agenda.id, 'page_size': 2})
+        while True:
+            self.assertEqual(response.status_code, 200)
+            seen += [(slot['slot_date'], slot['start_time']) for slot in response.data['results']]
+            if response.data['next'] is None:
+                break
+            response = self.client.get(response.data['next'])
+
+        self.assertEqual(len(seen), 5)
+        self.assertEqual(seen, sorted(seen))
+        self.assertNotIn('agenda', response.data['results'][0])
+
+    def test_query_count_does_not_grow_with_page_size(self):
+        def count_queries(size):
+            cache.clear()  # measure the Postgres path, not the snapshot
+            with CaptureQueriesContext(connection) as queries:
+                self.client.get('/api/appointments/slots/available/', {'agenda_id': self.agenda.id, 'page_size': size})
+            return len(queries)
+
+        self.assertEqual(count_queries(1), count_queries(50))
+        self.assertEqual(self.client.get('/api/appointments/slots/available/', {
+            'agenda_id': self.agenda.id, 'cursor': 'bogus'
+        }).status_code, 400)
+        self.assertEqual(self.client.get('/api/appointments/slots/available/', {
+            'agenda_id': self.agenda.id, 'cursor': encode_cursor([{'a': 1}, 1, 1])
+        }).status_code, 400)
+
+    def available_ids(self):
+        response = self.client.get('/api/appointments/slots/available/', {'agenda_id': self.agenda.id})
+        self.assertEqual(response.status_code, 200)
+        return [slot['id'] for slot in response.data['results']]
+
+    def test_snapshot_serves_repeat_reads_without_queries(self):
+        first = self.available_ids()
+
+        with self.assertNumQueries(0):
+            self.assertEqual(self.available_ids(), first)
+
+    def test_snapshot_pages_read_only_the_requested_range(self):
+        def walk(**params):
+            seen = []
+            response = self.client.get('/api/appointments/slots/available/', dict(params, agenda_id=self.agenda.id, page_size=1))
+            while True:
+                self.assertEqual(response.status_code, 200)
+                seen += [slot['id'] for slot in response.data['results']]
+                if response.data['next'] is None:
+                    return seen
+                response = self.client.get(response.data['next'])
+
+        today = timezone.now().date()
+        window = {'start_date': str(today + timedelta(days=2)), 'end_date': str(today + timedelta(days=2))}
+        from_postgres = walk(**window)
+        self.assertEqual(from_postgres, [self.slot_ids[2], self.slot_ids[0]])
+
+        with self.assertNumQueries(0):
+            self.assertEqual(walk(**window), from_postgres)
+            self.assertEqual(walk(), [self.slot_ids[i] for i in (3, 1, 2, 0, 4)])
+        self.assertEqual(len(slot_snapshots.load_range(self.agenda.id, today, None, None, 2)), 2)
+        # The rows expire with the snapshot
+        self.assertGreater(slot_snapshots._redis().pttl(slot_snapshots.ROWS_KEY.format(agenda_id=self.agenda.id)), 0)
+
+    @mock.patch.object(send_appointment_confirmation, 'delay')
+    def test_bookings_write_through_to_snapshot(self, delay):
+        slot_id = self.slot_ids[3]
+        self.assertIn(slot_id, self.available_ids())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            appointment_id = self.client.post(
+                '/api/appointments/book/', {'calendar_slot_id': slot_id}, format='json'
+            ).data['id']
+        with self.assertNumQueries(0):
+            self.assertNotIn(slot_id, self.available_ids())
+
+        with mock.patch.object(send_cancellation_email, 'delay'), self.captureOnCommitCallbacks(execute=True):
+            self.client.post(f'/api/appointments/{appointment_id}/cancel/')
+        self.assertIn(slot_id, self.available_ids())
+
+        # An update carrying an older version than the snapshot's is dropped
+        slot_snapshots._apply(self.agenda.id, [(slot_id, 1, '', '')])
+        self.assertIn(slot_id, self.available_ids())
+
+
+class ListKeysetPaginationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.talent = create_user('talent1', 'talent')
+        first = create_slot(start=time(8, 0), end=time(8, 30))
+        created_at = timezone.now().replace(microsecond=500)
+        # Groups of equal created_at values, all within one millisecond, so
+        # both the microseconds and the id tie-break decide the order
+        self.appointment_ids = [
+            Appointment.objects.create(
+                calendar_slot=create_slot(agenda=first.agenda, staff=first.staff, start=time(hour, 0), end=time(hour, 30)),
+                talent=self.talent,
+                created_at=created_at - timedelta(microseconds=hour // 3),
+            ).id
+            for hour in range(9, 16)
+        ]
+        self.client = APIClient()
+        self.client.force_authenticate(self.talent)
+
+    def test_cursor_pages_follow_created_at_then_id(self):
+        seen = []
+        # Pages of 2 split the tie groups of 3
+        response = self.client.get('/api/appointments/', {'pagination': 'cursor', 'page_size': 2})
+        while True:
+            self.assertEqual(response.status_code, 200)
+            self.assertNotIn('count', response.data)
+            seen += [appointment['id'] for appointment in response.data['results']]
+            if response.data['next'] is None:
+                break
+            response = self.client.get(response.data['next'])
+
+        expected = Appointment.objects.order_by('-created_at', 'id').values_list('id', flat=True)
+        self.assertEqual(seen, list(expected))
+
+    def test_page_numbers_remain_the_default(self):
+        response = self.client.get('/api/appointments/slots/')
+        self.assertEqual(response.data['count'], 8)
+        for cursor in ['bogus', encode_cursor(['notadate', 'x', 1]), encode_cursor([{'a': 1}, 1, 1])]:
+            self.assertEqual(self.client.get('/api/appointments/slots/', {'cursor': cursor}).status_code, 400)
+        for cursor in [encode_cursor(['notadate', 'x']), encode_cursor([{'a': 1}, 1])]:
+            self.assertEqual(self.client.get('/api/appointments/', {'cursor': cursor}).status_code, 400)
+
+
+class SparseFieldsetTests(TestCase):
+    def setUp(self):
+        self.talent = create_user('talent1', 'talent')
+        self.slot = create_slot()
+        self.client = APIClient()
+        self.client.force_authenticate(self.talent)
+
+    def book(self, hour):
+        slot = create_slot(agenda=self.slot.agenda, staff=self.slot.staff, start=time(hour, 0), end=time(hour, 30))
+        return Appointment.objects.create(calendar_slot=slot, talent=self.talent)
+
+    def appointments(self, **params):
+        response = self.client.get('/api/appointments/', params)
+        self.assertEqual(response.status_code, 200)
+        return response.data['results']
+
+    def test_related_objects_are_ids_unless_expanded(self):
+        self.book(9)
+
+        legacy = self.appointments()[0]
+        self.assertEqual(legacy['calendar_slot']['agenda']['university']['id'], self.slot.agenda.university_id)
+
+        self.assertIsInstance(self.appointments(expand='')[0]['calendar_slot'], int)
+        self.assertEqual(set(self.appointments(fields='id,status')[0]), {'id', 'status'})
+        sparse = self.appointments(fields='id,calendar_slot.slot_date,calendar_slot.agenda', expand='calendar_slot.agenda')[0]
+        self.assertEqual(set(sparse['calendar_slot']), {'slot_date', 'agenda'})
+        self.assertEqual(sparse['calendar_slot']['agenda']['university'], self.slot.agenda.university_id)
+        self.assertEqual(sparse['calendar_slot']['agenda']['staff_assignments'], [])
+
+    def test_query_count_does_not_grow_with_expanded_rows(self):
+        def count_queries(**params):
+            with CaptureQueriesContext(connection) as queries:
+                self.appointments(**params)
+            return len(queries)
+
+        self.book(9)
+        counts = [count_queries(), count_queries(expand='calendar_slot.agenda.university,talent')]
+        self.book(12)
+        self.book(13)
+        self.assertEqual([count_queries(), count_queries(expand='calendar_slot.agenda.university,talent')], counts)
+
+
+@mock.patch.object(send_appointment_confirmation, 'delay')
+class CalendarSummaryTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.slot = create_slot()
+        self.other = create_slot(agenda=self.slot.agenda, staff=self.slot.staff, start=time(11, 0), end=time(11, 30))
+        create_slot(agenda=self.slot.agenda, staff=self.slot.staff, days_ahead=40)
+        self.client = APIClient()
+        self.client.force_authenticate(create_user('talent1', 'talent'))
+
+    def summary(self):
+        response = self.client.get('/api/appointments/calendar/summary/', {
+            'agenda_id': self.slot.agenda_id, 'month': self.slot.slot_date.strftime('%Y-%m')
+        })
+        self.assertEqual(response.status_code, 200)
+        return response.data['days']
+
+    def test_counts_per_day_follow_bookings(self, delay):
+        day = {'date': self.slot.slot_date.isoformat(), 'total': 2, 'fully_booked': 0}
+        self.assertEqual(self.summary(), [dict(day, available=2, my_bookings=0)])
+        # Served from the cache; only the agenda lookup hits Postgres
+        with self.assertNumQueries(1):
+            self.summary()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post('/api/appointments/book/', {'calendar_slot_id': self.other.id}, format='json')
+
+        self.assertEqual(self.summary(), [dict(day, available=1, fully_booked=1, my_bookings=1)])
+        self.assertEqual(self.client.get('/api/appointments/calendar/summary/', {
+            'agenda_id': self.slot.agenda_id, 'month': '2026-13'
+        }).status_code, 400)
+
+
+class CalendarFeedTests(TestCase):
+    def setUp(self):
+        self.slot = create_slot()
+        self.talent = create_user('talent1', 'talent')
+        self.appointment = Appointment.objects.create(calendar_slot=self.slot, talent=self.talent)
+        api = APIClient()
+        api.force_authenticate(self.talent)
+        self.feeds = api
+        self.url = api.get('/api/appointments/calendar/feeds/').data['appointments']
+
+    def test_feed_streams_events_and_revalidates_cheaply(self):
+        response = Client().get(self.url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        body = b''.join(response.streaming_content).decode()
+        self.assertTrue(body.startswith('BEGIN:VCALENDAR\r\n'))
+        self.assertIn(f'UID:appointment-{self.appointment.booking_reference}@jobgate', body)
+        self.assertTrue(all(len(line.encode()) <= 75 for line in body.split('\r\n')))
+
+        with self.assertNumQueries(1):
+            cached = Client().get(self.url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(cached.status_code, 304)
+        Appointment.objects.filter(id=self.appointment.id).update(status='cancelled')
+        self.assertEqual(Client().get(self.url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 200)
+
+    def test_tokens_are_scoped(self):
+        self.assertEqual(Client().get('/api/appointments/calendar/appointments.ics', {'token': 'forged'}).status_code, 403)
+        self.assertEqual(self.feeds.get('/api/appointments/calendar/feeds/', {
+            'agenda_id': self.slot.agenda_id
+        }).status_code, 403)
+        # A user feed token does not open an agenda feed
+        token = self.url.split('token=')[1]
+        self.assertEqual(Client().get(
+            f'/api/appointments/agendas/{self.slot.agenda_id}/slots.ics', {'token': token}
+        ).status_code, 403)
+
+        self.feeds.force_authenticate(create_user('admin1', 'admin'))
+        agenda_url = self.feeds.get('/api/appointments/calendar/feeds/', {'agenda_id': self.slot.agenda_id}).data['agenda']
+        response = Client().get(agenda_url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(f'UID:slot-{self.slot.id}@jobgate', b''.join(response.streaming_content).decode())
+
+
+class AppointmentExportTests(TestCase):
+    def setUp(self):
+        self.slot = create_slot()
+        self.other_slot = create_slot(start=time(12, 0), end=time(12, 30))
+        self.talent = create_user('talent1', 'talent')
+        self.talent.first_name = '=HYPERLINK("x")'
+        self.talent.save()
+        self.appointment = Appointment.objects.create(calendar_slot=self.slot, talent=self.talent)
+        Appointment.objects.create(calendar_slot=self.other_slot, talent=self.talent)
+        self.client = APIClient()
+
+    def export(self, user, **params):
+        self.client.force_authenticate(user)
+        return self.client.get('/api/appointments/export.csv', params)
+
+    def test_staff_export_streams_their_university_only(self):
+        response = self.export(self.slot.staff, status='confirmed')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertTrue(response['Content-Type'].startswith('text/csv'))
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(len(lines), 2)
+        self.assertTrue(lines[0].startswith('booking_reference,status,slot_date'))
+        self.assertTrue(lines[1].startswith(f'{self.appointment.booking_reference},confirmed,'))
+        # Formula-like text is neutralised for spreadsheets
+        self.assertIn('\'=HYPERLINK', lines[1])
+
+        self.assertEqual(len(self.export(self.slot.staff, status='cancelled').getvalue().splitlines()), 1)
+
+    def test_admins_export_everything_and_talents_are_refused(self):
+        self.client.force_authenticate(create_user('admin_export', 'admin'))
+        response = self.client.get('/api/appointments/export.csv', HTTP_ACCEPT='text/csv')
+        self.assertEqual(len(response.getvalue().splitlines()), 3)
+        self.assertEqual(self.export(self.talent).status_code, 403)
+
+
+@mock.patch.object(send_appointment_confirmation, 'delay')
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.slot = create_slot(max_capacity=2)
+        self.client = APIClient()
+        self.client.force_authenticate(create_user('talent1', 'talent'))
+
+    def revalidate(self, url, params):
+        etag = self.client.get(url, params)['ETag']
+        return etag, self.client.get(url, params, HTTP_IF_NONE_MATCH=etag)
+
+    def test_unchanged_available_slots_are_not_modified_without_queries(self, delay):
+        params = {'agenda_id': self.slot.agenda_id}
+        etag, response = self.revalidate('/api/appointments/slots/available/', params)
+        self.assertEqual(response.status_code, 304)
+        with self.assertNumQueries(0):
+            self.client.get('/api/appointments/slots/available/', params, HTTP_IF_NONE_MATCH=etag)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post('/api/appointments/book/', {'calendar_slot_id': self.slot.id}, format='json')
+
+        response = self.client.get('/api/appointments/slots/available/', params, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['results'][0]['available_capacity'], 1)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_slot_and_agenda_lists_change_etag_on_agenda_edit(self, delay):
+        etags = {}
+        for url, params in [
+            ('/api/appointments/slots/', {'agenda_id': self.slot.agenda_id}),
+            ('/api/appointments/agendas/', {}),
+        ]:
+            etag, response = self.revalidate(url, params)
+            self.assertEqual(response.status_code, 304)
+            etags[url] = (etag, params)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(f'/api/appointments/agendas/{self.slot.agenda_id}/', {'name': 'Renamed'}, format='json')
+
+        for url, (etag, params) in etags.items():
+            self.assertEqual(self.client.get(url, params, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+class FreeBusyTests(TestCase):
+    def setUp(self):
+        first = create_slot(start=time(10, 0), end=time(10, 30))
+        self.agenda, self.staff = first.agenda, first.staff
+        create_slot(agenda=self.agenda, start=time(10, 30), end=time(11, 0))
+        self.other = create_user('staff_other', 'university_staff')
+        create_slot(agenda=self.agenda, staff=self.other, start=time(9, 30), end=time(10, 15))
+        cancelled = create_slot(agenda=self.agenda, staff=self.other, start=time(11, 0), end=time(11, 30))
+        CalendarSlot.objects.filter(id=cancelled.id).update(status='cancelled')
+
+        self.day = first.slot_date
+        self.client = APIClient()
+        self.client.force_authenticate(self.staff)
+
+    def at(self, hour, minute=0):
+        return timezone.make_aware(datetime.combine(self.day, time(hour, minute))).isoformat()
+
+    def test_merges_busy_and_intersects_free_time(self):
+        response = self.client.get('/api/appointments/freebusy/', {
+            'staff_ids': f'{self.staff.id},{self.other.id}', 'start': self.at(9), 'end': self.at(12),
+        })
+
+        self.assertEqual(response.status_code, 200)
+        mine = response.data['staff'][str(self.staff.id)]
+        self.assertEqual(mine['busy'], [[self.at(10), self.at(11)]])
+        self.assertEqual(mine['free'], [[self.at(9), self.at(10)], [self.at(11), self.at(12)]])
+        self.assertEqual(response.data['staff'][str(self.other.id)]['busy'], [[self.at(9, 30), self.at(10, 15)]])
+        self.assertEqual(response.data['common_free'], [[self.at(9), self.at(9, 30)], [self.at(11), self.at(12)]])
+
+    def test_date_only_end_includes_that_day(self):
+        response = self.client.get('/api/appointments/freebusy/', {
+            'staff_ids': str(self.staff.id), 'start': str(self.day), 'end': str(self.day),
+        })
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['staff'][str(self.staff.id)]['busy'], [[self.at(10), self.at(11)]])
+
+    def test_rejects_talents_and_bad_windows(self):
+        params = {'staff_ids': str(self.staff.id), 'start': str(self.day), 'end': str(self.day - timedelta(days=1))}
+        self.assertEqual(self.client.get('/api/appointments/freebusy/', params).status_code, 400)
+
+        self.client.force_authenticate(create_user('talent1', 'talent'))
+        params['end'] = str(self.day)
+        self.assertEqual(self.client.get('/api/appointments/freebusy/', params).status_code, 403)
+
+
+class AvailabilityTemplateTests(TestCase):
+    def test_tiling_exceptions_and_intersection(self):
+        monday = date(2026, 11, 2)
+        first = availability.Template(availability.parse_weekly({
+            'MO': [{'start': '09:00', 'end': '12:00'}], 'WE': [{'start': '14:00', 'end': '24:00'}],
+        }), [{'date': '2026-11-09', 'start': '10:00', 'end': '11:00'}])
+        second = availability.Template(availability.parse_weekly({'MO': [{'start': '11:00', 'end': '13:00'}]}), [])
+
+        # Starting on a Wednesday: the week is rotated before it is tiled
+        bits = availability.range_bits(first, monday + timedelta(days=2), monday + timedelta(days=7))
+        self.assertEqual(availability.runs(bits), [(168, 288), (1548, 1560), (1572, 1584)])
+        self.assertEqual(availability.format_weekly(first.week)['WE'], [{'start': '14:00', 'end': '24:00'}])
+
+        common = availability.common_bits([first, second], monday, monday + timedelta(days=13))
+        self.assertEqual(
+            [(start.time(), end.time(), start.date()) for start, end in availability.bits_to_intervals(common, monday)],
+            [(time(11, 0), time(12, 0), monday), (time(11, 0), time(12, 0), monday + timedelta(days=7))]
+        )
+
+    def test_free_busy_stays_inside_template(self):
+        slot = create_slot(start=time(10, 0), end=time(11, 0))
+        client = APIClient()
+        client.force_authenticate(slot.staff)
+        response = client.put(f'/api/appointments/staff/{slot.staff.id}/availability/', {
+            'weekly': {day: [{'start': '09:00', 'end': '12:00'}] for day in availability.WEEKDAYS},
+            'exceptions': [{'date': str(slot.slot_date), 'start': '11:30', 'end': '12:00'}],
+        }, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['weekly']['MO'], [{'start': '09:00', 'end': '12:00'}])
+
+        at = lambda hour, minute=0: timezone.make_aware(datetime.combine(slot.slot_date, time(hour, minute))).isoformat()
+        response = client.get('/api/appointments/freebusy/', {
+            'staff_ids': str(slot.staff.id), 'start': at(0), 'end': at(23, 55),
+        })
+
+        self.assertEqual(response.data['common_free'], [[at(9), at(10)], [at(11), at(11, 30)]])
+
+        other = create_user('staff_other', 'university_staff')
+        client.force_authenticate(other)
+        self.assertEqual(client.put(f'/api/appointments/staff/{slot.staff.id}/availability/', {
+            'weekly': {}}, format='json').status_code, 403)
+        self.assertEqual(client.put(f'/api/appointments/staff/{other.id}/availability/', {
+            'weekly': {'MO': [{'start': '09:03', 'end': '10:00'}]}}, format='json').status_code, 400)
+        self.assertEqual(client.put(f'/api/appointments/staff/{other.id}/availability/', {
+            'weekly': {'MO': 5}}, format='json').status_code, 400)
+
+
+@mock.patch.object(send_cancellation_email, 'delay')
+@mock.patch.object(send_appointment_confirmation, 'delay')
+class NextAvailableSlotTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.later = create_slot(days_ahead=5)
+        self.sooner = create_slot(days_ahead=3)
+        self.other_theme = create_slot(days_ahead=1)
+        self.other_theme.agenda.theme = AppointmentTheme.objects.create(name='Mock Interviews')
+        self.other_theme.agenda.save()
+        next_available.rebuild()
+        self.client = APIClient()
+        self.client.force_authenticate(create_user('talent1', 'talent'))
+
+    def search(self, **params):
+        response = self.client.get('/api/appointments/slots/next-available/', params)
+        self.assertEqual(response.status_code, 200)
+        return [entry['id'] for entry in response.data]
+
+    def test_earliest_first_within_theme(self, confirmation_delay, cancellation_delay):
+        self.assertEqual(self.search(), [self.other_theme.id, self.sooner.id, self.later.id])
+        self.assertEqual(self.search(theme_id=self.sooner.agenda.theme_id, limit=1), [self.sooner.id])
+
+    def test_non_integer_ids_are_rejected(self, confirmation_delay, cancellation_delay):
+        for params in [{'theme_id': 'abc'}, {'university_profile_id': 'x'}]:
+            response = self.client.get('/api/appointments/slots/next-available/', params)
+            self.assertEqual(response.status_code, 400)
+            self.assertIn('error', response.data)
+
+    def test_index_follows_booking_cancellation_and_slot_creation(self, confirmation_delay, cancellation_delay):
+        theme_id = self.sooner.agenda.theme_id
+        # Slot changes reach the index once their transaction commits
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/appointments/book/', {'calendar_slot_id': self.sooner.id}, format='json')
+        self.assertEqual(self.search(theme_id=theme_id), [self.later.id])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(f"/api/appointments/{response.data['id']}/cancel/")
+        self.assertEqual(self.search(theme_id=theme_id), [self.sooner.id, self.later.id])
+
+        self.client.force_authenticate(self.later.staff)
+        with self.captureOnCommitCallbacks(execute=True):
+            created = self.client.post('/api/appointments/slots/', {
+                'agenda_id': self.later.agenda_id,
+                'staff_id': self.later.staff_id,
+                'slot_date': str(self.sooner.slot_date - timedelta(days=1)),
+                'start_time': '10:00',
+                'end_time': '10:30',
+            }, format='json')
+        self.assertEqual(created.status_code, 201)
+        self.assertEqual(len(self.search(theme_id=theme_id)), 3)
+
+
+class RollingHorizonTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.agenda = create_slot(days_ahead=1).agenda
+        self.today = timezone.now().date()
+        Agenda.objects.filter(id=self.agenda.id).update(
+            is_recurring=True,
+            horizon_weeks=1,
+            recurrence_pattern={'freq': 'daily', 'times': [{'start': '09:00', 'end': '09:30'}]},
+        )
+
+    def generated_until(self):
+        return CalendarSlot.objects.filter(agenda=self.agenda, start_time=time(9, 0)).latest('slot_date').slot_date
+
+    def test_beat_task_extends_horizon_idempotently(self):
+        self.assertEqual(extend_slot_horizons(), 8)
+        self.assertEqual(extend_slot_horizons(), 0)
+
+        self.agenda.refresh_from_db()
+        self.assertEqual(self.agenda.materialized_until, self.today + timedelta(weeks=1))
+        self.assertEqual(self.generated_until(), self.today + timedelta(weeks=1))
+
+    def test_available_slots_materializes_beyond_horizon_on_demand(self):
+        client = APIClient()
+        client.force_authenticate(create_user('talent1', 'talent'))
+        until = self.today + timedelta(days=20)
+
+        response = client.get('/api/appointments/slots/available/', {
+            'agenda_id': self.agenda.id, 'end_date': str(until)
+        })
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.generated_until(), until)
+        self.agenda.refresh_from_db()
+        self.assertEqual(self.agenda.materialized_until, until)
+
+    def test_polls_past_the_end_or_with_a_broken_pattern_stay_on_the_snapshot(self):
+        Agenda.objects.filter(id=self.agenda.id).update(recurrence_pattern={'freq': 'yearly'})
+        client = APIClient()
+        client.force_authenticate(create_user('talent1', 'talent'))
+        params = {'agenda_id': self.agenda.id, 'end_date': str(self.agenda.end_date + timedelta(days=30))}
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(client.get('/api/appointments/slots/available/', params).status_code, 200)
+        self.agenda.refresh_from_db()
+        self.assertEqual(self.agenda.materialized_until, self.agenda.end_date)
+
+        # The test runs the snapshot drop after the view rebuilt it, so warm it again
+        client.get('/api/appointments/slots/available/', params)
+        # Nothing left to extend: polls are served from Redis alone
+        with self.assertNumQueries(0):
+            self.assertEqual(client.get('/api/appointments/slots/available/', params).status_code, 200)
+
+
+class PercentileTests(TestCase):
+    def test_nearest_rank(self):
+        values = list(range(1, 101))
+        self.assertEqual(percentile(values, 50), 50)
+        self.assertEqual(percentile(values, 95), 95)
+        self.assertEqual(percentile(values, 99), 99)
+        self.assertIsNone(percentile([], 50))
+
+
+@tag('benchmark')
+class BookingBenchmarkTests(TransactionTestCase):
+    """Run with `manage.py test --tag=benchmark`; excluded runs use --exclude-tag=benchmark"""
+
+    def setUp(self):
+        cache.clear()
+
+    def test_contended_booking_has_no_capacity_violations(self):
+        results = run_booking_benchmark(threads=6, slots=2, capacity=2, operations=15, seed=1)
+
+        self.assertEqual(results['overbooked_slots'], [])
+        self.assertEqual(results['counter_drift_slots'], [])
+        self.assertEqual(results['book_latency']['count'] + results['cancel_latency']['count'], 6 * 15)
+        self.assertGreater(results['outcomes'].get('cancel_200', 0), 0)
+        self.assertGreater(results['outcomes'].get('book_201', 0), 0)
+        self.assertIsNotNone(results['book_latency']['p99_ms'])
@@ -11,17 +11,33 @@ urlpatterns = [
     # Agendas
     path('agendas/', views.AgendaListCreateView.as_view(), name='agenda-list-create'),
     path('agendas/<int:pk>/', views.AgendaDetailView.as_view(), name='agenda-detail'),
+    path('agendas/<int:pk>/waiting-room/', views.agenda_waiting_room_view, name='agenda-waiting-room'),
+    path('agendas/<int:pk>/generate-slots/', views.generate_agenda_slots_view, name='agenda-generate-slots'),
+    path('agendas/<int:pk>/slots.ics', views.agenda_slots_ics_view, name='agenda-slots-ics'),
     
     # Calendar Slots
     path('slots/', views.CalendarSlotListCreateView.as_view(), name='slot-list-create'),
     path('slots/<int:pk>/', views.CalendarSlotDetailView.as_view(), name='slot-detail'),
     path('slots/available/', views.available_slots_view, name='available-slots'),
+    path('slots/next-available/', views.next_available_slots_view, name='next-available-slots'),
+    path('slots/bulk/', views.bulk_create_slots_view, name='slot-bulk-create'),
+    path('slots/<int:pk>/hold/', views.slot_hold_view, name='slot-hold'),
+    path('slots/<int:pk>/waitlist/', views.slot_waitlist_view, name='slot-waitlist'),
     
+    # Staff availability
+    path('freebusy/', views.freebusy_view, name='freebusy'),
+    path('calendar/summary/', views.calendar_summary_view, name='calendar-summary'),
+    path('calendar/feeds/', views.calendar_feeds_view, name='calendar-feeds'),
+    path('calendar/appointments.ics', views.appointments_ics_view, name='appointments-ics'),
+    path('staff/<int:staff_id>/availability/', views.staff_availability_view, name='staff-availability'),
+
     # Appointments
     path('', views.AppointmentListView.as_view(), name='appointment-list'),
     path('<int:pk>/', views.AppointmentDetailView.as_view(), name='appointment-detail'),
+    path('export.csv', views.export_appointments_view, name='appointment-export'),
     path('book/', views.book_appointment_view, name='book-appointment'),
     path('<int:appointment_id>/cancel/', views.cancel_appointment_view, name='cancel-appointment'),
+    path('<int:appointment_id>/reschedule/', views.reschedule_appointment_view, name='reschedule-appointment'),
     
     # Statistics
     path('statistics/', views.appointment_statistics_view, name='statistics'),
@@ -0,0 +1,92 @@
+# FileName: MultipleFiles/versions.py (appointments app)
+"""
+Version counters in Redis behind the ETags of the polled list endpoints.
+
+Each agenda has a counter that every committed change to the agenda or its
+slots bumps, and two global counters cover the agenda and slot lists.
+appointments.slot_changes bumps them after commit. A view builds its ETag
+from the counters it depends on plus the request URL, so it can answer
+If-None-Match with 304 before touching Postgres, and the ETag is read
+before the data so a write racing with the request only costs a 200.
+
+A missing counter (new, evicted or flushed) is seeded with the current time
+in nanoseconds rather than 0, so it never repeats a value an old ETag was
+built from. Edits to nested users, universities or themes do not bump
+anything; those fields are not what the clients poll for.
+"""
+import hashlib
+import json
+import time
+
+from django.utils.cache import patch_cache_control
+from django.utils.http import parse_etags
+from django_redis import get_redis_connection
+from rest_framework import status
+from rest_framework.response import Response
+
+AGENDAS = 'versions:agendas'
+SLOTS = 'versions:slots'
+AGENDA_KEY = 'versions:agenda:{agenda_id}'
+
+# ARGV[1] is the seed for missing counters, ARGV[2] is '1' to bump, '0' to read
+COUNTERS_SCRIPT = """
+local values = {}
+for i, key in ipairs(KEYS) do
+    if redis.call('SET', key, ARGV[1], 'NX') or ARGV[2] ~= '1' then
+        values[i] = redis.call('GET', key)
+    else
+        values[i] = redis.call('INCR', key)
+    end
+end
+return values
+"""
+
+_counters_script = None
+
+
+def agenda(agenda_id):
+    return AGENDA_KEY.format(agenda_id=agenda_id)
+
+
+def _counters(keys, bump):
+    global _counters_script
+    if _counters_script is None:
+        _counters_script = get_redis_connection('default').register_script(COUNTERS_SCRIPT)
+    return _counters_script(keys=keys, args=[time.time_ns(), '1' if bump else '0'])
+
+
+def bump(keys):
+    """Bump the given counters; call once the change is committed"""
+    keys = sorted(set(keys))
+    if keys:
+        _counters(keys, bump=True)
+
+
+def current(keys):
+    """Current values of the given counters"""
+    return [int(value) for value in _counters(list(keys), bump=False)]
+
+
+def etag(keys, *parts):
+    """Strong ETag over the current value of the counters and any other parts the response depends on"""
+    values = current(keys)
+    digest = hashlib.sha1(json.dumps([values, *parts], default=str).encode()).hexdigest()
+    return f'"{digest}"'
+
+
+def not_modified(request, etag):
+    """A 304 response if the request's If-None-Match matches etag, else None"""
+    header = request.headers.get('If-None-Match')
+    if not header:
+        return None
+    tags = [tag.removeprefix('W/') for tag in parse_etags(header)]
+    if etag not in tags and '*' not in tags:
+        return None
+    return tag_response(Response(status=status.HTTP_304_NOT_MODIFIED), etag)
+
+
+def tag_response(response, etag):
+    """Attach the ETag, and ask browsers to revalidate instead of reusing the response as is"""
+    response['ETag'] = etag
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
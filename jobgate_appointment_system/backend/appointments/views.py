@@ -1,26 +1,49 @@
 # FileName: MultipleFiles/views.py (appointments app)
 from django.db.models import F
 from rest_framework import generics, permissions, status
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import api_view, permission_classes, renderer_classes
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
 from django.shortcuts import get_object_or_404
+from django.urls import reverse
 from django.utils import timezone
 from django.db.models import Q, Count, Sum, Avg
 from datetime import datetime, timedelta
 from rest_framework.exceptions import PermissionDenied, ValidationError
 from django.db import transaction
+from django.conf import settings
 from django.utils import timezone
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
+from functools import partial
+from django.utils.dateparse import parse_date, parse_datetime
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views.decorators.http import require_GET
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, urlencode
 from .models import (
     AppointmentTheme, Agenda, CalendarSlot, Appointment,
-    AppointmentStatistics, EmailReminder, AgendaStaffAssignment
+    AppointmentStatistics, EmailReminder, AgendaStaffAssignment, WaitlistEntry, StaffAvailability
 )
 from .serializers import (
     AppointmentThemeSerializer, AgendaSerializer, AgendaCreateSerializer,
     CalendarSlotSerializer, CalendarSlotCreateSerializer,
-    AppointmentSerializer, AppointmentBookingSerializer,
-    AppointmentStatisticsSerializer, EmailReminderSerializer
+    AppointmentSerializer, AppointmentBookingSerializer, AppointmentRescheduleSerializer,
+    AppointmentStatisticsSerializer, EmailReminderSerializer, WaitlistEntrySerializer,
+    SlotGenerationSerializer, CalendarSlotBulkItemSerializer, NextAvailableSlotSerializer,
+    StaffAvailabilitySerializer, AvailableSlotSerializer
+)
+from common.pagination import InvalidCursor, KeysetPagination, keyset_fetch, keyset_slice, page_size
+from .bulk_slots import create_slots, save_slot
+from . import calendar_summary, export, freebusy, ics, next_available, slot_snapshots, versions
+from .booking import (
+    ACTIVE_APPOINTMENT_STATUSES, BookingError, get_bookable_slot, book_slot, cancel_appointment,
+    reschedule_appointment, join_waitlist
 )
+from .holds import acquire_hold, release_hold
+from .idempotency import idempotent
+from .slot_changes import agendas_changed
+from .recurrence import RecurrenceError, extend_horizon, horizon_end, materialize, uses_horizon
+from . import waiting_room
 # Removed: from universities.models import UniversityStaff
 from universities.models import UniversityProfile
 
@@ -44,9 +67,8 @@ class AgendaListCreateView(generics.ListCreateAPIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
-        queryset = Agenda.objects.filter(is_active=True).select_related(
-            'university', 'created_by', 'theme' # created_by is now User
-        ).prefetch_related('eligibility_criteria', 'staff_assignments')
+        # Joins and prefetches follow ?fields= / ?expand=
+        queryset = AgendaSerializer.setup_queryset(Agenda.objects.filter(is_active=True), self.request)
 
         # Filter by university if provided (now UniversityProfile ID)
         university_profile_id = self.request.query_params.get('university_profile_id')
@@ -60,6 +82,12 @@ class AgendaListCreateView(generics.ListCreateAPIView):
 
         return queryset
 
+    def list(self, request, *args, **kwargs):
+        etag = versions.etag([versions.AGENDAS], request.get_full_path())
+        return versions.not_modified(request, etag) or versions.tag_response(
+            super().list(request, *args, **kwargs), etag
+        )
+
     def get_serializer_class(self):
         if self.request.method == 'POST':
             return AgendaCreateSerializer
@@ -72,7 +100,8 @@ class AgendaListCreateView(generics.ListCreateAPIView):
             # linked via a OneToOneField with related_name='university_profile'
             university_profile = self.request.user.university_profile
             # The created_by is the user themselves
-            serializer.save(university=university_profile, created_by=self.request.user)
+            agenda = serializer.save(university=university_profile, created_by=self.request.user)
+            agendas_changed([agenda.id])
         except UniversityProfile.DoesNotExist:
             return Response({"error": "University staff profile not found for this user."}, status=status.HTTP_403_FORBIDDEN)
         except AttributeError: # If user.university_profile doesn't exist
@@ -84,13 +113,29 @@ class AgendaDetailView(generics.RetrieveUpdateDestroyAPIView):
     serializer_class = AgendaSerializer
     permission_classes = [permissions.IsAuthenticated]
 
+    @transaction.atomic
+    def perform_update(self, serializer):
+        agenda = serializer.save()
+        # Theme, university, deadline and is_active all feed the next-available
+        # index, and the dates and waiting room the availability snapshot
+        agendas_changed([agenda.id])
+
+    @transaction.atomic
+    def perform_destroy(self, instance):
+        agenda_id = instance.id
+        instance.delete()
+        agendas_changed([agenda_id])
+
 # Calendar Slots
 class CalendarSlotListCreateView(generics.ListCreateAPIView):
     serializer_class = CalendarSlotSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = KeysetPagination
+    # Matches slot_date_keyset_idx, and slot_agenda_keyset_idx within an agenda
+    keyset_ordering = ['slot_date', 'start_time', 'id']
 
     def get_queryset(self):
-        queryset = CalendarSlot.objects.select_related('agenda', 'staff') # staff is now User
+        queryset = CalendarSlotSerializer.setup_queryset(CalendarSlot.objects.all(), self.request)
 
         # Filter by agenda
         agenda_id = self.request.query_params.get('agenda_id')
@@ -115,87 +160,498 @@ class CalendarSlotListCreateView(generics.ListCreateAPIView):
         if status:
             queryset = queryset.filter(status=status)
 
-        return queryset.order_by('slot_date', 'start_time')
+        return queryset.order_by(*self.keyset_ordering)
+
+    def list(self, request, *args, **kwargs):
+        # Scoped to one agenda, only that agenda's writes change the list
+        agenda_id = request.query_params.get('agenda_id')
+        keys = [versions.agenda(agenda_id)] if agenda_id and agenda_id.isdigit() else [versions.SLOTS]
+        etag = versions.etag(keys, request.get_full_path())
+        return versions.not_modified(request, etag) or versions.tag_response(
+            super().list(request, *args, **kwargs), etag
+        )
 
     def get_serializer_class(self):
         if self.request.method == 'POST':
             return CalendarSlotCreateSerializer
         return CalendarSlotSerializer
 
+    def perform_create(self, serializer):
+        save_slot(serializer)
+
 class CalendarSlotDetailView(generics.RetrieveUpdateDestroyAPIView):
     queryset = CalendarSlot.objects.all()
     serializer_class = CalendarSlotSerializer
     permission_classes = [permissions.IsAuthenticated]
 
+    def perform_update(self, serializer):
+        save_slot(serializer)
+
+    @transaction.atomic
+    def perform_destroy(self, instance):
+        agenda_id = instance.agenda_id
+        instance.delete()
+        agendas_changed([agenda_id])
+
+@api_view(['POST'])
+@permission_classes([permissions.IsAuthenticated])
+def bulk_create_slots_view(request):
+    """Create many calendar slots in one transaction with a per-item error report"""
+    if request.user.user_type not in ['university_staff', 'admin']:
+        return Response(
+            {'error': 'Only university staff can create slots'},
+            status=status.HTTP_403_FORBIDDEN
+        )
+
+    items = request.data.get('slots') if isinstance(request.data, dict) else request.data
+    if not isinstance(items, list) or not items:
+        return Response(
+            {'error': 'Provide a non-empty list of slots, either as the body or under "slots"'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    if len(items) > settings.BULK_SLOT_MAX_ITEMS:
+        return Response(
+            {'error': f'At most {settings.BULK_SLOT_MAX_ITEMS} slots can be created per request'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    validated, errors = [], {}
+    for index, item in enumerate(items):
+        item_serializer = CalendarSlotBulkItemSerializer(data=item)
+        if item_serializer.is_valid():
+            validated.append(item_serializer.validated_data)
+        else:
+            validated.append(None)
+            errors[index] = item_serializer.errors
+
+    created, conflict_errors = create_slots(request.user, validated)
+    errors.update(conflict_errors)
+
+    return Response(
+        {
+            'created': [{'index': index, 'id': slot.id} for index, slot in created],
+            'errors': [{'index': index, 'errors': errors[index]} for index in sorted(errors)],
+        },
+        status=status.HTTP_201_CREATED if created else status.HTTP_400_BAD_REQUEST
+    )
+
+def _parse_window_bound(value, is_end):
+    """A date or datetime query parameter as an aware datetime; a bare end date includes that day"""
+    # Try the date first: parse_datetime also accepts a bare date, as midnight at its start
+    day = parse_date(value)
+    if day is not None:
+        moment = datetime.combine(day + timedelta(days=1) if is_end else day, datetime.min.time())
+    else:
+        moment = parse_datetime(value)
+        if moment is None:
+            raise ValueError(value)
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def freebusy_view(request):
+    """Busy and free intervals of several staff members, and when they are all free"""
+    if request.user.user_type not in ['university_staff', 'admin']:
+        return Response(
+            {'error': 'Only university staff can view free/busy information'},
+            status=status.HTTP_403_FORBIDDEN
+        )
+
+    try:
+        staff_ids = sorted({int(value) for value in request.query_params.get('staff_ids', '').split(',') if value})
+        start = _parse_window_bound(request.query_params['start'], is_end=False)
+        end = _parse_window_bound(request.query_params['end'], is_end=True)
+    except (KeyError, ValueError):
+        return Response(
+            {'error': 'staff_ids (comma-separated), start and end (ISO date or datetime) are required'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    if not staff_ids or len(staff_ids) > freebusy.MAX_STAFF:
+        return Response(
+            {'error': f'Ask for between 1 and {freebusy.MAX_STAFF} staff members'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    if not start < end <= start + timedelta(days=freebusy.MAX_WINDOW_DAYS):
+        return Response(
+            {'error': f'end must be after start and at most {freebusy.MAX_WINDOW_DAYS} days later'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    result = freebusy.free_busy(staff_ids, start, end)
+    return Response({
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'staff': {
+            str(staff_id): {
+                'busy': freebusy.serialize_intervals(entry['busy']),
+                'free': freebusy.serialize_intervals(entry['free']),
+            }
+            for staff_id, entry in result['staff'].items()
+        },
+        'common_free': freebusy.serialize_intervals(result['common_free']),
+    })
+
+@api_view(['GET', 'PUT', 'DELETE'])
+@permission_classes([permissions.IsAuthenticated])
+def staff_availability_view(request, staff_id):
+    """Read, replace or remove a staff member's weekly availability template"""
+    if request.user.user_type not in ['university_staff', 'admin']:
+        return Response(
+            {'error': 'Only university staff can view availability templates'},
+            status=status.HTTP_403_FORBIDDEN
+        )
+    if request.method != 'GET' and request.user.user_type != 'admin' and request.user.id != staff_id:
+        return Response(
+            {'error': 'You can only change your own availability'},
+            status=status.HTTP_403_FORBIDDEN
+        )
+
+    staff = get_object_or_404(User, id=staff_id, user_type__in=['university_staff', 'admin'])
+    template = StaffAvailability.objects.filter(staff=staff).first()
+
+    if request.method == 'PUT':
+        serializer = StaffAvailabilitySerializer(template, data=request.data)
+        serializer.is_valid(raise_exception=True)
+        serializer.save(staff=staff)
+        return Response(serializer.data)
+
+    if template is None:
+        return Response(
+            {'error': 'This staff member has no availability template'},
+            status=status.HTTP_404_NOT_FOUND
+        )
+
+    if request.method == 'DELETE':
+        template.delete()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+    return Response(StaffAvailabilitySerializer(template).data)
+
+def _agenda_manage_error(request, agenda):
+    """403 response unless the user is an admin or staff of the agenda's university"""
+    if request.user.user_type == 'admin':
+        return None
+    if request.user.user_type == 'university_staff':
+        try:
+            if agenda.university_id == request.user.university_profile.id:
+                return None
+        except UniversityProfile.DoesNotExist:
+            pass
+    return Response(
+        {'error': 'Only staff of the agenda\'s university can manage its slots'},
+        status=status.HTTP_403_FORBIDDEN
+    )
+
+@api_view(['POST'])
+@permission_classes([permissions.IsAuthenticated])
+def generate_agenda_slots_view(request, pk):
+    """Expand the agenda's recurrence pattern into calendar slots in bulk"""
+    agenda = get_object_or_404(Agenda, pk=pk, is_active=True)
+    error_response = _agenda_manage_error(request, agenda)
+    if error_response:
+        return error_response
+
+    serializer = SlotGenerationSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    data = serializer.validated_data
+
+    # Rolling-horizon agendas only get their horizon unless a range is asked for
+    end = data.get('end_date')
+    if agenda.horizon_weeks and end is None:
+        end = horizon_end(agenda)
+
+    try:
+        result = materialize(
+            agenda,
+            pattern=data.get('recurrence_pattern'),
+            start=data.get('start_date'),
+            end=end,
+            dry_run=data['dry_run'],
+        )
+    except RecurrenceError as e:
+        return Response({'error': e.message}, status=status.HTTP_400_BAD_REQUEST)
+
+    if not data['dry_run']:
+        update_fields = ['updated_at']
+        # A pattern sent with a real run becomes the agenda's pattern
+        if 'recurrence_pattern' in data:
+            agenda.recurrence_pattern = data['recurrence_pattern']
+            agenda.is_recurring = True
+            update_fields += ['recurrence_pattern', 'is_recurring']
+        if agenda.horizon_weeks and 'start_date' not in data:
+            agenda.materialized_until = max(agenda.materialized_until or result['end_date'], result['end_date'])
+            update_fields.append('materialized_until')
+        agenda.save(update_fields=update_fields)
+        agendas_changed([agenda.id])
+
+    return Response(
+        dict(result, dry_run=data['dry_run']),
+        status=status.HTTP_200_OK if data['dry_run'] else status.HTTP_201_CREATED
+    )
+
+# Matches the slot_agenda_keyset_idx index
+AVAILABLE_SLOTS_ORDERING = ['slot_date', 'start_time', 'id']
+
 @api_view(['GET'])
 @permission_classes([permissions.IsAuthenticated])
 def available_slots_view(request):
-    """Get available slots for booking"""
+    """Get available slots for booking, one keyset-paginated page at a time"""
     agenda_id = request.query_params.get('agenda_id')
     start_date = request.query_params.get('start_date')
     end_date = request.query_params.get('end_date')
 
     if not agenda_id:
         return Response({'error': 'agenda_id is required'}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        agenda_id = int(agenda_id)
+        start_date, end_date = (
+            datetime.strptime(value, '%Y-%m-%d').date() if value else None for value in (start_date, end_date)
+        )
+    except ValueError:
+        return Response(
+            {'error': 'agenda_id must be an integer and start_date and end_date in YYYY-MM-DD format'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
 
-    queryset = CalendarSlot.objects.filter(
-        agenda_id=agenda_id,
-        status='available',
-        current_bookings__lt=F('max_capacity')
-    )
+    # A warm snapshot answers without touching Postgres
+    agenda = slot_snapshots.load_agenda(agenda_id) or _available_slots_agenda(agenda_id)
+    if agenda is None:
+        return Response({'error': 'Agenda not found'}, status=status.HTTP_404_NOT_FOUND)
 
-    if start_date:
-        queryset = queryset.filter(slot_date__gte=start_date)
-    if end_date:
-        queryset = queryset.filter(slot_date__lte=end_date)
+    admission_error = waiting_room.admission_error(request, agenda)
+    if admission_error:
+        return Response({'error': admission_error}, status=status.HTTP_429_TOO_MANY_REQUESTS)
+
+    # The day is part of the ETag: slots drop out as days pass and the horizon moves
+    today = timezone.now().date()
+    etag = versions.etag([versions.agenda(agenda_id)], request.get_full_path(), today)
+    response = versions.not_modified(request, etag)
+    if response:
+        return response
+
+    # Slots past the rolling horizon only exist once someone asks for them
+    extended = False
+    if uses_horizon(agenda):
+        # Past end_date there is nothing to materialize, and asking for it would extend on every poll
+        requested_until = min(end_date or horizon_end(agenda), agenda.end_date)
+        if agenda.materialized_until is None or requested_until > agenda.materialized_until:
+            try:
+                extend_horizon(agenda, until=requested_until)
+            except RecurrenceError:
+                pass  # a broken pattern only means there is nothing more to show
+            agenda, extended = _available_slots_agenda(agenda_id), True
 
     # Only show future slots
-    queryset = queryset.filter(slot_date__gte=timezone.now().date())
+    first_day = max(start_date or date.min, today)
+    try:
+        size = page_size(request, settings.AVAILABLE_SLOTS_PAGE_SIZE, settings.AVAILABLE_SLOTS_MAX_PAGE_SIZE)
+        # A warm snapshot reads just this page of the date range from Redis
+        page = None if extended else keyset_fetch(
+            request, partial(slot_snapshots.load_range, agenda_id, first_day, end_date),
+            AVAILABLE_SLOTS_ORDERING, size
+        )
+        if page is None:
+            # Rows hold ISO strings, which sort like the dates
+            rows = [
+                row for row in slot_snapshots.build(agenda)
+                if row['slot_date'] >= first_day.isoformat()
+                and (end_date is None or row['slot_date'] <= end_date.isoformat())
+            ]
+            page = keyset_slice(request, rows, AVAILABLE_SLOTS_ORDERING, size)
+    except InvalidCursor as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    slots, next_url = page
 
-    serializer = CalendarSlotSerializer(queryset, many=True)
-    return Response(serializer.data)
+    return versions.tag_response(Response({'next': next_url, 'results': slots}), etag)
+
+def _available_slots_agenda(agenda_id):
+    return Agenda.objects.filter(id=agenda_id).only(*slot_snapshots.AGENDA_FIELDS).first()
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def calendar_summary_view(request):
+    """Per-day slot counts of an agenda for one month, for calendar grids"""
+    agenda_id = request.query_params.get('agenda_id')
+    month = request.query_params.get('month') or timezone.now().date().strftime('%Y-%m')
+    try:
+        agenda_id = int(agenda_id)
+        calendar_summary.month_bounds(month)
+    except (TypeError, ValueError):
+        return Response(
+            {'error': 'agenda_id is required and month must be in YYYY-MM format'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    if not Agenda.objects.filter(id=agenda_id).exists():
+        return Response({'error': 'Agenda not found'}, status=status.HTTP_404_NOT_FOUND)
+
+    return Response({
+        'agenda_id': agenda_id,
+        'month': month,
+        'days': calendar_summary.month_summary(agenda_id, month, request.user),
+    })
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def calendar_feeds_view(request):
+    """Subscription URLs of the user's appointment feed and, with ?agenda_id=, of an agenda's slot feed"""
+    feeds = {
+        'appointments': request.build_absolute_uri(
+            reverse('appointments:appointments-ics')
+            + '?' + urlencode({'token': ics.feed_token(ics.USER_FEED, request.user.id)})
+        ),
+    }
+    agenda_id = request.query_params.get('agenda_id')
+    if agenda_id:
+        if not agenda_id.isdigit():
+            return Response({'error': 'agenda_id must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+        agenda = get_object_or_404(Agenda, pk=agenda_id)
+        error_response = _agenda_manage_error(request, agenda)
+        if error_response:
+            return error_response
+        feeds['agenda'] = request.build_absolute_uri(
+            reverse('appointments:agenda-slots-ics', args=[agenda.id])
+            + '?' + urlencode({'token': ics.feed_token(ics.AGENDA_FEED, agenda.id)})
+        )
+    return Response(feeds)
+
+def _ics_response(request, queryset, updated_fields, calendar, filename):
+    """Stream a feed, or answer 304 when the client's copy is current"""
+    etag, last_modified = ics.validators(queryset, *updated_fields)
+    last_modified = last_modified and int(last_modified.timestamp())
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        response = StreamingHttpResponse(calendar, content_type=ics.CONTENT_TYPE)
+        response['Content-Disposition'] = f'inline; filename="{filename}"'
+    response['ETag'] = etag
+    if last_modified:
+        response['Last-Modified'] = http_date(last_modified)
+    return response
+
+# Feeds are fetched by calendar clients, which authenticate with the signed
+# token in the URL and ask for text/calendar, so these are plain Django views
+# (DRF would refuse that Accept header before the view runs)
+@require_GET
+def appointments_ics_view(request):
+    """The token holder's appointments (as talent or staff) as an iCalendar feed"""
+    user_id = ics.read_feed_token(request.GET.get('token', ''), ics.USER_FEED)
+    if user_id is None:
+        return JsonResponse({'error': 'Invalid calendar feed token'}, status=status.HTTP_403_FORBIDDEN)
+    return _ics_response(
+        request, ics.user_appointments(user_id),
+        ['updated_at', 'calendar_slot__updated_at', 'calendar_slot__agenda__updated_at'],
+        ics.user_calendar(user_id), 'appointments.ics'
+    )
+
+@require_GET
+def agenda_slots_ics_view(request, pk):
+    """An agenda's slots as an iCalendar feed"""
+    if ics.read_feed_token(request.GET.get('token', ''), ics.AGENDA_FEED) != pk:
+        return JsonResponse({'error': 'Invalid calendar feed token'}, status=status.HTTP_403_FORBIDDEN)
+    agenda = get_object_or_404(Agenda.objects.only('id', 'name'), pk=pk)
+    return _ics_response(
+        request, ics.agenda_slots(agenda.id), ['updated_at', 'agenda__updated_at'],
+        ics.agenda_calendar(agenda), f'agenda-{agenda.id}.ics'
+    )
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def next_available_slots_view(request):
+    """Earliest bookable slots across agendas, filtered by theme, university and meeting type"""
+    params = request.query_params
+    try:
+        limit = int(params.get('limit', next_available.DEFAULT_LIMIT))
+        after = _parse_window_bound(params['after'], is_end=False) if params.get('after') else None
+        theme_id = int(params['theme_id']) if params.get('theme_id') else None
+        university_id = int(params['university_profile_id']) if params.get('university_profile_id') else None
+    except ValueError:
+        return Response(
+            {'error': 'limit, theme_id and university_profile_id must be integers and after an ISO date or datetime'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    if not 1 <= limit <= next_available.MAX_LIMIT:
+        return Response(
+            {'error': f'limit must be between 1 and {next_available.MAX_LIMIT}'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    entries = next_available.next_available(
+        theme_id=theme_id,
+        university_id=university_id,
+        meeting_type=params.get('meeting_type'),
+        after=after,
+        limit=limit,
+    )
+    return Response(NextAvailableSlotSerializer(entries, many=True).data)
 
 # Appointments
+def _scoped_appointments(request):
+    """Appointments the user may see, narrowed by the ?status=, ?start_date= and ?end_date= filters"""
+    user = request.user
+
+    if user.user_type == 'talent':
+        # Talents can only see their own appointments
+        queryset = Appointment.objects.filter(talent=user)
+    elif user.user_type == 'university_staff':
+        # Staff can see appointments for their university
+        try:
+            # Assuming university_staff user has a UniversityProfile
+            university_profile = user.university_profile
+            queryset = Appointment.objects.filter(
+                calendar_slot__agenda__university=university_profile
+            )
+        except UniversityProfile.DoesNotExist:
+            queryset = Appointment.objects.none()
+        except AttributeError: # If user.university_profile doesn't exist
+            queryset = Appointment.objects.none()
+    else:
+        # Admin can see all appointments
+        queryset = Appointment.objects.all()
+
+    # Filter by status
+    status = request.query_params.get('status')
+    if status:
+        queryset = queryset.filter(status=status)
+
+    # Filter by date range
+    start_date = request.query_params.get('start_date')
+    end_date = request.query_params.get('end_date')
+    if start_date:
+        queryset = queryset.filter(calendar_slot__slot_date__gte=start_date)
+    if end_date:
+        queryset = queryset.filter(calendar_slot__slot_date__lte=end_date)
+
+    return queryset
+
 class AppointmentListView(generics.ListAPIView):
     serializer_class = AppointmentSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = KeysetPagination
+    # Matches appointment_created_keyset_idx and appointment_talent_keyset_idx
+    keyset_ordering = ['-created_at', 'id']
 
     def get_queryset(self):
-        user = self.request.user
-
-        if user.user_type == 'talent':
-            # Talents can only see their own appointments
-            queryset = Appointment.objects.filter(talent=user)
-        elif user.user_type == 'university_staff':
-            # Staff can see appointments for their university
-            try:
-                # Assuming university_staff user has a UniversityProfile
-                university_profile = user.university_profile
-                queryset = Appointment.objects.filter(
-                    calendar_slot__agenda__university=university_profile
-                )
-            except UniversityProfile.DoesNotExist:
-                queryset = Appointment.objects.none()
-            except AttributeError: # If user.university_profile doesn't exist
-                queryset = Appointment.objects.none()
-        else:
-            # Admin can see all appointments
-            queryset = Appointment.objects.all()
-
-        # Filter by status
-        status = self.request.query_params.get('status')
-        if status:
-            queryset = queryset.filter(status=status)
+        queryset = _scoped_appointments(self.request)
+        return AppointmentSerializer.setup_queryset(queryset, self.request).order_by(*self.keyset_ordering)
 
-        # Filter by date range
-        start_date = self.request.query_params.get('start_date')
-        end_date = self.request.query_params.get('end_date')
-        if start_date:
-            queryset = queryset.filter(calendar_slot__slot_date__gte=start_date)
-        if end_date:
-            queryset = queryset.filter(calendar_slot__slot_date__lte=end_date)
-
-        return queryset.select_related('calendar_slot', 'talent').order_by('-created_at')
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+@renderer_classes([JSONRenderer, export.CSVRenderer])
+def export_appointments_view(request):
+    """Stream the appointments visible to university staff or admins as CSV (same filters as the list)"""
+    if request.user.user_type not in ('university_staff', 'admin'):
+        return Response(
+            {'error': 'Only university staff and admins can export appointments'},
+            status=status.HTTP_403_FORBIDDEN
+        )
+    # Same order as the list, served by appointment_created_keyset_idx
+    queryset = _scoped_appointments(request).order_by('-created_at', 'id')
+    response = StreamingHttpResponse(export.rows(queryset), content_type=export.CONTENT_TYPE)
+    response['Content-Disposition'] = f'attachment; filename="appointments-{timezone.now():%Y%m%d}.csv"'
+    return response
 
 class AppointmentDetailView(generics.RetrieveUpdateAPIView):
     queryset = Appointment.objects.all()
@@ -223,6 +679,7 @@ class AppointmentDetailView(generics.RetrieveUpdateAPIView):
 
 @api_view(['POST'])
 @permission_classes([permissions.IsAuthenticated])
+@idempotent
 def book_appointment_view(request):
     """Book an appointment with proper validation and error handling"""
     if request.user.user_type != 'talent':
@@ -237,95 +694,144 @@ def book_appointment_view(request):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
     calendar_slot_id = serializer.validated_data.get('calendar_slot_id')
-    
+
     try:
-        with transaction.atomic():
-            # Get the calendar slot
-            calendar_slot = CalendarSlot.objects.select_for_update().get(
-                id=calendar_slot_id,
-                status='available'
-            )
-            
-            # Check if slot is still available
-            if calendar_slot.current_bookings >= calendar_slot.max_capacity:
-                return Response(
-                    {'error': 'This time slot is fully booked'},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-            
-            # Check if slot is in the future
-            slot_datetime = datetime.combine(
-                calendar_slot.slot_date,
-                calendar_slot.start_time
+        # Deadline checks run on an unlocked read; the seat itself is taken
+        # by a conditional UPDATE inside book_slot, so the slot is never overbooked
+        calendar_slot = get_bookable_slot(calendar_slot_id)
+
+        admission_error = waiting_room.admission_error(request, calendar_slot.agenda)
+        if admission_error:
+            return Response({'error': admission_error}, status=status.HTTP_429_TOO_MANY_REQUESTS)
+
+        # The database write only confirms a seat held in Redis. Talents that
+        # did not take a hold first get one implicitly for this request.
+        hold = acquire_hold(calendar_slot, request.user)
+        if hold is None:
+            return Response(
+                {'error': 'All remaining seats for this time slot are currently on hold'},
+                status=status.HTTP_409_CONFLICT
             )
-            
-            if timezone.now() > timezone.make_aware(slot_datetime):
-                return Response(
-                    {'error': 'Cannot book appointments in the past'},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-            
-            # Check booking deadline
-            booking_deadline = slot_datetime - timedelta(
-                hours=calendar_slot.agenda.booking_deadline_hours
+
+        booked = False
+        try:
+            appointment = book_slot(
+                calendar_slot,
+                request.user,
+                talent_notes=serializer.validated_data.get('talent_notes')
             )
-            
-            if timezone.now() > timezone.make_aware(booking_deadline):
-                return Response(
-                    {'error': 'Booking deadline has passed'},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-            
-            # Check if user already has an appointment for this slot
-            existing_appointment = Appointment.objects.filter(
-                calendar_slot=calendar_slot,
-                talent=request.user,
-                status__in=['confirmed', 'pending']
-            ).exists()
-            
-            if existing_appointment:
-                return Response(
-                    {'error': 'You already have an appointment for this time slot'},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-            
-            # Create the appointment
-            appointment = serializer.save(talent=request.user)
-            
-            # Update slot booking count
-            calendar_slot.current_bookings += 1
-            if calendar_slot.current_bookings >= calendar_slot.max_capacity:
-                calendar_slot.status = 'fully_booked'
-            calendar_slot.save()
-            
-            # Send confirmation email (async task)
-            from .tasks import send_appointment_confirmation
-            send_appointment_confirmation.delay(appointment.id)
-            
-            response_serializer = AppointmentSerializer(appointment)
-            return Response(response_serializer.data, status=status.HTTP_201_CREATED)
-            
-    except CalendarSlot.DoesNotExist:
-        return Response(
-            {'error': 'Calendar slot not found or not available'},
-            status=status.HTTP_404_NOT_FOUND
-        )
+            booked = True
+        finally:
+            # A booked seat no longer needs its hold, and a hold taken for this
+            # request must not outlive it whatever went wrong
+            if booked or hold.created:
+                release_hold(calendar_slot.id, request.user.id)
+
+        response_serializer = AppointmentSerializer(appointment)
+        return Response(response_serializer.data, status=status.HTTP_201_CREATED)
+
+    except BookingError as e:
+        return Response({'error': e.message}, status=e.status_code)
     except Exception as e:
         return Response(
             {'error': f'An error occurred while booking the appointment: {str(e)}'},
             status=status.HTTP_500_INTERNAL_SERVER_ERROR
         )
     
-@api_view(['POST'])
+@api_view(['GET', 'POST'])
 @permission_classes([permissions.IsAuthenticated])
-def cancel_appointment_view(request, appointment_id):
-    """Cancel an appointment"""
-    appointment = get_object_or_404(Appointment, id=appointment_id)
+def agenda_waiting_room_view(request, pk):
+    """Join an agenda's waiting room (POST) or check a queue token's status (GET)"""
+    agenda = get_object_or_404(Agenda, pk=pk, is_active=True)
+
+    if not agenda.waiting_room_enabled:
+        return Response({'waiting_room_enabled': False, 'admitted': True})
+
+    if request.method == 'POST':
+        room_status = waiting_room.join(agenda, request.user)
+        return Response(dict(room_status, waiting_room_enabled=True))
+
+    token = request.headers.get(waiting_room.TOKEN_HEADER) or request.query_params.get('token')
+    room_status = waiting_room.status_for_token(agenda, request.user, token or '')
+    if room_status is None:
+        return Response(
+            {'error': 'Your waiting room token is invalid or has expired; join the waiting room again'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    return Response(dict(room_status, waiting_room_enabled=True))
+
+@api_view(['POST', 'DELETE'])
+@permission_classes([permissions.IsAuthenticated])
+def slot_hold_view(request, pk):
+    """Hold a seat on a slot for a few minutes before booking it, or release the hold"""
+    if request.user.user_type != 'talent':
+        return Response(
+            {'error': 'Only talents can hold appointment slots'},
+            status=status.HTTP_403_FORBIDDEN
+        )
+
+    if request.method == 'DELETE':
+        release_hold(pk, request.user.id)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+    try:
+        calendar_slot = get_bookable_slot(pk)
+    except BookingError as e:
+        return Response({'error': e.message}, status=e.status_code)
+
+    hold = acquire_hold(calendar_slot, request.user)
+    if hold is None:
+        return Response(
+            {'error': 'All remaining seats for this time slot are currently on hold'},
+            status=status.HTTP_409_CONFLICT
+        )
+
+    return Response({
+        'calendar_slot_id': hold.slot_id,
+        'expires_at': hold.expires_at,
+        'hold_minutes': settings.BOOKING_HOLD_MINUTES,
+    }, status=status.HTTP_201_CREATED if hold.created else status.HTTP_200_OK)
+
+@api_view(['GET', 'POST', 'DELETE'])
+@permission_classes([permissions.IsAuthenticated])
+def slot_waitlist_view(request, pk):
+    """Join, inspect or leave the waitlist of a fully booked slot"""
+    if request.user.user_type != 'talent':
+        return Response(
+            {'error': 'Only talents can join a waitlist'},
+            status=status.HTTP_403_FORBIDDEN
+        )
+
+    if request.method == 'POST':
+        try:
+            entry = join_waitlist(pk, request.user, talent_notes=request.data.get('talent_notes'))
+        except BookingError as e:
+            return Response({'error': e.message}, status=e.status_code)
+        return Response(WaitlistEntrySerializer(entry).data, status=status.HTTP_201_CREATED)
+
+    entry = WaitlistEntry.objects.filter(
+        calendar_slot_id=pk,
+        talent=request.user,
+        status='waiting'
+    ).first()
+    if entry is None:
+        return Response(
+            {'error': 'You are not on the waitlist for this time slot'},
+            status=status.HTTP_404_NOT_FOUND
+        )
 
-    # Check permissions
+    if request.method == 'DELETE':
+        entry.status = 'cancelled'
+        entry.save(update_fields=['status'])
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+    return Response(WaitlistEntrySerializer(entry).data)
+
+def _appointment_access_error(request, appointment, action):
+    """403 response if the user may not `action` this appointment, else None"""
     if request.user.user_type == 'talent' and appointment.talent != request.user:
         return Response(
-            {'error': 'You can only cancel your own appointments'},
+            {'error': f'You can only {action} your own appointments'},
             status=status.HTTP_403_FORBIDDEN
         )
     elif request.user.user_type == 'university_staff':
@@ -333,7 +839,7 @@ def cancel_appointment_view(request, appointment_id):
             university_profile = request.user.university_profile
             if appointment.calendar_slot.agenda.university != university_profile:
                 return Response(
-                    {'error': 'You can only cancel appointments for your university'},
+                    {'error': f'You can only {action} appointments for your university'},
                     status=status.HTTP_403_FORBIDDEN
                 )
         except UniversityProfile.DoesNotExist:
@@ -346,12 +852,20 @@ def cancel_appointment_view(request, appointment_id):
                 {'error': 'University staff access required'},
                 status=status.HTTP_403_FORBIDDEN
             )
+    return None
 
+def _appointment_change_error(appointment, action):
+    """400 response if the appointment can no longer be cancelled/rescheduled, else None"""
     if appointment.status == 'cancelled':
         return Response(
             {'error': 'Appointment is already cancelled'},
             status=status.HTTP_400_BAD_REQUEST
         )
+    if appointment.status not in ACTIVE_APPOINTMENT_STATUSES:
+        return Response(
+            {'error': f'A {appointment.status} appointment cannot be {action}'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
 
     # Check cancellation deadline
     slot_datetime = datetime.combine(
@@ -367,21 +881,82 @@ def cancel_appointment_view(request, appointment_id):
             {'error': 'Cancellation deadline has passed'},
             status=status.HTTP_400_BAD_REQUEST
         )
+    return None
+
+@api_view(['POST'])
+@permission_classes([permissions.IsAuthenticated])
+@idempotent
+def cancel_appointment_view(request, appointment_id):
+    """Cancel an appointment"""
+    appointment = get_object_or_404(Appointment.objects.select_related('calendar_slot__agenda'), id=appointment_id)
 
-    # Cancel the appointment
-    appointment.status = 'cancelled'
-    appointment.cancelled_at = timezone.now()
-    appointment.save()
+    error_response = (
+        _appointment_access_error(request, appointment, 'cancel')
+        or _appointment_change_error(appointment, 'cancelled')
+    )
+    if error_response:
+        return error_response
 
-    # Update slot booking count
-    slot = appointment.calendar_slot
-    slot.current_bookings -= 1
-    slot.status = 'available'
-    slot.save()
+    try:
+        appointment = cancel_appointment(
+            appointment, cancelled_by_staff=request.user.user_type != 'talent'
+        )
+    except BookingError as e:
+        return Response({'error': e.message}, status=e.status_code)
 
     serializer = AppointmentSerializer(appointment)
     return Response(serializer.data)
 
+@api_view(['POST'])
+@permission_classes([permissions.IsAuthenticated])
+@idempotent
+def reschedule_appointment_view(request, appointment_id):
+    """Move an appointment to another slot of the same agenda in one transaction"""
+    appointment = get_object_or_404(Appointment.objects.select_related('calendar_slot__agenda'), id=appointment_id)
+
+    error_response = (
+        _appointment_access_error(request, appointment, 'reschedule')
+        or _appointment_change_error(appointment, 'rescheduled')
+    )
+    if error_response:
+        return error_response
+
+    serializer = AppointmentRescheduleSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        new_slot = get_bookable_slot(serializer.validated_data['calendar_slot_id'])
+        if new_slot.agenda_id != appointment.calendar_slot.agenda_id:
+            raise BookingError('Appointments can only be moved to a slot of the same agenda')
+
+        admission_error = waiting_room.admission_error(request, new_slot.agenda)
+        if admission_error:
+            return Response({'error': admission_error}, status=status.HTTP_429_TOO_MANY_REQUESTS)
+
+        # Respect seats other talents are holding, exactly like a new booking
+        hold = acquire_hold(new_slot, appointment.talent)
+        if hold is None:
+            return Response(
+                {'error': 'All remaining seats for this time slot are currently on hold'},
+                status=status.HTTP_409_CONFLICT
+            )
+
+        try:
+            appointment = reschedule_appointment(
+                appointment, new_slot, rescheduled_by_staff=request.user.user_type != 'talent'
+            )
+        except BookingError:
+            if hold.created:
+                release_hold(new_slot.id, appointment.talent_id)
+            raise
+        release_hold(new_slot.id, appointment.talent_id)
+
+    except BookingError as e:
+        return Response({'error': e.message}, status=e.status_code)
+
+    return Response(AppointmentSerializer(appointment).data)
+
 # Statistics
 @api_view(['GET'])
 @permission_classes([permissions.IsAuthenticated])
@@ -0,0 +1,137 @@
+# FileName: MultipleFiles/waiting_room.py (appointments app)
+"""
+Virtual waiting room for agendas with ``waiting_room_enabled``.
+
+Talents join the room and get a signed queue token carrying their position.
+Admission is a pure function of time: the first WAITING_ROOM_BURST positions
+are admitted as soon as the room opens and then ``waiting_room_admit_per_minute``
+more every minute, so the booking tier sees a bounded, smooth rate no matter
+how many people are queued. Redis only stores the room's opening time, a
+position counter and the position handed to each user; nothing has to run in
+the background to let people in.
+"""
+from django.conf import settings
+from django.core import signing
+from django_redis import get_redis_connection
+
+TOKEN_HEADER = 'X-Waiting-Room-Token'
+TOKEN_SALT = 'appointments.waiting_room'
+
+ROOM_KEYS = [
+    'waiting_room:{agenda_id}:opened_at',
+    'waiting_room:{agenda_id}:sequence',
+    'waiting_room:{agenda_id}:positions',
+]
+
+# Returns {position, opened_at_ms, now_ms}; a user re-joining keeps their place
+JOIN_SCRIPT = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+
+redis.call('SET', KEYS[1], now, 'NX')
+local opened_at = tonumber(redis.call('GET', KEYS[1]))
+
+local position = redis.call('HGET', KEYS[3], ARGV[1])
+if not position then
+    position = redis.call('INCR', KEYS[2])
+    redis.call('HSET', KEYS[3], ARGV[1], position)
+end
+
+for i = 1, 3 do
+    redis.call('EXPIRE', KEYS[i], ARGV[2])
+end
+return {tonumber(position), opened_at, now}
+"""
+
+_join_script = None
+
+
+def _redis():
+    return get_redis_connection('default')
+
+
+def _keys(agenda):
+    return [key.format(agenda_id=agenda.id) for key in ROOM_KEYS]
+
+
+def admitted_positions(agenda, elapsed_ms):
+    """How many queue positions are admitted after the room has been open elapsed_ms"""
+    return settings.WAITING_ROOM_BURST + int(elapsed_ms * agenda.waiting_room_admit_per_minute // 60000)
+
+
+def _status(agenda, position, opened_at_ms, now_ms):
+    admitted_count = admitted_positions(agenda, now_ms - opened_at_ms)
+    if position <= admitted_count:
+        wait_seconds = 0
+    else:
+        # Time until admitted_positions() reaches this position
+        missing = position - settings.WAITING_ROOM_BURST
+        admitted_at_ms = opened_at_ms + missing * 60000 / agenda.waiting_room_admit_per_minute
+        wait_seconds = max(int((admitted_at_ms - now_ms) / 1000) + 1, 1)
+    return {
+        'position': position,
+        'admitted': position <= admitted_count,
+        'estimated_wait_seconds': wait_seconds,
+    }
+
+
+def join(agenda, user):
+    """Put the user in the agenda's queue and return their status plus a queue token"""
+    global _join_script
+    if _join_script is None:
+        _join_script = _redis().register_script(JOIN_SCRIPT)
+
+    position, opened_at_ms, now_ms = (int(v) for v in _join_script(
+        keys=_keys(agenda),
+        args=[user.id, settings.WAITING_ROOM_SESSION_SECONDS],
+    ))
+    token = signing.dumps(
+        {'agenda': agenda.id, 'user': user.id, 'position': position, 'opened_at': opened_at_ms},
+        salt=TOKEN_SALT,
+    )
+    return dict(_status(agenda, position, opened_at_ms, now_ms), token=token)
+
+
+def status_for_token(agenda, user, token):
+    """Current status for a queue token, or None if the token is not valid for this agenda/user"""
+    try:
+        payload = signing.loads(token, salt=TOKEN_SALT, max_age=settings.WAITING_ROOM_SESSION_SECONDS)
+    except signing.BadSignature:
+        return None
+
+    if payload.get('agenda') != agenda.id or payload.get('user') != user.id:
+        return None
+
+    client = _redis()
+    pipe = client.pipeline(transaction=False)
+    pipe.get(_keys(agenda)[0])
+    pipe.time()
+    opened_at, (seconds, microseconds) = pipe.execute()
+
+    # A token from an earlier opening of the room is worthless
+    if opened_at is None or int(opened_at) != payload['opened_at']:
+        return None
+
+    now_ms = seconds * 1000 + microseconds // 1000
+    return _status(agenda, payload['position'], payload['opened_at'], now_ms)
+
+
+def admission_error(request, agenda):
+    """
+    Return an error message if the request may not proceed for this agenda.
+
+    Only talents are queued; staff and admins always pass.
+    """
+    if not agenda.waiting_room_enabled or request.user.user_type != 'talent':
+        return None
+
+    token = request.headers.get(TOKEN_HEADER)
+    if not token:
+        return 'This agenda uses a waiting room; join it before booking'
+
+    room_status = status_for_token(agenda, request.user, token)
+    if room_status is None:
+        return 'Your waiting room token is invalid or has expired; join the waiting room again'
+    if not room_status['admitted']:
+        return 'You have not been admitted from the waiting room yet'
+    return None
@@ -0,0 +1,208 @@
+"""
+Keyset (seek) pagination for function-based views.
+
+Instead of OFFSET, each page continues strictly after the ordering key of
+the last row of the previous page, which the client sends back as an opaque
+``cursor``. Fetching any page is one index range scan of page_size + 1 rows
+(the extra row only tells whether there is a next page), and rows inserted
+or removed between requests never shift items across pages.
+
+The ordering must end with a unique field (usually ``id``) so the key is
+total. keyset_fetch does the same over any store that can return the rows
+after a key (such as a Redis sorted set), keyset_slice pages an in-memory
+list, both with the same cursors, and KeysetPagination plugs keyset_page
+into DRF generic views.
+"""
+import base64
+import datetime
+import json
+from bisect import bisect_right
+from functools import reduce
+from operator import or_
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+CURSOR_PARAM = 'cursor'
+PAGE_SIZE_PARAM = 'page_size'
+MODE_PARAM = 'pagination'
+
+
+class InvalidCursor(ValueError):
+    """A cursor or page size from the query string that cannot be used"""
+
+
+class _CursorEncoder(DjangoJSONEncoder):
+    """DjangoJSONEncoder without its cut to milliseconds, which would skip rows tied within a millisecond"""
+
+    def default(self, o):
+        if isinstance(o, (datetime.datetime, datetime.time)):
+            return o.isoformat()
+        return super().default(o)
+
+
+def encode_cursor(values):
+    # Decoded values go back into filters as ISO strings, which Django parses at full precision
+    payload = json.dumps(values, cls=_CursorEncoder, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token, length):
+    try:
+        payload = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        values = json.loads(payload)
+    except (ValueError, TypeError):
+        raise InvalidCursor('Invalid cursor')
+    if not isinstance(values, list) or len(values) != length:
+        raise InvalidCursor('Invalid cursor')
+    return values
+
+
+def _after(ordering, values):
+    """Q for rows strictly after `values` in `ordering` (a row-value comparison spelled out)"""
+    clauses = []
+    for position, field in enumerate(ordering):
+        name = field.lstrip('-')
+        lookup = 'lt' if field.startswith('-') else 'gt'
+        equal = {f.lstrip('-'): value for f, value in zip(ordering[:position], values)}
+        clauses.append(Q(**equal, **{f'{name}__{lookup}': values[position]}))
+    # The redundant bound on the first field gives the planner an index range to start from
+    first = ordering[0]
+    bound = Q(**{f"{first.lstrip('-')}__{'lte' if first.startswith('-') else 'gte'}": values[0]})
+    return bound & reduce(or_, clauses)
+
+
+def _key(row, ordering):
+    if isinstance(row, dict):
+        return [row[field.lstrip('-')] for field in ordering]
+    return [getattr(row, field.lstrip('-')) for field in ordering]
+
+
+def _next_url(request, rows, ordering):
+    return replace_query_param(
+        request.build_absolute_uri(), CURSOR_PARAM, encode_cursor(_key(rows[-1], ordering))
+    )
+
+
+def page_size(request, default, maximum):
+    """The page_size query parameter, checked against maximum"""
+    value = request.query_params.get(PAGE_SIZE_PARAM)
+    if value is None:
+        return default
+    try:
+        size = int(value)
+    except ValueError:
+        raise InvalidCursor('page_size must be an integer')
+    if not 1 <= size <= maximum:
+        raise InvalidCursor(f'page_size must be between 1 and {maximum}')
+    return size
+
+
+def keyset_page(request, queryset, ordering, size):
+    """
+    One page of `queryset` ordered by `ordering`, starting after the request's cursor.
+
+    Returns ``(rows, next_url)``; next_url is None on the last page. Raises
+    InvalidCursor for a malformed cursor.
+    """
+    token = request.query_params.get(CURSOR_PARAM)
+    if token:
+        # Fields parse the decoded values as the filter is built, so a well-formed
+        # cursor holding values of the wrong type fails here
+        try:
+            queryset = queryset.filter(_after(ordering, decode_cursor(token, len(ordering))))
+        except (DjangoValidationError, ValueError, TypeError):
+            raise InvalidCursor('Invalid cursor')
+
+    rows = list(queryset.order_by(*ordering)[:size + 1])
+    if len(rows) <= size:
+        return rows, None
+
+    rows = rows[:size]
+    return rows, _next_url(request, rows, ordering)
+
+
+def keyset_fetch(request, fetch, ordering, size):
+    """
+    keyset_page for rows from another store.
+
+    fetch(after, limit) returns up to limit rows strictly after the decoded
+    cursor ``after`` (None on the first page) in ordering, or None when the
+    store cannot answer, in which case keyset_fetch returns None too. A
+    fetch that raises ValueError or TypeError for the cursor's values makes
+    it an InvalidCursor.
+    """
+    token = request.query_params.get(CURSOR_PARAM)
+    after = decode_cursor(token, len(ordering)) if token else None
+    try:
+        rows = fetch(after, size + 1)
+    except (ValueError, TypeError):
+        raise InvalidCursor('Invalid cursor')
+    if rows is None:
+        return None
+    if len(rows) <= size:
+        return rows, None
+
+    rows = rows[:size]
+    return rows, _next_url(request, rows, ordering)
+
+
+def keyset_slice(request, rows, ordering, size):
+    """
+    keyset_page for a list of dicts (ascending ordering only).
+
+    The values must be JSON types (as serializers output them) so they
+    compare with decoded cursors; the list need not be sorted.
+    """
+    rows = sorted(rows, key=lambda row: _key(row, ordering))
+    start = 0
+    token = request.query_params.get(CURSOR_PARAM)
+    if token:
+        try:
+            start = bisect_right(rows, decode_cursor(token, len(ordering)), key=lambda row: _key(row, ordering))
+        except TypeError:
+            raise InvalidCursor('Invalid cursor')
+
+    page = rows[start:start + size]
+    if start + size >= len(rows):
+        return page, None
+    return page, _next_url(request, page, ordering)
+
+
+class KeysetPagination(BasePagination):
+    """
+    Keyset pagination for generic list views, on the view's ``keyset_ordering``.
+
+    Opt-in: a request with ``?pagination=cursor`` or a ``cursor`` gets
+    ``{"next", "results"}`` pages from keyset_page; any other request keeps
+    PageNumberPagination (with its COUNT and OFFSET), so existing clients
+    that rely on ``count`` and ``page`` are unaffected.
+    """
+    page_size = api_settings.PAGE_SIZE
+    max_page_size = 100
+
+    def paginate_queryset(self, queryset, request, view=None):
+        params = request.query_params
+        if params.get(MODE_PARAM) != 'cursor' and not params.get(CURSOR_PARAM):
+            self.fallback = PageNumberPagination()
+            return self.fallback.paginate_queryset(queryset, request, view)
+
+        self.fallback = None
+        try:
+            rows, self.next_url = keyset_page(
+                request, queryset, view.keyset_ordering, page_size(request, self.page_size, self.max_page_size)
+            )
+        except InvalidCursor as e:
+            raise ValidationError({'error': str(e)})
+        return rows
+
+    def get_paginated_response(self, data):
+        if self.fallback:
+            return self.fallback.get_paginated_response(data)
+        return Response({'next': self.next_url, 'results': data})
@@ -0,0 +1,125 @@
+"""
+Sparse fieldsets and ``?expand=`` for nested model serializers.
+
+A serializer using ExpandableFieldsMixin lists its related fields in
+``Meta.expandable_fields``. Once a request sends ``fields`` or ``expand``,
+related objects are rendered as primary keys unless named in ``expand``,
+and only the fields named in ``fields`` are rendered; both take
+comma-separated, dotted paths (``expand=calendar_slot.agenda``,
+``fields=id,status,calendar_slot.slot_date``), and a dotted field implies
+expanding its parents. Requests with neither keep the full nested
+representation, so existing clients see no change.
+
+The same paths drive ``setup_queryset``, which adds the select_related and
+prefetch_related calls the representation needs, so expanding stays free of
+N+1 queries.
+"""
+from collections import namedtuple
+
+from rest_framework import serializers
+
+FIELDS_PARAM = 'fields'
+EXPAND_PARAM = 'expand'
+
+# `related` lists lookups the nested serializer itself follows (its own nested fields)
+Expand = namedtuple('Expand', ['serializer', 'many', 'related'], defaults=[False, ()])
+
+
+class _All:
+    """Expansion of everything, at every depth (the legacy representation)"""
+
+    def __contains__(self, name):
+        return True
+
+    def get(self, name, default=None):
+        return self
+
+
+ALL = _All()
+
+
+def _tree(value):
+    """'a.b,a.c,d' as {'a': {'b': {}, 'c': {}}, 'd': {}}"""
+    tree = {}
+    for path in value.split(','):
+        node = tree
+        for part in filter(None, path.strip().split('.')):
+            node = node.setdefault(part, {})
+    return tree
+
+
+def _merge(tree, other):
+    for name, subtree in other.items():
+        _merge(tree.setdefault(name, {}), subtree)
+    return tree
+
+
+def parse_request(request):
+    """(fields, expand) trees from the query string; (None, ALL) when the request sends neither"""
+    params = request.query_params if request is not None else {}
+    if FIELDS_PARAM not in params and EXPAND_PARAM not in params:
+        return None, ALL
+    fields = _tree(params[FIELDS_PARAM]) if params.get(FIELDS_PARAM) else None
+    expand = _tree(params.get(EXPAND_PARAM, ''))
+    if fields:
+        # fields=calendar_slot.slot_date needs calendar_slot expanded
+        _merge(expand, {name: subtree for name, subtree in fields.items() if subtree})
+    return fields, expand
+
+
+class ExpandableFieldsMixin:
+    """Serializer mixin for ``?fields=`` / ``?expand=``; see the module docstring"""
+
+    def __init__(self, *args, fields=None, expand=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Set by the parent serializer for nested instances; the root reads the request
+        self._sparse = None if expand is None else (fields, expand)
+
+    def get_fields(self):
+        fields = super().get_fields()
+        requested, expand = self._sparse or parse_request(self.context.get('request'))
+
+        for name, spec in getattr(self.Meta, 'expandable_fields', {}).items():
+            if name not in fields:
+                continue
+            if name in expand:
+                subfields = requested.get(name) if requested else None
+                fields[name] = spec.serializer(
+                    read_only=True, many=spec.many, fields=subfields or None, expand=expand.get(name, {})
+                ) if issubclass(spec.serializer, ExpandableFieldsMixin) else spec.serializer(
+                    read_only=True, many=spec.many
+                )
+            else:
+                fields[name] = serializers.PrimaryKeyRelatedField(read_only=True, many=spec.many)
+
+        if requested:
+            fields = {name: field for name, field in fields.items() if name in requested}
+        return fields
+
+    @classmethod
+    def setup_queryset(cls, queryset, request):
+        """queryset with the joins and prefetches the request's representation needs"""
+        select, prefetch = [], []
+        _collect(cls, *parse_request(request), '', False, select, prefetch)
+        return queryset.select_related(*select).prefetch_related(*prefetch)
+
+
+def _collect(serializer_class, fields, expand, prefix, prefetching, select, prefetch):
+    for name, spec in getattr(serializer_class.Meta, 'expandable_fields', {}).items():
+        if fields and name not in fields:
+            continue
+        path = prefix + name
+        nested = prefetching or spec.many
+        expanded = name in expand
+        if nested:
+            # Primary keys of a to-many relation need the rows too
+            prefetch.append(path)
+        elif expanded:
+            select.append(path)
+        if not expanded:
+            continue
+        for lookup in spec.related:
+            (prefetch if nested else select).append(f'{path}__{lookup}')
+        if issubclass(spec.serializer, ExpandableFieldsMixin):
+            subfields = fields.get(name) if fields else None
+            _collect(spec.serializer, subfields or None, expand.get(name, {}), f'{path}__', nested, select, prefetch)
@@ -13,6 +13,8 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 from pathlib import Path
 import os
 from decouple import config # type: ignore
+from corsheaders.defaults import default_headers
+from celery.schedules import crontab
 from datetime import timedelta
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -39,6 +41,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
 
     'rest_framework',
     "rest_framework.authtoken",
@@ -85,6 +88,8 @@ CORS_ALLOWED_ORIGINS = [
 ]
 
 CORS_ALLOW_CREDENTIALS = True
+CORS_ALLOW_HEADERS = (*default_headers, 'idempotency-key', 'x-waiting-room-token')
+CORS_EXPOSE_HEADERS = ['Idempotent-Replayed']
 CORS_ALLOW_ALL_ORIGINS = config('CORS_ALLOW_ALL_ORIGINS', default=False, cast=bool)
 
 # If in development, allow all origins
@@ -179,6 +184,18 @@ CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = 'UTC'  
 CELERY_BEAT_SCHEDULER = 'django_celery_beat.schedulers:DatabaseScheduler'
+CELERY_BEAT_SCHEDULE = {
+    # Keep the rolling horizon of recurring agendas materialized
+    'extend-slot-horizons': {
+        'task': 'appointments.tasks.extend_slot_horizons',
+        'schedule': crontab(hour=2, minute=0),
+    },
+    # Safety net for the incrementally maintained next-available index
+    'rebuild-next-available-index': {
+        'task': 'appointments.tasks.rebuild_next_available_index',
+        'schedule': crontab(hour=2, minute=30),
+    },
+}
 
 AUTH_USER_MODEL = 'users.User'
 
@@ -193,6 +210,38 @@ CACHES = {
     }
 }
 
+# Query for staff overlaps before inserting a slot. The database constraint
+# enforces it either way; this only turns a conflict into a nicer error.
+SLOT_OVERLAP_PRECHECK = config('SLOT_OVERLAP_PRECHECK', default=True, cast=bool)
+
+# Largest batch accepted by POST /api/appointments/slots/bulk/
+BULK_SLOT_MAX_ITEMS = config('BULK_SLOT_MAX_ITEMS', default=5000, cast=int)
+
+# Page sizes of GET /api/appointments/slots/available/ (keyset paginated)
+AVAILABLE_SLOTS_PAGE_SIZE = config('AVAILABLE_SLOTS_PAGE_SIZE', default=100, cast=int)
+AVAILABLE_SLOTS_MAX_PAGE_SIZE = config('AVAILABLE_SLOTS_MAX_PAGE_SIZE', default=500, cast=int)
+
+# Lifetime in seconds of a per-agenda available slots snapshot in Redis, counted from its build
+SLOT_SNAPSHOT_TTL = config('SLOT_SNAPSHOT_TTL', default=3600, cast=int)
+
+# Lifetime in seconds of a cached calendar month summary; slot changes replace it
+# at once, this only bounds appointment edits made outside the booking flow
+CALENDAR_SUMMARY_CACHE_SECONDS = config('CALENDAR_SUMMARY_CACHE_SECONDS', default=300, cast=int)
+
+# How long a seat held through /api/appointments/slots/<id>/hold/ stays reserved
+BOOKING_HOLD_MINUTES = config('BOOKING_HOLD_MINUTES', default=10, cast=int)
+
+# Idempotency-Key handling for booking and cancellation requests
+IDEMPOTENCY_KEY_TTL_SECONDS = config('IDEMPOTENCY_KEY_TTL_SECONDS', default=24 * 60 * 60, cast=int)
+IDEMPOTENCY_LOCK_SECONDS = 60
+# Retry-After sent to duplicates that arrive while the first request is running
+IDEMPOTENCY_RETRY_AFTER_SECONDS = 1
+
+# Virtual waiting room for agendas with waiting_room_enabled: positions admitted
+# straight away when the room opens, and how long a room (and its tokens) lives
+WAITING_ROOM_BURST = config('WAITING_ROOM_BURST', default=50, cast=int)
+WAITING_ROOM_SESSION_SECONDS = config('WAITING_ROOM_SESSION_SECONDS', default=2 * 60 * 60, cast=int)
+
 # Session configuration
 SESSION_ENGINE = 'django.contrib.sessions.backends.cache'
 SESSION_CACHE_ALIAS = 'default'
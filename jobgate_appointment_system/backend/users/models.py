@@ -64,6 +64,11 @@ class User(AbstractUser, BaseModel):
 
     class Meta:
         db_table = 'users'
+        indexes = [
+            # Keyset pagination of the user list, newest first
+            models.Index(fields=['-created_at', 'id'], name='user_created_keyset_idx'),
+            models.Index(fields=['user_type', '-created_at', 'id'], name='user_type_keyset_idx'),
+        ]
 
 class UserPreferences(BaseModel):
     MEETING_TYPE_CHOICES = [
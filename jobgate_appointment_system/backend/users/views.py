@@ -1,6 +1,7 @@
 from rest_framework import generics, status, permissions
 from rest_framework.response import Response
 from django.utils import timezone
+from common.pagination import KeysetPagination
 from .models import User, UserPreferences
 from rest_framework.parsers import MultiPartParser, FormParser
 from .serializers import (
@@ -49,13 +50,16 @@ class UserListView(generics.ListAPIView):
     queryset = User.objects.filter(is_active=True)
     serializer_class = UserSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = KeysetPagination
+    # Matches user_created_keyset_idx and user_type_keyset_idx
+    keyset_ordering = ['-created_at', 'id']
     
     def get_queryset(self):
         queryset = super().get_queryset()
         user_type = self.request.query_params.get('user_type', None)
         if user_type:
             queryset = queryset.filter(user_type=user_type)
-        return queryset
+        return queryset.order_by(*self.keyset_ordering)
 
 # Djoser will handle login, logout, and current user views
 
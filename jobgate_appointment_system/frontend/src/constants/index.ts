@@ -36,11 +36,15 @@ export const API_ENDPOINTS = {
     AGENDA_DETAIL: (id: number) => `/api/appointments/agendas/${id}/`,
     CALENDAR_SLOTS: '/api/appointments/calendar-slots/',
     CALENDAR_SLOT_DETAIL: (id: number) => `/api/appointments/calendar-slots/${id}/`,
-    AVAILABLE_SLOTS: '/api/appointments/available-slots/',
+    AVAILABLE_SLOTS: '/api/appointments/slots/available/',
+    CALENDAR_SUMMARY: '/api/appointments/calendar/summary/',
+    CALENDAR_FEEDS: '/api/appointments/calendar/feeds/',
     APPOINTMENTS: '/api/appointments/',
+    EXPORT: '/api/appointments/export.csv',
     APPOINTMENT_DETAIL: (id: number) => `/api/appointments/${id}/`,
     BOOK_APPOINTMENT: '/api/appointments/book/',
     CANCEL_APPOINTMENT: (id: number) => `/api/appointments/${id}/cancel/`,
+    RESCHEDULE_APPOINTMENT: (id: number) => `/api/appointments/${id}/reschedule/`,
     STATISTICS: '/api/appointments/statistics/',
   },
 } as const;
@@ -126,12 +126,22 @@ export const useAppointments = () => {
     });
   };
 
+  const useCalendarSummary = (params: { agenda_id: number; month?: string }) => {
+    return useQuery({
+      queryKey: [QUERY_KEYS.CALENDAR_SUMMARY, params],
+      queryFn: () => appointmentService.getCalendarSummary(params),
+      enabled: !!params.agenda_id,
+      staleTime: 30 * 1000, // 30 seconds
+    });
+  };
+
   const useCreateCalendarSlot = () => {
     return useMutation({
       mutationFn: (data: CalendarSlotCreateForm) => appointmentService.createCalendarSlot(data),
       onSuccess: () => {
         queryClient.invalidateQueries({ queryKey: [QUERY_KEYS.CALENDAR_SLOTS] });
         queryClient.invalidateQueries({ queryKey: [QUERY_KEYS.AVAILABLE_SLOTS] });
+        queryClient.invalidateQueries({ queryKey: [QUERY_KEYS.CALENDAR_SUMMARY] });
         showNotification(SUCCESS_MESSAGES.SLOT_CREATED, 'success');
       },
       onError: (error: any) => {
@@ -149,6 +159,7 @@ export const useAppointments = () => {
         queryClient.invalidateQueries({ queryKey: [QUERY_KEYS.CALENDAR_SLOTS] });
         queryClient.invalidateQueries({ queryKey: [QUERY_KEYS.CALENDAR_SLOTS, id] });
         queryClient.invalidateQueries({ queryKey: [QUERY_KEYS.AVAILABLE_SLOTS] });
+        queryClient.invalidateQueries({ queryKey: [QUERY_KEYS.CALENDAR_SUMMARY] });
         showNotification('Calendar slot updated successfully', 'success');
       },
       onError: (error: any) => {
@@ -164,6 +175,7 @@ export const useAppointments = () => {
       onSuccess: () => {
         queryClient.invalidateQueries({ queryKey: [QUERY_KEYS.CALENDAR_SLOTS] });
         queryClient.invalidateQueries({ queryKey: [QUERY_KEYS.AVAILABLE_SLOTS] });
+        queryClient.invalidateQueries({ queryKey: [QUERY_KEYS.CALENDAR_SUMMARY] });
         showNotification('Calendar slot deleted successfully', 'success');
       },
       onError: (error: any) => {
@@ -202,6 +214,7 @@ export const useAppointments = () => {
         queryClient.invalidateQueries({ queryKey: [QUERY_KEYS.APPOINTMENTS] });
         queryClient.invalidateQueries({ queryKey: [QUERY_KEYS.CALENDAR_SLOTS] });
         queryClient.invalidateQueries({ queryKey: [QUERY_KEYS.AVAILABLE_SLOTS] });
+        queryClient.invalidateQueries({ queryKey: [QUERY_KEYS.CALENDAR_SUMMARY] });
         showNotification(SUCCESS_MESSAGES.APPOINTMENT_BOOKED, 'success');
       },
       onError: (error: any) => {
@@ -234,6 +247,7 @@ export const useAppointments = () => {
         queryClient.invalidateQueries({ queryKey: [QUERY_KEYS.APPOINTMENTS] });
         queryClient.invalidateQueries({ queryKey: [QUERY_KEYS.CALENDAR_SLOTS] });
         queryClient.invalidateQueries({ queryKey: [QUERY_KEYS.AVAILABLE_SLOTS] });
+        queryClient.invalidateQueries({ queryKey: [QUERY_KEYS.CALENDAR_SUMMARY] });
         showNotification(SUCCESS_MESSAGES.APPOINTMENT_CANCELLED, 'success');
       },
       onError: (error: any) => {
@@ -280,6 +294,7 @@ export const useAppointments = () => {
       onSuccess: () => {
         queryClient.invalidateQueries({ queryKey: [QUERY_KEYS.CALENDAR_SLOTS] });
         queryClient.invalidateQueries({ queryKey: [QUERY_KEYS.AVAILABLE_SLOTS] });
+        queryClient.invalidateQueries({ queryKey: [QUERY_KEYS.CALENDAR_SUMMARY] });
         showNotification('Multiple slots created successfully', 'success');
       },
       onError: (error: any) => {
@@ -297,6 +312,7 @@ export const useAppointments = () => {
     useCalendarSlots,
     useCalendarSlot,
     useAvailableSlots,
+    useCalendarSummary,
     useAppointmentsList,
     useAppointment,
     useAppointmentStatistics,
@@ -1,7 +1,7 @@
 import React, { useState, useEffect } from 'react';
 import { useNavigate, useSearchParams } from 'react-router-dom';
 import { apiMethods } from '../../utils/api';
-import { useQuery } from '@tanstack/react-query';
+import { useInfiniteQuery, useQuery } from '@tanstack/react-query';
 import {
   Box,
   Typography,
@@ -49,7 +49,7 @@ import { DatePicker } from '@mui/x-date-pickers';
 import { useAuth } from '../../hooks/useAuth';
 import { LoadingSpinner } from '../../components/common/LoadingSpinner';
 import { MEETING_TYPES } from '../../constants';
-import type { Agenda, CalendarSlot, AppointmentTheme } from '../../types';
+import type { Agenda, AvailableSlot, AppointmentTheme, KeysetPage } from '../../types';
 
 const steps = ['Select Agenda', 'Choose Time Slot', 'Confirm Details'];
 
@@ -63,7 +63,7 @@ export const BookAppointmentPage: React.FC = () => {
   /* ------------------------------------------------------------------ */
   const [activeStep, setActiveStep] = useState(0);
   const [selectedAgenda, setSelectedAgenda] = useState<Agenda | null>(null);
-  const [selectedSlot, setSelectedSlot] = useState<CalendarSlot | null>(null);
+  const [selectedSlot, setSelectedSlot] = useState<AvailableSlot | null>(null);
   const [talentNotes, setTalentNotes] = useState('');
   const [confirmDialogOpen, setConfirmDialogOpen] = useState(false);
   const [bookingSuccess, setBookingSuccess] = useState(false);
@@ -109,17 +109,31 @@ const { data: agendas = [], isLoading: agendasLoading } = useQuery<Agenda[]>({
   },
 });
 
-    const { data: availableSlots = [], isLoading: slotsLoading } = useQuery<CalendarSlot[]>({
+    // Keyset-paginated: each page carries the URL of the next one
+    const {
+      data: slotPages,
+      isLoading: slotsLoading,
+      hasNextPage,
+      fetchNextPage,
+      isFetchingNextPage,
+    } = useInfiniteQuery<KeysetPage<AvailableSlot>>({
       queryKey: ['availableSlots', selectedAgenda?.id, selectedDate],
-      queryFn: async () => {
-        if (!selectedAgenda) return [];
+      queryFn: async ({ pageParam }) => {
+        if (pageParam) return apiMethods.get<KeysetPage<AvailableSlot>>(pageParam as string);
         const params = new URLSearchParams();
-        params.append('agenda_id', selectedAgenda.id.toString());
-        if (selectedDate) params.append('date', selectedDate.toISOString().split('T')[0]);
-        return apiMethods.get(`/appointments/slots/available/?${params.toString()}`);
+        params.append('agenda_id', selectedAgenda!.id.toString());
+        if (selectedDate) {
+          const day = selectedDate.toISOString().split('T')[0];
+          params.append('start_date', day);
+          params.append('end_date', day);
+        }
+        return apiMethods.get<KeysetPage<AvailableSlot>>(`/appointments/slots/available/?${params.toString()}`);
       },
+      initialPageParam: null,
+      getNextPageParam: (lastPage) => lastPage.next,
       enabled: !!selectedAgenda, // Only fetch slots if an agenda is selected
     });
+    const availableSlots = slotPages?.pages.flatMap(page => page.results) ?? [];
 
 
 
@@ -143,7 +157,7 @@ const { data: agendas = [], isLoading: agendasLoading } = useQuery<Agenda[]>({
     setSelectedAgenda(agenda);
     handleNext();
   };
-  const handleSlotSelect = (slot: CalendarSlot) => {
+  const handleSlotSelect = (slot: AvailableSlot) => {
     setSelectedSlot(slot);
     handleNext();
   };
@@ -192,7 +206,7 @@ const { data: agendas = [], isLoading: agendasLoading } = useQuery<Agenda[]>({
   });
 
   const filteredSlots = availableSlots.filter(slot => {
-    if (!selectedAgenda || slot.agenda.id !== selectedAgenda.id) return false;
+    if (!selectedAgenda || slot.agenda_id !== selectedAgenda.id) return false;
     if (!selectedDate) return true;
     return new Date(slot.slot_date).toDateString() === new Date(selectedDate).toDateString();
   });
@@ -352,7 +366,7 @@ const { data: agendas = [], isLoading: agendasLoading } = useQuery<Agenda[]>({
     <>
       <Typography variant="body2" color="textSecondary" component="span" sx={{ display: 'flex', alignItems: 'center', gap: 1 }}>
         <Person fontSize="small" />
-        {slot.staff.first_name} {slot.staff.last_name}
+        {slot.staff_name}
       </Typography>
       <Typography variant="body2" color="textSecondary" component="span" sx={{ display: 'flex', alignItems: 'center', gap: 1 }}>
         {getMeetingIcon(slot.meeting_type)}
@@ -368,6 +382,11 @@ const { data: agendas = [], isLoading: agendasLoading } = useQuery<Agenda[]>({
                   ))}
                 </List>
             }
+            {hasNextPage && (
+              <Button variant="text" onClick={() => fetchNextPage()} disabled={isFetchingNextPage} sx={{ mt: 2 }}>
+                {isFetchingNextPage ? 'Loading...' : 'Load more slots'}
+              </Button>
+            )}
           </Paper>
         </Box>
       )}
@@ -388,7 +407,7 @@ const { data: agendas = [], isLoading: agendasLoading } = useQuery<Agenda[]>({
               <Grid item xs={12} md={6}>
                 <Typography variant="subtitle1">Appointment Details</Typography>
                 <Typography variant="body2">{new Date(selectedSlot.slot_date).toLocaleDateString()} at {selectedSlot.start_time} - {selectedSlot.end_time}</Typography>
-                <Typography variant="body2">{selectedSlot.staff.first_name} {selectedSlot.staff.last_name}</Typography>
+                <Typography variant="body2">{selectedSlot.staff_name}</Typography>
                 <Typography variant="body2">{selectedSlot.meeting_type.replace('_', ' ')}</Typography>
               </Grid>
             </Grid>
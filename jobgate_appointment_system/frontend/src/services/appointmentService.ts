@@ -8,6 +8,9 @@ import type {
   CalendarSlotCreateForm,
   Appointment,
   AppointmentBookingForm,
+  AvailableSlot,
+  CalendarMonthSummary,
+  KeysetPage,
   PaginatedResponse,
 } from '../types';
 
@@ -78,9 +81,23 @@ export const appointmentService = {
     agenda_id: number;
     start_date?: string;
     end_date?: string;
-  }): Promise<CalendarSlot[]> => {
+    page_size?: number;
+    cursor?: string;
+  }): Promise<KeysetPage<AvailableSlot>> => {
     const url = buildUrl(API_ENDPOINTS.APPOINTMENTS.AVAILABLE_SLOTS, params);
-    return apiMethods.get<CalendarSlot[]>(url);
+    return apiMethods.get<KeysetPage<AvailableSlot>>(url);
+  },
+
+  // Per-day counts for a month grid (month is YYYY-MM)
+  getCalendarSummary: async (params: { agenda_id: number; month?: string }): Promise<CalendarMonthSummary> => {
+    const url = buildUrl(API_ENDPOINTS.APPOINTMENTS.CALENDAR_SUMMARY, params);
+    return apiMethods.get<CalendarMonthSummary>(url);
+  },
+
+  // iCalendar subscription URLs (the agenda feed needs staff rights on the agenda)
+  getCalendarFeeds: async (params?: { agenda_id?: number }): Promise<{ appointments: string; agenda?: string }> => {
+    const url = buildUrl(API_ENDPOINTS.APPOINTMENTS.CALENDAR_FEEDS, params);
+    return apiMethods.get<{ appointments: string; agenda?: string }>(url);
   },
 
   // Appointments
@@ -110,6 +127,12 @@ export const appointmentService = {
     return apiMethods.post<Appointment>(API_ENDPOINTS.APPOINTMENTS.CANCEL_APPOINTMENT(id));
   },
 
+  rescheduleAppointment: async (id: number, calendarSlotId: number): Promise<Appointment> => {
+    return apiMethods.post<Appointment>(API_ENDPOINTS.APPOINTMENTS.RESCHEDULE_APPOINTMENT(id), {
+      calendar_slot_id: calendarSlotId,
+    });
+  },
+
   // Statistics
   getAppointmentStatistics: async (params?: {
     university_profile_id?: number;
@@ -165,14 +188,13 @@ export const appointmentService = {
     );
   },
 
-  // Export appointments
+  // Export appointments as CSV (university staff and admins)
   exportAppointments: async (params?: {
-    format: 'csv' | 'xlsx';
     start_date?: string;
     end_date?: string;
     status?: string;
   }): Promise<Blob> => {
-    const url = buildUrl(`${API_ENDPOINTS.APPOINTMENTS.APPOINTMENTS}export/`, params);
+    const url = buildUrl(API_ENDPOINTS.APPOINTMENTS.EXPORT, params);
     const response = await fetch(url, {
       headers: {
         'Authorization': `Bearer ${localStorage.getItem('access_token')}`,
@@ -115,6 +115,37 @@ export interface CalendarSlot {
   is_active: boolean;
 }
 
+// Compact slot returned by the available slots endpoint
+export interface AvailableSlot {
+  id: number;
+  agenda_id: number;
+  staff_id: number;
+  staff_name: string;
+  slot_date: string;
+  start_time: string;
+  end_time: string;
+  max_capacity: number;
+  available_capacity: number;
+  location?: string;
+  meeting_type: 'in_person' | 'online' | 'phone';
+  meeting_link?: string;
+}
+
+// One day of the calendar month summary
+export interface CalendarDaySummary {
+  date: string;
+  total: number;
+  available: number;
+  fully_booked: number;
+  my_bookings: number;
+}
+
+export interface CalendarMonthSummary {
+  agenda_id: number;
+  month: string;
+  days: CalendarDaySummary[];
+}
+
 export interface Appointment {
   id: number;
   calendar_slot: CalendarSlot;
@@ -224,6 +255,12 @@ export interface PaginatedResponse<T> {
   results: T[];
 }
 
+// Keyset-paginated response: follow `next` until it is null
+export interface KeysetPage<T> {
+  next: string | null;
+  results: T[];
+}
+
 export interface ApiError {
   detail?: string;
   message?: string;
@@ -250,6 +287,7 @@ export const QUERY_KEYS = {
   CALENDAR_SLOTS: 'calendarSlots',
   APPOINTMENTS: 'appointments',
   AVAILABLE_SLOTS: 'availableSlots',
+  CALENDAR_SUMMARY: 'calendarSummary',
   UNIVERSITY_PROFILES: 'universityProfiles',
   APPOINTMENT_STATISTICS: 'appointmentStatistics',
 } as const;